@@ -0,0 +1,261 @@
+"""
+archetypes.py — offline student archetypes for instant cold-start matches.
+
+Clusters the student personas in students.json in the weighted 24-dimension space
+and precomputes, for every cluster centroid, the ranked teacher list (overall and
+per subject) plus optional personalized summaries. A new student is then served
+from the nearest centroid's cached ranking while the exact ranking runs later.
+
+Clustering is k-medians under the weighted Manhattan distance used by matching:
+the per-dimension median is the L1 counterpart of the k-means mean update, so the
+centroids stay consistent with `weighted_distance`.
+
+Usage:
+  python archetypes.py                  # incremental update of archetypes.json
+  python archetypes.py --full --k 8     # recluster from scratch
+  python archetypes.py --summaries      # also precompute AI summaries per centroid
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from matching import (
+    DIMENSION_KEYS,
+    load_teachers,
+    persona_matrix,
+    persona_vector,
+    rank_teachers,
+    weighted_distances,
+)
+
+BASE_DIR = Path(__file__).resolve().parent
+ARCHETYPES_PATH = Path(os.environ["UNITINDER_ARCHETYPES_PATH"]) if os.environ.get("UNITINDER_ARCHETYPES_PATH") else BASE_DIR / "archetypes.json"
+
+MODEL_VERSION = 1
+DEFAULT_K = 8
+ALL_SUBJECTS = ""  # key of the unfiltered ranking in each archetype's "ranked" map
+
+
+def file_sha256(path: str | Path) -> str:
+    """Hex SHA-256 of a file's bytes (used to detect a changed teacher catalogue)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ── Clustering ───────────────────────────────────────────────────────
+
+def _centroid_distances(X: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """(n, k) weighted Manhattan distances from every row of X to every centroid."""
+    return np.column_stack([weighted_distances(c, X) for c in centroids])
+
+
+def _init_centroids(X: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ seeding with weighted Manhattan distances."""
+    centroids = [X[rng.integers(len(X))]]
+    closest = weighted_distances(centroids[0], X)
+    for _ in range(1, k):
+        total = closest.sum()
+        idx = rng.choice(len(X), p=closest / total) if total > 0 else rng.integers(len(X))
+        centroids.append(X[idx])
+        closest = np.minimum(closest, weighted_distances(X[idx], X))
+    return np.vstack(centroids)
+
+
+def kmedians(
+    X: np.ndarray,
+    k: int,
+    init: np.ndarray | None = None,
+    max_iter: int = 50,
+    seed: int = 0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cluster rows of X into k groups. Returns (centroids (k, 24), labels (n,)).
+    Pass init (previous centroids) to refine an existing clustering instead of reseeding.
+    """
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, len(X)))
+    centroids = init.copy() if init is not None else _init_centroids(X, k, rng)
+    labels = np.full(len(X), -1)
+    for _ in range(max_iter):
+        new_labels = _centroid_distances(X, centroids).argmin(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for j in range(len(centroids)):
+            members = X[labels == j]
+            if len(members):
+                centroids[j] = np.median(members, axis=0)
+    return centroids, labels
+
+
+# ── Model build ──────────────────────────────────────────────────────
+
+def _vector_to_persona(vector: np.ndarray) -> dict[str, float]:
+    return {d: round(float(v), 4) for d, v in zip(DIMENSION_KEYS, vector)}
+
+
+def _rankings_for(persona: dict[str, float], teachers: list[dict[str, Any]], subjects: list[str]) -> dict[str, list]:
+    ranked = {ALL_SUBJECTS: rank_teachers(teachers, persona)}
+    for subject in subjects:
+        ranked[subject] = rank_teachers(teachers, persona, subject=subject)
+    return ranked
+
+
+def build_model(
+    students: list[dict[str, Any]],
+    teachers: list[dict[str, Any]],
+    teachers_sha256: str,
+    k: int = DEFAULT_K,
+    previous: dict | None = None,
+) -> dict:
+    """
+    Cluster student personas and precompute each centroid's rankings.
+    With previous (an existing model with the same k), clustering restarts from its
+    centroids and summaries are carried over wherever the teacher's "why" is unchanged.
+    """
+    students = [s for s in students if isinstance(s.get("persona"), dict)]
+    if not students:
+        raise ValueError("No student personas to cluster")
+    X = persona_matrix([s["persona"] for s in students])
+    init = None
+    if previous and len(previous.get("archetypes") or []) == min(k, len(X)):
+        init = persona_matrix([a["centroid"] for a in previous["archetypes"]])
+    centroids, labels = kmedians(X, k, init=init)
+
+    subjects = sorted({(t.get("subject") or "").strip() for t in teachers} - {""})
+    archetypes = []
+    for j, centroid in enumerate(centroids):
+        persona = _vector_to_persona(centroid)
+        old = previous["archetypes"][j] if init is not None else {}
+        old_why = {r["teacher_id"]: r["why"] for r in (old.get("ranked") or {}).get(ALL_SUBJECTS, [])}
+        ranked = _rankings_for(persona, teachers, subjects)
+        summaries = {
+            r["teacher_id"]: text
+            for r in ranked[ALL_SUBJECTS]
+            if (text := (old.get("summaries") or {}).get(r["teacher_id"])) and old_why.get(r["teacher_id"]) == r["why"]
+        }
+        archetypes.append(
+            {
+                "archetype_id": f"arch_{j}",
+                "centroid": persona,
+                "members": [students[i].get("student_id") for i in np.flatnonzero(labels == j)],
+                "ranked": ranked,
+                "summaries": summaries,
+            }
+        )
+    return {
+        "version": MODEL_VERSION,
+        "built_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "k": len(centroids),
+        "teachers_sha256": teachers_sha256,
+        "archetypes": archetypes,
+    }
+
+
+def fill_summaries(model: dict, generate, max_workers: int = 10) -> int:
+    """Generate missing per-centroid summaries with generate(ranked_teacher) -> str. Returns how many were generated."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    jobs = []
+    for arch in model["archetypes"]:
+        for r in arch["ranked"][ALL_SUBJECTS]:
+            if r["teacher_id"] not in arch["summaries"]:
+                jobs.append((arch, r))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for (arch, r), text in zip(jobs, executor.map(lambda job: generate(job[1]), jobs)):
+            arch["summaries"][r["teacher_id"]] = text
+    return len(jobs)
+
+
+# ── Load / serve ─────────────────────────────────────────────────────
+
+def save_model(model: dict, path: str | Path = ARCHETYPES_PATH) -> None:
+    """Write the model JSON (private keys, e.g. the cached centroid matrix, are skipped)."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({k: v for k, v in model.items() if not k.startswith("_")}, f, indent=2)
+
+
+def load_model(path: str | Path = ARCHETYPES_PATH, teachers_sha256: str | None = None) -> dict | None:
+    """
+    Load archetypes.json and attach its centroid matrix. Returns None if the file is
+    missing, unreadable, or was built from a different teacher catalogue.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            model = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if model.get("version") != MODEL_VERSION or not model.get("archetypes"):
+        return None
+    if teachers_sha256 is not None and model.get("teachers_sha256") != teachers_sha256:
+        return None
+    model["_centroids"] = persona_matrix([a["centroid"] for a in model["archetypes"]])
+    return model
+
+
+def nearest_archetype(model: dict, student_persona: dict[str, float]) -> int:
+    """Index of the archetype whose centroid is closest to this persona."""
+    return int(weighted_distances(persona_vector(student_persona), model["_centroids"]).argmin())
+
+
+def cached_ranking(model: dict, index: int, subject: str | None = None) -> list[dict[str, Any]] | None:
+    """
+    Copy of archetype index's precomputed ranking (with precomputed summaries filled in),
+    or None if that subject was not precomputed.
+    """
+    arch = model["archetypes"][index]
+    ranked = arch["ranked"].get((subject or "").strip())
+    if ranked is None:
+        return None
+    summaries = arch.get("summaries") or {}
+    return [dict(r, summary=summaries.get(r["teacher_id"]) or r.get("summary")) for r in ranked]
+
+
+# ── CLI ──────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cluster student personas and precompute archetype rankings.")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help=f"number of archetypes (default {DEFAULT_K})")
+    parser.add_argument("--full", action="store_true", help="recluster from scratch instead of updating the existing model")
+    parser.add_argument("--summaries", action="store_true", help="generate AI summaries for every centroid/teacher pair")
+    args = parser.parse_args()
+
+    # Reuse main's paths and summary helper so the job sees exactly what the API serves
+    import main
+
+    teachers = load_teachers(main.TEACHERS_PATH)
+    teachers_sha = file_sha256(main.TEACHERS_PATH)
+    students = main._load_students_data().get("students", [])
+    previous = None if args.full else load_model(ARCHETYPES_PATH)
+
+    if previous is not None:
+        known = {sid for a in previous["archetypes"] for sid in a["members"]}
+        new_students = [s for s in students if s.get("student_id") not in known]
+        up_to_date = not new_students and previous["teachers_sha256"] == teachers_sha and previous["k"] == min(args.k, len(students))
+        if up_to_date and not (args.summaries and any(len(a["summaries"]) < len(a["ranked"][ALL_SUBJECTS]) for a in previous["archetypes"])):
+            print(f"Archetypes up to date ({previous['k']} clusters, {len(known)} students).")
+            raise SystemExit(0)
+        print(f"Updating archetypes: {len(new_students)} new student(s).")
+
+    model = build_model(students, teachers, teachers_sha, k=args.k, previous=previous)
+    if args.summaries:
+        generated = fill_summaries(model, main._generate_personalized_summary)
+        print(f"Generated {generated} summaries.")
+    save_model(model)
+    for a in model["archetypes"]:
+        print(f"  {a['archetype_id']}: {len(a['members'])} student(s)")
+    print(f"Saved {model['k']} archetypes to {ARCHETYPES_PATH}")
@@ -0,0 +1,67 @@
+"""
+bench_startup.py — measure cold-start import time of the API (python -X importtime -c "import main").
+
+Each run is a fresh interpreter, so this is what a scale-to-zero host pays before it can serve
+the first request. Reports the median total and the heaviest imports, and exits non-zero when
+the median exceeds --budget-ms (for CI):
+
+  python bench_startup.py                 # 5 runs, top 15 imports
+  python bench_startup.py --budget-ms 900
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def measure(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds of `module` and of each module it imports directly."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    times: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        # Names are indented two spaces per nesting level: " main", "   fastapi", ...
+        if len(name) - len(name.lstrip()) <= 3:
+            times[name.strip()] = int(cumulative_us)
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of main.py")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Heaviest imports to list")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if the median total exceeds this")
+    parser.add_argument("--module", default="main")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(max(1, args.runs))]
+    totals = [r.get(args.module, 0) / 1000.0 for r in runs]
+    median_total = statistics.median(totals)
+    print(f"import {args.module}: median {median_total:.0f} ms over {len(runs)} runs (min {min(totals):.0f}, max {max(totals):.0f})")
+
+    names = {n for r in runs for n in r if n != args.module}
+    medians = {n: statistics.median(r.get(n, 0) for r in runs) / 1000.0 for n in names}
+    for name, ms in sorted(medians.items(), key=lambda kv: -kv[1])[: args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    if args.budget_ms is not None and median_total > args.budget_ms:
+        print(f"over budget: {median_total:.0f} ms > {args.budget_ms:.0f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
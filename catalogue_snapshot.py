@@ -0,0 +1,231 @@
+"""
+catalogue_snapshot.py — precompiled binary snapshot of teachers.json for instant worker boot.
+
+`build-snapshot` compiles the catalogue once into a flat file that workers mmap instead of
+parsing JSON and rebuilding the persona matrix per process:
+
+  python catalogue_snapshot.py build-snapshot     # writes teachers.snapshot
+  python catalogue_snapshot.py check              # exit 1 if missing or stale
+
+Layout (native little-endian, arrays 64-byte aligned):
+  MAGIC | uint64 header length | JSON header | arrays
+
+The header records the format version, the SHA-256 of the teachers.json it was built from,
+the teacher count, DIMENSION_KEYS, subject → [start, end) ranges into subject_order, and the
+dtype/shape/offset of each array:
+  personas        float64 (n, 24)  persona matrix in DIMENSION_KEYS order (as teacher_matrix builds it)
+  id_offsets      int64 (n + 1)    teacher_id i is id_blob[id_offsets[i]:id_offsets[i + 1]] (UTF-8)
+  id_blob         uint8
+  subject_order   int32 (n)        teacher indices grouped by subject, catalogue order within a subject
+  record_offsets  int64 (n + 1)    teacher i's full JSON record in record_blob
+  record_blob     uint8
+
+A snapshot whose source hash differs from the current teachers.json is stale: load_snapshot
+returns None and the API falls back to parsing JSON until the snapshot is rebuilt.
+"""
+
+import json
+import os
+import struct
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+
+from matching import DIMENSION_KEYS, persona_matrix
+
+BASE_DIR = Path(__file__).resolve().parent
+SNAPSHOT_PATH = Path(os.environ["UNITINDER_SNAPSHOT_PATH"]) if os.environ.get("UNITINDER_SNAPSHOT_PATH") else BASE_DIR / "teachers.snapshot"
+
+MAGIC = b"UTSNAP\x00\x01"
+FORMAT_VERSION = 1
+ALIGN = 64
+
+
+def _subject(teacher: dict[str, Any]) -> str:
+    # Same normalization as rank_teachers' subject filter
+    return (teacher.get("subject") or "").strip()
+
+
+def _blob(items: list[bytes]) -> tuple[np.ndarray, np.ndarray]:
+    """(offsets, blob): items concatenated, item i at blob[offsets[i]:offsets[i + 1]]."""
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in items])
+    return offsets, np.frombuffer(b"".join(items), dtype=np.uint8)
+
+
+def build_snapshot(teachers: list[dict[str, Any]], source_sha256: str, path: str | Path = SNAPSHOT_PATH) -> Path:
+    """Write the snapshot for this catalogue (atomically: readers never see a partial file)."""
+    path = Path(path)
+    subjects: dict[str, list[int]] = {}
+    for i, t in enumerate(teachers):
+        subjects.setdefault(_subject(t), []).append(i)
+    subject_ranges, order = {}, []
+    for subject in sorted(subjects):
+        subject_ranges[subject] = [len(order), len(order) + len(subjects[subject])]
+        order.extend(subjects[subject])
+
+    id_offsets, id_blob = _blob([(t.get("teacher_id") or "").strip().encode("utf-8") for t in teachers])
+    record_offsets, record_blob = _blob([json.dumps(t, ensure_ascii=False).encode("utf-8") for t in teachers])
+    arrays = {
+        "personas": persona_matrix([t.get("persona") or {} for t in teachers]),
+        "id_offsets": id_offsets,
+        "id_blob": id_blob,
+        "subject_order": np.array(order, dtype=np.int32),
+        "record_offsets": record_offsets,
+        "record_blob": record_blob,
+    }
+
+    # Array offsets are relative to the (aligned) end of the header, so the header can be sized first
+    layout, offset = {}, 0
+    for name, arr in arrays.items():
+        layout[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += -(-arr.nbytes // ALIGN) * ALIGN
+    header = json.dumps(
+        {
+            "format_version": FORMAT_VERSION,
+            "source_sha256": source_sha256,
+            "count": len(teachers),
+            "dimensions": DIMENSION_KEYS,
+            "subjects": subject_ranges,
+            "arrays": layout,
+        }
+    ).encode("utf-8")
+    prefix = len(MAGIC) + 8 + len(header)
+    data_start = -(-prefix // ALIGN) * ALIGN
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        f.write(b"\x00" * (data_start - prefix))
+        for name, arr in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+    return path
+
+
+class CatalogueSnapshot(Sequence):
+    """
+    Read-only teacher list backed by a mmapped snapshot. Indexing decodes a teacher record on
+    first access; `matrix` and `subject_indices` are used by matching without touching records.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        buf = np.memmap(self.path, dtype=np.uint8, mode="r")
+        if bytes(buf[: len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{self.path} is not a catalogue snapshot")
+        (header_len,) = struct.unpack("<Q", bytes(buf[len(MAGIC) : len(MAGIC) + 8]))
+        self.header = json.loads(bytes(buf[len(MAGIC) + 8 : len(MAGIC) + 8 + header_len]))
+        data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+        arrays = {}
+        for name, spec in self.header["arrays"].items():
+            dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+            count = int(np.prod(shape)) if shape else 1
+            arrays[name] = np.frombuffer(buf, dtype=dtype, count=count, offset=data_start + spec["offset"]).reshape(shape)
+        self.matrix: np.ndarray = arrays["personas"]
+        self._arrays = arrays
+        self._records: list[dict[str, Any] | None] = [None] * self.header["count"]
+        self._ids: dict[str, int] | None = None
+
+    @property
+    def source_sha256(self) -> str:
+        return self.header["source_sha256"]
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _record(self, i: int) -> dict[str, Any]:
+        record = self._records[i]
+        if record is None:
+            offsets = self._arrays["record_offsets"]
+            record = json.loads(self._arrays["record_blob"][offsets[i] : offsets[i + 1]].tobytes())
+            self._records[i] = record
+        return record
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._record(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("teacher index out of range")
+        return self._record(i)
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        for i in range(len(self)):
+            yield self._record(i)
+
+    def teacher_ids(self) -> list[str]:
+        offsets, blob = self._arrays["id_offsets"], self._arrays["id_blob"]
+        return [blob[offsets[i] : offsets[i + 1]].tobytes().decode("utf-8") for i in range(len(self))]
+
+    def index_of(self, teacher_id: str) -> int | None:
+        """Catalogue index of a teacher_id, from the id table (no records decoded)."""
+        if self._ids is None:
+            self._ids = {tid: i for i, tid in enumerate(self.teacher_ids())}
+        return self._ids.get(teacher_id.strip())
+
+    def subjects(self) -> list[str]:
+        return list(self.header["subjects"])
+
+    def subject_indices(self, subject: str) -> list[int]:
+        """Catalogue indices of a subject's teachers, in catalogue order."""
+        start, end = self.header["subjects"].get(subject.strip(), (0, 0))
+        return self._arrays["subject_order"][start:end].tolist()
+
+
+def load_snapshot(path: str | Path = SNAPSHOT_PATH, source_sha256: str | None = None) -> CatalogueSnapshot | None:
+    """
+    Map the snapshot. Returns None if it is missing, unreadable, of another format version or
+    dimension set, or was built from a different teachers.json (source_sha256).
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        snapshot = CatalogueSnapshot(path)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+    if snapshot.header.get("format_version") != FORMAT_VERSION or snapshot.header.get("dimensions") != DIMENSION_KEYS:
+        return None
+    if source_sha256 is not None and snapshot.source_sha256 != source_sha256:
+        return None
+    return snapshot
+
+
+# ── CLI ──────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    import argparse
+
+    from archetypes import file_sha256
+    from matching import load_teachers
+
+    parser = argparse.ArgumentParser(description="Compile teachers.json into a binary snapshot workers mmap at startup.")
+    parser.add_argument("command", choices=["build-snapshot", "check"])
+    parser.add_argument("--teachers", type=Path, default=None, help="teachers.json to compile (default: the API's)")
+    parser.add_argument("--out", type=Path, default=SNAPSHOT_PATH, help=f"snapshot path (default {SNAPSHOT_PATH.name})")
+    args = parser.parse_args()
+
+    if args.teachers is None:
+        # Same catalogue the API serves
+        from main import TEACHERS_PATH
+
+        args.teachers = TEACHERS_PATH
+    source_sha = file_sha256(args.teachers)
+    current = load_snapshot(args.out, source_sha256=source_sha)
+
+    if args.command == "check":
+        if current is None:
+            print(f"{args.out} is missing or stale for {args.teachers}; run: python catalogue_snapshot.py build-snapshot")
+            raise SystemExit(1)
+        print(f"{args.out} is up to date ({len(current)} teachers).")
+        raise SystemExit(0)
+
+    teachers = load_teachers(args.teachers)
+    build_snapshot(teachers, source_sha, args.out)
+    print(f"Wrote {args.out}: {len(teachers)} teachers, {len({_subject(t) for t in teachers})} subjects, {args.out.stat().st_size} bytes")
@@ -0,0 +1,170 @@
+"""
+collab.py — like-driven collaborative re-ranking.
+
+Builds the student × teacher like matrix from likes.json in CSR form, derives item-item
+co-like counts from it (teachers liked by the same students), and blends the resulting
+cosine similarity into the persona-distance ranking for a student's top candidates:
+
+  similarity(t, l) = co_likes(t, l) / sqrt(likes(t) * likes(l))
+  co_like(t)       = sum of similarity(t, l) over the student's liked teachers l, scaled to 0–1
+                     (counts without the student's own likes)
+  blended          = (1 - weight) * compatibility_score + weight * 100 * co_like(t)
+
+Only the top candidates are re-ordered, so the cost per request is O(k × liked teachers).
+Likes added or removed later update the counts incrementally (no rebuild).
+"""
+
+import threading
+from typing import Any
+
+import numpy as np
+
+
+def likes_to_csr(likes: dict[str, list[str]]) -> tuple[np.ndarray, np.ndarray, list[str], list[str]]:
+    """(indptr, indices, student_ids, teacher_ids): CSR rows = students, columns = liked teachers."""
+    student_ids: list[str] = []
+    teacher_ids: list[str] = []
+    teacher_index: dict[str, int] = {}
+    indptr = [0]
+    indices: list[int] = []
+    for sid, tids in likes.items():
+        if not sid or not isinstance(tids, list):
+            continue
+        row = set()
+        for tid in tids:
+            tid = (tid or "").strip()
+            if not tid:
+                continue
+            if tid not in teacher_index:
+                teacher_index[tid] = len(teacher_ids)
+                teacher_ids.append(tid)
+            row.add(teacher_index[tid])
+        student_ids.append(sid.strip())
+        indices.extend(sorted(row))
+        indptr.append(len(indices))
+    return np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int32), student_ids, teacher_ids
+
+
+class CoLikeModel:
+    """Item-item co-like counts, kept sparse (teacher → {teacher: count}) and updated incrementally."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.student_likes: dict[str, set[str]] = {}
+        self.like_counts: dict[str, int] = {}
+        self.co_likes: dict[str, dict[str, int]] = {}
+
+    @classmethod
+    def from_likes(cls, likes: dict[str, list[str]]) -> "CoLikeModel":
+        """
+        Offline build: co-like counts are the off-diagonal entries of X^T X for the CSR like
+        matrix X (its diagonal is the like counts), computed without scipy by expanding every
+        row into its (a, b) teacher pairs and counting them with np.unique.
+        """
+        model = cls()
+        indptr, indices, student_ids, teacher_ids = likes_to_csr(likes)
+        counts = np.bincount(indices, minlength=len(teacher_ids))
+        model.like_counts = {tid: int(c) for tid, c in zip(teacher_ids, counts)}
+        for r, sid in enumerate(student_ids):
+            model.student_likes.setdefault(sid, set()).update(teacher_ids[i] for i in indices[indptr[r] : indptr[r + 1]])
+
+        # Entry p of X pairs with every entry of its row: repeat it len(row) times against that row
+        lengths = np.diff(indptr)
+        per_entry = np.repeat(lengths, lengths)
+        starts = np.repeat(indptr[:-1], lengths)
+        a = np.repeat(indices, per_entry).astype(np.int64)
+        offsets = np.arange(len(a)) - np.repeat(np.cumsum(per_entry) - per_entry, per_entry)
+        b = indices[np.repeat(starts, per_entry) + offsets].astype(np.int64)
+        keep = a != b
+        n = max(1, len(teacher_ids))
+        pairs, pair_counts = np.unique(a[keep] * n + b[keep], return_counts=True)
+        for pair, count in zip(pairs.tolist(), pair_counts.tolist()):
+            x, y = divmod(pair, n)
+            model.co_likes.setdefault(teacher_ids[x], {})[teacher_ids[y]] = count
+        return model
+
+    def add_like(self, student_id: str, teacher_id: str) -> None:
+        student_id, teacher_id = student_id.strip(), teacher_id.strip()
+        with self._lock:
+            liked = self.student_likes.setdefault(student_id, set())
+            if teacher_id in liked:
+                return
+            for other in liked:
+                self._bump(teacher_id, other, 1)
+            liked.add(teacher_id)
+            self.like_counts[teacher_id] = self.like_counts.get(teacher_id, 0) + 1
+
+    def remove_like(self, student_id: str, teacher_id: str) -> None:
+        student_id, teacher_id = student_id.strip(), teacher_id.strip()
+        with self._lock:
+            liked = self.student_likes.get(student_id) or set()
+            if teacher_id not in liked:
+                return
+            liked.discard(teacher_id)
+            for other in liked:
+                self._bump(teacher_id, other, -1)
+            self.like_counts[teacher_id] = max(0, self.like_counts.get(teacher_id, 0) - 1)
+
+    def _bump(self, a: str, b: str, delta: int) -> None:
+        for x, y in ((a, b), (b, a)):
+            neighbours = self.co_likes.setdefault(x, {})
+            count = neighbours.get(y, 0) + delta
+            if count > 0:
+                neighbours[y] = count
+            else:
+                neighbours.pop(y, None)
+
+    def co_like_scores(self, candidate_ids: list[str], liked_ids: list[str], exclude_student: str | None = None) -> np.ndarray:
+        """
+        Summed cosine co-like similarity of each candidate to the liked teachers (unscaled). With
+        exclude_student, that student's row of the like matrix is left out of the counts.
+        """
+        liked_index = {l: j for j, l in enumerate(liked_ids)}
+        sims = np.zeros((len(candidate_ids), len(liked_ids)), dtype=np.float64)
+        with self._lock:
+            # Only co-liked pairs are written; walk whichever side is smaller
+            for i, c in enumerate(candidate_ids):
+                neighbours = self.co_likes.get(c)
+                if not neighbours:
+                    continue
+                if len(neighbours) < len(liked_index):
+                    for l, count in neighbours.items():
+                        if l in liked_index:
+                            sims[i, liked_index[l]] = count
+                else:
+                    for l, j in liked_index.items():
+                        sims[i, j] = neighbours.get(l, 0)
+            cand_counts = np.fromiter((self.like_counts.get(c, 0) for c in candidate_ids), dtype=np.float64, count=len(candidate_ids))
+            liked_counts = np.fromiter((self.like_counts.get(l, 0) for l in liked_ids), dtype=np.float64, count=len(liked_ids))
+            own = set(self.student_likes.get(exclude_student) or ()) if exclude_student is not None else set()
+        if own:
+            cand_own = np.fromiter((c in own for c in candidate_ids), dtype=bool, count=len(candidate_ids))
+            liked_own = np.fromiter((l in own for l in liked_ids), dtype=bool, count=len(liked_ids))
+            cand_counts -= cand_own
+            liked_counts -= liked_own
+            # The student co-liked every pair of their own likes once (never a teacher with itself)
+            pairs = np.outer(cand_own, liked_own)
+            pairs &= np.array(candidate_ids, dtype=object)[:, None] != np.array(liked_ids, dtype=object)[None, :]
+            sims -= pairs
+        norm = np.sqrt(np.outer(cand_counts, liked_counts))
+        return np.divide(sims, norm, out=np.zeros_like(sims), where=norm > 0).sum(axis=1)
+
+    def rerank(self, ranked: list[dict[str, Any]], student_id: str, weight: float, top_k: int = 20) -> list[dict[str, Any]]:
+        """
+        Blend co-like similarity into the top_k entries of a rank_teachers result for this student
+        and re-order them; the tail is left as is. The student's own likes are left out of the
+        counts, so teachers they already liked are not boosted by their own co-likes. Adds
+        "co_like" (0–1) and the blended "collab_score" (0–100) to re-ranked entries.
+        """
+        with self._lock:
+            liked_ids = sorted(self.student_likes.get(student_id) or ())
+        head, tail = ranked[:top_k], ranked[top_k:]
+        if not liked_ids or not head or weight <= 0:
+            return ranked
+        scores = self.co_like_scores([r.get("teacher_id") or "" for r in head], liked_ids, exclude_student=student_id)
+        if scores.max() > 0:
+            scores = scores / scores.max()
+        compat = np.array([r.get("compatibility_score") or 0.0 for r in head], dtype=np.float64)
+        blended = (1.0 - weight) * compat + weight * 100.0 * scores
+        order = np.argsort(-blended, kind="stable")
+        return [dict(head[i], co_like=round(float(scores[i]), 3), collab_score=round(float(blended[i]), 3)) for i in order] + tail
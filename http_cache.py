@@ -0,0 +1,150 @@
+"""
+http_cache.py — pre-serialized JSON responses with strong ETags, conditional GETs and compression.
+
+Responses are cached per key (callers put a data version in the key, e.g. the teacher catalogue
+hash), so a version is serialized, hashed and compressed at most once:
+
+  return http_cache.json_response(request, ("teachers", version), lambda: {"teachers": teachers},
+                                  cache_control="public, max-age=60")
+
+Data that should not be kept in memory (per-user listings, one-off pages) goes through
+versioned_response instead: its ETag is a hash of the key, so a matching If-None-Match gets
+304 without building the body, and a built body is sent once and not cached.
+
+A request whose If-None-Match matches gets 304 with no body. Otherwise the body is sent with
+Content-Encoding br (if the brotli package is installed) or gzip, when the client accepts it.
+Each encoding is its own representation with its own strong ETag ("<hash>", "<hash>-gz",
+"<hash>-br"); If-None-Match with any of them matches the body they were derived from.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # type: ignore
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+# ETag suffix per Content-Encoding
+ETAG_SUFFIXES = {"gzip": "-gz", "br": "-br"}
+CACHE_MAX_ENTRIES = 256
+
+
+class CachedBody:
+    """One serialized JSON body with its content hash and lazily computed compressed variants."""
+
+    def __init__(self, payload: Any, body_hash: str | None = None):
+        # Same serialization as FastAPI's JSONResponse
+        self.raw = json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+        self.hash = body_hash or hashlib.sha256(self.raw).hexdigest()[:32]
+        self._encoded: dict[str, bytes] = {}
+
+    def etag(self, encoding: str | None = None) -> str:
+        return f'"{self.hash}{ETAG_SUFFIXES.get(encoding, "")}"'
+
+    def encoded(self, encoding: str) -> bytes:
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = brotli.compress(self.raw) if encoding == "br" else gzip.compress(self.raw, compresslevel=6)
+            self._encoded[encoding] = body
+        return body
+
+
+_cache: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+
+
+def _get_body(key: Hashable, build: Callable[[], Any]) -> CachedBody:
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+            return entry
+    entry = CachedBody(build())
+    with _lock:
+        _cache[key] = entry
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return entry
+
+
+def clear() -> None:
+    """Drop every cached body (versions in keys normally make this unnecessary)."""
+    with _lock:
+        _cache.clear()
+
+
+def _etag_matches(if_none_match: str | None, body_hash: str) -> bool:
+    """True if If-None-Match names any encoding of the body with this hash (or is *)."""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    for candidate in candidates:
+        tag = candidate.removeprefix("W/").strip('"')
+        for suffix in ETAG_SUFFIXES.values():
+            tag = tag.removesuffix(suffix)
+        if tag == body_hash:
+            return True
+    return False
+
+
+def _pick_encoding(accept_encoding: str | None) -> str | None:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            k, _, v = param.strip().partition("=")
+            if k.strip().lower() == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def json_response(request: Request, key: Hashable, build: Callable[[], Any], cache_control: str) -> Response:
+    """Cached JSON response for key (build() is called only on a cache miss), honouring If-None-Match."""
+    return _send(request, _get_body(key, build), cache_control)
+
+
+def versioned_response(request: Request, key: Hashable, build: Callable[[], Any], cache_control: str) -> Response:
+    """
+    Uncached JSON response with an ETag derived from key, which must change whenever the data
+    does (carry the data version). build() is called only when the client's copy is not current.
+    """
+    key_hash = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32]
+    if _etag_matches(request.headers.get("if-none-match"), key_hash):
+        encoding = _pick_encoding(request.headers.get("accept-encoding"))
+        headers = {"ETag": f'"{key_hash}{ETAG_SUFFIXES.get(encoding, "")}"', "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        return Response(status_code=304, headers=headers)
+    return _send(request, CachedBody(build(), key_hash), cache_control)
+
+
+def _send(request: Request, body: CachedBody, cache_control: str) -> Response:
+    encoding = _pick_encoding(request.headers.get("accept-encoding")) if len(body.raw) >= MIN_COMPRESS_BYTES else None
+    headers = {"ETag": body.etag(encoding), "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), body.hash):
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(content=body.raw, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(content=body.encoded(encoding), media_type="application/json", headers=headers)
@@ -0,0 +1,283 @@
+"""
+like_analytics.py — append-only like/unlike event log with incremental time rollups.
+
+Every like and unlike is appended to like_events.ndjson, one JSON event per line:
+
+  {"ts": 1767225600.0, "type": "like", "student_id": "stu_…", "teacher_id": "tch_…", "persona": {…}}
+
+The liker's persona is copied into the event, so trends reflect who liked a teacher at the
+time, even if the student later retakes the quiz. Each appended event also updates hourly
+and daily rollup buckets per teacher in memory:
+
+  [likes, unlikes, personas, sum(persona dim 0), …, sum(persona dim 23)]
+
+so a window is answered by summing its buckets: O(buckets × 24), independent of the number
+of likes or students. Weekly series are summed from daily buckets (weeks start on Monday, UTC).
+
+Rollups are checkpointed to like_rollups.json together with the byte offset of the log they
+cover; loading reads the checkpoint and replays only the events appended after it. When no
+log exists yet, the likes already in likes.json are backfilled as "like" events stamped with
+the file's modification time.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from matching import DIMENSION_KEYS
+
+BASE_DIR = Path(__file__).resolve().parent
+EVENTS_PATH = Path(os.environ["UNITINDER_LIKE_EVENTS_PATH"]) if os.environ.get("UNITINDER_LIKE_EVENTS_PATH") else BASE_DIR / "like_events.ndjson"
+ROLLUPS_PATH = Path(os.environ["UNITINDER_LIKE_ROLLUPS_PATH"]) if os.environ.get("UNITINDER_LIKE_ROLLUPS_PATH") else BASE_DIR / "like_rollups.json"
+ROLLUP_VERSION = 1
+CHECKPOINT_EVERY = 500  # appended events between rollup checkpoints
+MAX_BUCKETS = 2000  # per timeseries query
+
+HOUR = 3600
+DAY = 86400
+GRANULARITIES = {"hour": HOUR, "day": DAY, "week": 7 * DAY}
+DEFAULT_WINDOW_BUCKETS = {"hour": 48, "day": 30, "week": 12}
+_LIKES, _UNLIKES, _PERSONAS, _SUMS = 0, 1, 2, 3
+# 1970-01-01 was a Thursday: Monday-aligned weeks are offset by 4 days
+_WEEK_OFFSET = 4 * DAY
+
+
+def bucket_start(ts: float, granularity: str) -> int:
+    if granularity == "week":
+        return int((ts - _WEEK_OFFSET) // GRANULARITIES["week"]) * GRANULARITIES["week"] + _WEEK_OFFSET
+    size = GRANULARITIES[granularity]
+    return int(ts // size) * size
+
+
+def _new_bucket() -> list[float]:
+    return [0, 0, 0] + [0.0] * len(DIMENSION_KEYS)
+
+
+class LikeAnalytics:
+    """Event log writer and per-teacher hourly/daily rollups; safe to share between threads."""
+
+    def __init__(self, events_path: Path = EVENTS_PATH, rollups_path: Path = ROLLUPS_PATH):
+        self.events_path = Path(events_path)
+        self.rollups_path = Path(rollups_path)
+        self._lock = threading.Lock()
+        # teacher_id → {"hour"|"day": {bucket start: bucket}}
+        self._rollups: dict[str, dict[str, dict[int, list[float]]]] = {}
+        self._offset = 0  # bytes of the log reflected in _rollups
+        self._since_checkpoint = 0
+
+    # ── Loading ──────────────────────────────────────────────────────
+
+    def load(
+        self,
+        likes: dict[str, list[str]] | None = None,
+        personas: dict[str, dict[str, float]] | None = None,
+        likes_mtime: float | None = None,
+    ) -> None:
+        """
+        Restore the rollups from the checkpoint and replay newer events. Without a log, likes
+        (likes.json data) are backfilled as events stamped likes_mtime, with personas from
+        `personas` (student_id → persona).
+        """
+        with self._lock:
+            if not self.events_path.exists() and likes:
+                self._backfill(likes, personas or {}, time.time() if likes_mtime is None else likes_mtime)
+            self._rollups, self._offset = {}, 0
+            checkpoint = self._read_checkpoint()
+            if checkpoint is not None:
+                self._rollups, self._offset = checkpoint
+            replayed = self._replay()
+            if replayed:
+                self._checkpoint()
+
+    def _backfill(self, likes: dict[str, list[str]], personas: dict[str, dict[str, float]], ts: float) -> None:
+        self.events_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.events_path, "a", encoding="utf-8") as f:
+            for sid, tids in likes.items():
+                if not sid or not isinstance(tids, list):
+                    continue
+                for tid in tids:
+                    if (tid or "").strip():
+                        f.write(json.dumps(self._event(ts, "like", sid, tid.strip(), personas.get(sid), backfill=True)) + "\n")
+
+    def _read_checkpoint(self) -> tuple[dict, int] | None:
+        try:
+            with open(self.rollups_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if data.get("version") != ROLLUP_VERSION or data.get("dimensions") != DIMENSION_KEYS:
+            return None
+        offset = int(data.get("offset") or 0)
+        if not self.events_path.exists() or self.events_path.stat().st_size < offset:
+            return None  # log replaced or truncated: rebuild from scratch
+        rollups = {
+            tid: {g: {int(start): bucket for start, bucket in buckets.items()} for g, buckets in per.items()}
+            for tid, per in data.get("teachers", {}).items()
+        }
+        return rollups, offset
+
+    def _replay(self) -> int:
+        """Apply events after self._offset; returns how many."""
+        if not self.events_path.exists():
+            return 0
+        count = 0
+        with open(self.events_path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written last line: picked up by the next load
+                self._offset += len(line)
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._apply(event)
+                count += 1
+        return count
+
+    def _checkpoint(self) -> None:
+        data = {
+            "version": ROLLUP_VERSION,
+            "dimensions": DIMENSION_KEYS,
+            "offset": self._offset,
+            "teachers": {tid: {g: {str(s): b for s, b in buckets.items()} for g, buckets in per.items()} for tid, per in self._rollups.items()},
+        }
+        self.rollups_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.rollups_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, self.rollups_path)
+        self._since_checkpoint = 0
+
+    # ── Writing ──────────────────────────────────────────────────────
+
+    @staticmethod
+    def _event(ts: float, kind: str, student_id: str, teacher_id: str, persona: dict | None, backfill: bool = False) -> dict:
+        event = {"ts": round(ts, 3), "type": kind, "student_id": student_id, "teacher_id": teacher_id}
+        if persona:
+            event["persona"] = {d: persona[d] for d in DIMENSION_KEYS if isinstance(persona.get(d), (int, float))}
+        if backfill:
+            event["backfill"] = True
+        return event
+
+    def _apply(self, event: dict) -> None:
+        tid = (event.get("teacher_id") or "").strip()
+        kind = event.get("type")
+        if not tid or kind not in ("like", "unlike"):
+            return
+        ts = float(event.get("ts") or 0)
+        persona = event.get("persona") or {}
+        per = self._rollups.setdefault(tid, {"hour": {}, "day": {}})
+        for granularity in ("hour", "day"):
+            bucket = per[granularity].setdefault(bucket_start(ts, granularity), _new_bucket())
+            if kind == "unlike":
+                bucket[_UNLIKES] += 1
+                continue
+            bucket[_LIKES] += 1
+            if persona:
+                bucket[_PERSONAS] += 1
+                for j, d in enumerate(DIMENSION_KEYS):
+                    bucket[_SUMS + j] += float(persona.get(d, 0.5))
+
+    def record(self, kind: str, student_id: str, teacher_id: str, persona: dict[str, float] | None = None, ts: float | None = None) -> None:
+        """Append a like/unlike event and fold it into the rollups."""
+        event = self._event(time.time() if ts is None else ts, kind, student_id, teacher_id, persona)
+        line = (json.dumps(event) + "\n").encode("utf-8")
+        with self._lock:
+            self.events_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.events_path, "ab") as f:
+                f.write(line)
+            if self._offset + len(line) == self.events_path.stat().st_size:
+                self._offset += len(line)
+                self._apply(event)
+            else:
+                self._replay()  # another process appended too: catch up in log order
+            self._since_checkpoint += 1
+            if self._since_checkpoint >= CHECKPOINT_EVERY:
+                self._checkpoint()
+
+    def checkpoint(self) -> None:
+        with self._lock:
+            self._checkpoint()
+
+    # ── Queries ──────────────────────────────────────────────────────
+
+    def timeseries(self, teacher_id: str, granularity: str = "day", start: float | None = None, end: float | None = None, persona: bool = True) -> dict[str, Any]:
+        """
+        Likes, unlikes and average new-liker persona per bucket in [start, end) (epoch seconds,
+        aligned down to bucket boundaries), plus window totals. Raises ValueError on a bad window.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {sorted(GRANULARITIES)}")
+        size = GRANULARITIES[granularity]
+        end_bucket = bucket_start(time.time() if end is None else end, granularity)
+        if end is None or end > end_bucket:
+            end_bucket += size  # include the bucket end falls in
+        first = bucket_start(start, granularity) if start is not None else end_bucket - DEFAULT_WINDOW_BUCKETS[granularity] * size
+        if first >= end_bucket:
+            raise ValueError("start must be before end")
+        if (end_bucket - first) // size > MAX_BUCKETS:
+            raise ValueError(f"window spans more than {MAX_BUCKETS} {granularity} buckets")
+
+        # Weeks are summed from daily buckets
+        source, step = ("day", DAY) if granularity == "week" else (granularity, size)
+        with self._lock:
+            if self.events_path.exists() and self.events_path.stat().st_size > self._offset:
+                self._replay()  # events appended by other workers
+            buckets = self._rollups.get(teacher_id.strip(), {}).get(source, {})
+            series = []
+            total = _new_bucket()
+            for b in range(first, end_bucket, size):
+                acc = _new_bucket()
+                for s in range(b, b + size, step):
+                    bucket = buckets.get(s)
+                    if bucket is not None:
+                        for i, v in enumerate(bucket):
+                            acc[i] += v
+                for i, v in enumerate(acc):
+                    total[i] += v
+                series.append((b, acc))
+        return {
+            "granularity": granularity,
+            "start": _iso(first),
+            "end": _iso(end_bucket),
+            "buckets": [dict(start=_iso(b), **_summarize(acc, persona)) for b, acc in series],
+            "totals": _summarize(total, persona),
+        }
+
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _summarize(bucket: list[float], persona: bool) -> dict[str, Any]:
+    likes, unlikes, n = int(bucket[_LIKES]), int(bucket[_UNLIKES]), bucket[_PERSONAS]
+    out: dict[str, Any] = {"likes": likes, "unlikes": unlikes, "net": likes - unlikes}
+    if persona:
+        out["average_liker_persona"] = (
+            {d: round(bucket[_SUMS + j] / n, 3) for j, d in enumerate(DIMENSION_KEYS)} if n else None
+        )
+    return out
+
+
+def parse_time(value: str | None) -> float | None:
+    """Epoch seconds from an ISO 8601 date/datetime (UTC unless it has an offset) or a number."""
+    if value is None or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"invalid time {value!r}: use ISO 8601 or epoch seconds") from None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
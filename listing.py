@@ -0,0 +1,215 @@
+"""
+listing.py — cursor pagination, field projection and NDJSON export for list endpoints.
+
+Pages are ordered by record id, and the cursor is the (opaque, base64url) id of the last
+record returned, so pages stay stable while records are added. A page is selected with a
+bounded heap over a stream of records: memory is O(limit), not O(records).
+
+iter_json_array streams the elements of a JSON array (top-level, or under a key of the
+top-level object, e.g. students.json's "students") one record at a time, so exports and
+pages never hold the whole file in memory.
+"""
+
+import base64
+import heapq
+import json
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+_READ_CHUNK = 1 << 16
+_decoder = json.JSONDecoder()
+
+
+class ListingError(ValueError):
+    """Invalid cursor, page size or field list (reported as 400)."""
+
+
+def encode_cursor(record_id: str) -> str:
+    return base64.urlsafe_b64encode(record_id.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        raise ListingError("invalid cursor") from None
+
+
+def page_size(limit: int | None) -> int:
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    if limit < 1:
+        raise ListingError("limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_fields(fields: str | None) -> list[str] | None:
+    """Comma-separated field names (None = all fields)."""
+    if fields is None:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    if not names:
+        raise ListingError("fields must name at least one field")
+    return names
+
+
+def projector(fields: list[str] | None = None, exclude: list[str] | None = None) -> Callable[[dict], dict]:
+    """Function keeping only `fields` (in that order) and dropping `exclude` from a record."""
+    drop = set(exclude or ())
+
+    def project(record: dict[str, Any]) -> dict[str, Any]:
+        if fields is not None:
+            return {f: record[f] for f in fields if f in record and f not in drop}
+        if drop:
+            return {k: v for k, v in record.items() if k not in drop}
+        return record
+
+    return project
+
+
+def page_after(
+    records: Iterable[dict[str, Any]], key: Callable[[dict], str], after: str | None, limit: int
+) -> tuple[list[dict[str, Any]], str | None]:
+    """
+    The `limit` records with the smallest ids greater than `after`, in id order, plus the
+    cursor for the next page (None on the last page).
+    """
+    candidates = (r for r in records if after is None or key(r) > after)
+    # One extra record tells whether another page follows
+    page = heapq.nsmallest(limit + 1, candidates, key=key)
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, encode_cursor(key(page[-1]))
+
+
+def ndjson_lines(records: Iterable[dict[str, Any]]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class _Reader:
+    """Buffered text reader with just enough API for incremental raw_decode."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(_READ_CHUNK)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at end of file), not consumed."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"expected {char!r}", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof and isinstance(value, (int, float)):
+                if self.fill():
+                    continue
+            self.pos = end
+            return value
+
+    def array(self) -> Iterator[Any]:
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def iter_json_array(path: str | Path, key: str | None = None) -> Iterator[Any]:
+    """
+    Elements of the JSON array at the top level of path, or under `key` of a top-level object
+    (a file holding a bare array is streamed as is). Yields nothing if the key is missing.
+    """
+    with open(path, encoding="utf-8") as f:
+        yield from iter_json_stream(f, key)
+
+
+def iter_json_stream(f, key: str | None = None) -> Iterator[Any]:
+    """iter_json_array over an open text file (e.g. an uploaded request body)."""
+    reader = _Reader(f)
+    if reader.peek() == "[":
+        yield from reader.array()
+        return
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            yield from reader.array()
+            return
+        reader.value()  # skip
+        if reader.peek() == ",":
+            reader.pos += 1
+            continue
+        reader.expect("}")
+        return
+
+
+def object_fields(path: str | Path, skip: str) -> dict[str, Any]:
+    """
+    Top-level fields of the JSON object in path other than `skip`, whose value (an array) is
+    streamed past rather than loaded. {} if the file holds a bare array.
+    """
+    fields: dict[str, Any] = {}
+    with open(path, encoding="utf-8") as f:
+        reader = _Reader(f)
+        if reader.peek() != "{":
+            return fields
+        reader.expect("{")
+        if reader.peek() == "}":
+            return fields
+        while True:
+            name = reader.value()
+            reader.expect(":")
+            if name == skip and reader.peek() == "[":
+                for _ in reader.array():
+                    pass
+            else:
+                fields[name] = reader.value()
+            if reader.peek() == ",":
+                reader.pos += 1
+                continue
+            reader.expect("}")
+            return fields
@@ -0,0 +1,229 @@
+"""
+driver.py — concurrent load driver for the Unitinder API.
+
+Runs each endpoint scenario with every worker count for a fixed duration and reports
+p50/p95/p99 latency and throughput per (endpoint, workers). Every request uses a fresh random
+persona, so ranking, summary and study-plan caches do not hide upstream cost.
+
+Against a running API (pointed at loadtest/mock_providers.py or anything else):
+  python loadtest/driver.py --base-url http://127.0.0.1:8000 --workers 1,8,32 --duration 20
+
+Self-contained: start the mock providers and `uvicorn main:app --workers N` against them
+(the real .env is not loaded, so no provider quota is used). Several uvicorn worker counts
+are swept one after another, each with a freshly started API:
+  python loadtest/driver.py --spawn --uvicorn-workers 1,2,4 --latency-ms 800 --error-rate 0.02
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import mock_providers  # noqa: E402
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+from matching import DIMENSION_KEYS  # noqa: E402
+
+TOPICS = ["Limits", "Derivatives", "Recursion", "Photosynthesis", "The French Revolution", "Thermodynamics", "Hash tables"]
+ENDPOINTS = ["match", "study-plan", "study-plan-stream", "teacher-preview"]
+
+
+def _persona(rng: random.Random) -> dict[str, float]:
+    return {d: round(rng.random(), 3) for d in DIMENSION_KEYS}
+
+
+def build_request(endpoint: str, teachers: list[dict], rng: random.Random) -> tuple[str, str, dict]:
+    """(method, path, json body) for one request of a scenario."""
+    teacher = rng.choice(teachers)
+    if endpoint == "match":
+        return "POST", "/api/match", {"studentPersona": _persona(rng), "subject": teacher.get("subject") if rng.random() < 0.5 else None}
+    if endpoint in ("study-plan", "study-plan-stream"):
+        path = "/api/learn/study-plan/stream" if endpoint == "study-plan-stream" else "/api/learn/study-plan"
+        return "POST", path, {"teacherId": teacher["teacher_id"], "studentPersona": _persona(rng), "topic": rng.choice(TOPICS)}
+    if endpoint == "teacher-preview":
+        voiced = [t for t in teachers if t.get("voice_id")] or teachers
+        return "POST", "/api/voice/teacher-preview", {"teacher_id": rng.choice(voiced)["teacher_id"], "topic": f"{rng.choice(TOPICS)} {rng.randint(1, 10**6)}"}
+    raise ValueError(f"Unknown endpoint {endpoint!r}")
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100.0 * len(sorted_values)) - 1))]
+
+
+def run_scenario(base_url: str, endpoint: str, workers: int, duration: float, timeout: float, teachers: list[dict], seed: int) -> dict:
+    """Run `workers` closed-loop clients against one endpoint for `duration` seconds."""
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        with httpx.Client(base_url=base_url, timeout=timeout) as client:
+            while time.monotonic() < deadline:
+                method, path, body = build_request(endpoint, teachers, rng)
+                start = time.perf_counter()
+                try:
+                    response = client.request(method, path, json=body)
+                    response.read()  # whole body, streaming endpoints included
+                    error = None if response.status_code < 400 else str(response.status_code)
+                except httpx.HTTPError as e:
+                    error = type(e).__name__
+                elapsed = (time.perf_counter() - start) * 1000.0
+                with lock:
+                    if error is None:
+                        latencies.append(elapsed)
+                    else:
+                        errors[error] = errors.get(error, 0) + 1
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "endpoint": endpoint,
+        "workers": workers,
+        "ok": len(latencies),
+        "errors": sum(errors.values()),
+        "error_codes": errors,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+    }
+
+
+def print_table(results: list[dict]) -> None:
+    header = f"{'endpoint':<20} {'uvicorn':>7} {'workers':>7} {'ok':>7} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['endpoint']:<20} {r.get('uvicorn_workers') or '-':>7} {r['workers']:>7} {r['ok']:>7} {r['errors']:>7} {r['throughput_rps']:>8} "
+            f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}"
+            + (f"  {r['error_codes']}" if r["error_codes"] else "")
+        )
+
+
+def _wait_healthy(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=2.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f"API at {base_url} did not become healthy within {timeout:.0f}s")
+
+
+def start_mocks(args: argparse.Namespace) -> None:
+    """Start the mock providers in this process (daemon threads)."""
+    config = mock_providers.config_from_args(args)
+    mock_providers.serve(mock_providers.OpenAIHandler, args.openai_port, config)
+    mock_providers.serve(mock_providers.ElevenLabsHandler, args.elevenlabs_port, config)
+
+
+def spawn_api(args: argparse.Namespace, uvicorn_workers: int) -> subprocess.Popen:
+    """Start uvicorn with `uvicorn_workers` workers against the mock providers; returns the uvicorn process."""
+    env = dict(os.environ)
+    env.update(
+        {
+            "UNITINDER_SKIP_DOTENV": "1",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{args.openai_port}/v1/",
+            "OPENAI_API_KEY": "mock",
+            "ELEVENLABS_BASE_URL": f"http://127.0.0.1:{args.elevenlabs_port}",
+            "ELEVENLABS_API_KEY": "mock",
+            "UNITINDER_DISABLE_AI_SUMMARY": "0",
+        }
+    )
+    # Measure the API, not the default provider rate limits (override by exporting them)
+    for provider in ("OPENAI", "ELEVENLABS"):
+        env.setdefault(f"UNITINDER_{provider}_RPS", "10000")
+        env.setdefault(f"UNITINDER_{provider}_BURST", "10000")
+        env.setdefault(f"UNITINDER_{provider}_MAX_CONCURRENCY", "1024")
+    cmd = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1",
+        "--port", str(args.api_port),
+        "--workers", str(uvicorn_workers),
+        "--log-level", "warning",
+    ]  # fmt: skip
+    return subprocess.Popen(cmd, cwd=BASE_DIR, env=env)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the Unitinder API and report latency percentiles.")
+    parser.add_argument("--base-url", default=None, help="API to test (default: the spawned one, or http://127.0.0.1:8000)")
+    parser.add_argument("--endpoints", default="match,study-plan,teacher-preview", help=f"comma-separated, from {', '.join(ENDPOINTS)}")
+    parser.add_argument("--workers", default="1,4,16", help="comma-separated concurrent client counts")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per (endpoint, workers) run")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--json", type=Path, default=None, help="also write results to this file")
+    spawn = parser.add_argument_group("spawned API and mock providers")
+    spawn.add_argument("--spawn", action="store_true", help="start mock providers and uvicorn against them")
+    spawn.add_argument("--uvicorn-workers", default="1", help="comma-separated uvicorn worker counts, each run against a fresh API")
+    spawn.add_argument("--api-port", type=int, default=8765)
+    spawn.add_argument("--openai-port", type=int, default=mock_providers.OPENAI_PORT)
+    spawn.add_argument("--elevenlabs-port", type=int, default=mock_providers.ELEVENLABS_PORT)
+    mock_providers.add_config_arguments(spawn)
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {sorted(unknown)}")
+    worker_counts = [int(w) for w in args.workers.split(",") if w.strip()]
+    uvicorn_counts = [int(w) for w in args.uvicorn_workers.split(",") if w.strip()]
+    if not args.spawn and len(uvicorn_counts) > 1:
+        parser.error("sweeping --uvicorn-workers needs --spawn")
+
+    if args.spawn:
+        start_mocks(args)
+        base_url = args.base_url or f"http://127.0.0.1:{args.api_port}"
+    else:
+        base_url = args.base_url or "http://127.0.0.1:8000"
+    results = []
+    for uvicorn_workers in uvicorn_counts if args.spawn else [None]:
+        api = spawn_api(args, uvicorn_workers) if args.spawn else None
+        try:
+            _wait_healthy(base_url)
+            teachers = httpx.get(f"{base_url}/api/teachers", params={"fields": "teacher_id,subject,voice_id"}, timeout=30.0).json()["teachers"]
+            for workers in worker_counts:
+                for endpoint in endpoints:
+                    result = run_scenario(base_url, endpoint, workers, args.duration, args.timeout, teachers, args.seed or 1)
+                    result["uvicorn_workers"] = uvicorn_workers
+                    results.append(result)
+                    label = f"{uvicorn_workers} uvicorn, " if uvicorn_workers else ""
+                    print(f"  {endpoint} × {label}{workers} workers: {result['ok']} ok, {result['errors']} errors, p95 {result['p95_ms']} ms", flush=True)
+        finally:
+            if api is not None:
+                api.terminate()
+                api.wait(timeout=30)
+    print()
+    print_table(results)
+    if args.json:
+        args.json.write_text(json.dumps({"base_url": base_url, "duration_s": args.duration, "results": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
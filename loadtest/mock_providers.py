@@ -0,0 +1,276 @@
+"""
+mock_providers.py — local stand-ins for the OpenAI and ElevenLabs HTTP APIs, for load tests.
+
+Both servers answer the endpoints the API uses, after a configurable latency, and fail a
+configurable share of requests (503, or 429 with Retry-After) so the upstream governor's
+retries and circuit breaker are exercised too:
+
+  OpenAI      POST .../chat/completions        (JSON, or SSE chunks with "stream": true; markdown
+                                               content, or the modality-prompt JSON object with
+                                               response_format {"type": "json_object"})
+  ElevenLabs  POST /v1/text-to-speech/{voice}  (audio/mpeg, chunked)
+              GET  /v1/voices                  POST /v1/voices/add
+
+  python loadtest/mock_providers.py --latency-ms 800 --jitter-ms 300 --error-rate 0.02
+
+Then run the API against them:
+  OPENAI_BASE_URL=http://127.0.0.1:9101/v1/ OPENAI_API_KEY=mock \\
+  ELEVENLABS_BASE_URL=http://127.0.0.1:9102 ELEVENLABS_API_KEY=mock uvicorn main:app
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OPENAI_PORT = 9101
+ELEVENLABS_PORT = 9102
+
+_WORDS = (
+    "learning structure practice example concept review question pace focus detail summary "
+    "exercise idea theory step method context problem solution feedback reading session"
+).split()
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 500.0  # mean time to first byte
+    jitter_ms: float = 200.0  # uniform ± around the mean
+    error_rate: float = 0.0  # share of requests failed with 503 / 429
+    completion_words: int = 250  # length of chat completions
+    chunk_words: int = 4  # words per streamed SSE chunk
+    chunk_delay_ms: float = 20.0  # delay between streamed chunks
+    audio_bytes: int = 48_000  # size of a TTS response (~3 s of 128 kbps mp3)
+    audio_chunk_bytes: int = 8192
+    seed: int | None = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: MockConfig
+    rng: random.Random
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):  # keep load-test output readable
+        pass
+
+    def _random(self) -> float:
+        with self.lock:
+            return self.rng.random()
+
+    def _wait(self) -> None:
+        jitter = (self._random() * 2 - 1) * self.config.jitter_ms
+        time.sleep(max(0.0, self.config.latency_ms + jitter) / 1000.0)
+
+    def _maybe_fail(self) -> bool:
+        if self._random() >= self.config.error_rate:
+            return False
+        if self._random() < 0.5:
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit"}}, {"Retry-After": "1"})
+        else:
+            self._send_json(503, {"error": {"message": "Service unavailable (mock)", "type": "server_error"}})
+        return True
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, code: int, payload: dict, headers: dict | None = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _words(self, n: int) -> list[str]:
+        with self.lock:
+            return [self.rng.choice(_WORDS) for _ in range(n)]
+
+
+class OpenAIHandler(_Handler):
+    def do_POST(self):
+        body = self._read_body()
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON"}})
+            return
+        self._wait()
+        if self._maybe_fail():
+            return
+        words = self._words(self.config.completion_words)
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            # The modality prompts (_get_modality_prompts) are the only JSON-mode call
+            third = max(1, len(words) // 3)
+            text = json.dumps(
+                {
+                    "text_prompt": " ".join(words[:third]),
+                    "audio_prompt": " ".join(words[third : 2 * third]),
+                    "video_prompt": " ".join(words[2 * third :]),
+                }
+            )
+        else:
+            # A short outline first, so the study-plan stream's outline event fires as in production
+            text = "## Outline\n- Foundations\n- Worked examples\n- Practice\n\n" + " ".join(words)
+        model = request.get("model") or "mock-model"
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        if not request.get("stream"):
+            self._send_json(
+                200,
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": len(body) // 4, "completion_tokens": len(words), "total_tokens": len(body) // 4 + len(words)},
+                },
+            )
+            return
+
+        self._start_chunked("text/event-stream")
+        pieces = re.findall(r"\S+\s*", text)
+        for i in range(0, len(pieces), max(1, self.config.chunk_words)):
+            delta = {"content": "".join(pieces[i : i + self.config.chunk_words])}
+            if i == 0:
+                delta["role"] = "assistant"
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+            }
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            time.sleep(self.config.chunk_delay_ms / 1000.0)
+        done = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        self._write_chunk(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self._end_chunked()
+
+
+class ElevenLabsHandler(_Handler):
+    def do_GET(self):
+        if self.path.split("?")[0].rstrip("/") != "/v1/voices":
+            self._send_json(404, {"detail": f"Unknown path {self.path}"})
+            return
+        self._wait()
+        if self._maybe_fail():
+            return
+        voices = [{"voice_id": f"mock_voice_{i}", "name": f"Mock voice {i}", "category": "cloned"} for i in range(3)]
+        self._send_json(200, {"voices": voices})
+
+    def do_POST(self):
+        self._read_body()
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/v1/voices/add":
+            self._wait()
+            if not self._maybe_fail():
+                self._send_json(200, {"voice_id": f"mock_{uuid.uuid4().hex[:16]}", "requires_verification": False})
+            return
+        if not path.startswith("/v1/text-to-speech/"):
+            self._send_json(404, {"detail": f"Unknown path {self.path}"})
+            return
+        self._wait()
+        if self._maybe_fail():
+            return
+        self._start_chunked("audio/mpeg")
+        remaining = self.config.audio_bytes
+        while remaining > 0:
+            n = min(self.config.audio_chunk_bytes, remaining)
+            self._write_chunk(b"\xff\xfb" + b"\x00" * (n - 2) if n > 2 else b"\x00" * n)
+            remaining -= n
+            time.sleep(self.config.chunk_delay_ms / 1000.0)
+        self._end_chunked()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections at the end of a run are expected
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def serve(handler: type[_Handler], port: int, config: MockConfig, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Start a mock server in a daemon thread; returns the server (call shutdown() to stop)."""
+    handler_cls = type(handler.__name__, (handler,), {"config": config, "rng": random.Random(config.seed)})
+    server = _Server((host, port), handler_cls)
+    threading.Thread(target=server.serve_forever, daemon=True, name=f"mock-{handler.__name__}").start()
+    return server
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = MockConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="mean latency before responding")
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms, help="uniform jitter around the mean")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="share of requests answered with 429/503")
+    parser.add_argument("--completion-words", type=int, default=defaults.completion_words)
+    parser.add_argument("--chunk-words", type=int, default=defaults.chunk_words, help="words per streamed chat chunk")
+    parser.add_argument("--chunk-delay-ms", type=float, default=defaults.chunk_delay_ms, help="delay between streamed chunks")
+    parser.add_argument("--audio-bytes", type=int, default=defaults.audio_bytes, help="size of each TTS response")
+    parser.add_argument("--seed", type=int, default=None, help="random seed (mock responses and generated requests)")
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        completion_words=args.completion_words,
+        chunk_words=args.chunk_words,
+        chunk_delay_ms=args.chunk_delay_ms,
+        audio_bytes=args.audio_bytes,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI and ElevenLabs servers for load testing.")
+    parser.add_argument("--openai-port", type=int, default=OPENAI_PORT)
+    parser.add_argument("--elevenlabs-port", type=int, default=ELEVENLABS_PORT)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    config = config_from_args(args)
+    serve(OpenAIHandler, args.openai_port, config)
+    serve(ElevenLabsHandler, args.elevenlabs_port, config)
+    print(f"Mock OpenAI on http://127.0.0.1:{args.openai_port}/v1/, mock ElevenLabs on http://127.0.0.1:{args.elevenlabs_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
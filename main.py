@@ -1,33 +1,82 @@
+import hashlib
+import importlib.util
+import io
 import json
+import logging
 import os
 import random
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
 
 from dotenv import load_dotenv
 
-# Load .env from the directory containing main.py so API key is found when run from any CWD
+# Load .env from the directory containing main.py so API key is found when run from any CWD.
+# UNITINDER_SKIP_DOTENV=1 keeps the process environment as is (load tests point the API at mock providers).
 _BASE_DIR = Path(__file__).resolve().parent
-load_dotenv(_BASE_DIR / ".env", override=True)
+if os.environ.get("UNITINDER_SKIP_DOTENV") != "1":
+    load_dotenv(_BASE_DIR / ".env", override=True)
 
-from fastapi import FastAPI, HTTPException, status, UploadFile, File, Form
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Query, Request, status, UploadFile, File, Form, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
-from openai import OpenAI
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
-from matching import load_teachers, rank_teachers
-
-try:
-    from voice import clone_teacher_voice, generate_speech, list_cloned_voices, save_audio, extract_audio_from_video, full_pipeline
-except ImportError:
-    clone_teacher_voice = generate_speech = list_cloned_voices = save_audio = extract_audio_from_video = full_pipeline = None  # type: ignore
+import archetypes
+import catalogue_snapshot
+import collab
+import http_cache
+import like_analytics
+import listing
+import preview_audio
+import profiling
+import prompts
+import quiz
+import sharding
+import similar_teachers
+import teacher_import
+import upstream
+import voice_uploads
+from matching import DIMENSION_KEYS, MMR_CANDIDATES, WEIGHT_PROFILES, SUBJECT_WEIGHT_PROFILES, diversify, explain_match, load_teachers, rank_teachers, compatibility_score, resolve_weight_profile, teacher_matrix, teacher_rows, upsert_catalogue
+from prefetch import PrefetchQueue
+from singleflight import SingleFlight
+from whatif import DEFAULT_TOP_K, WhatIfSession
+
+# Provider SDKs (openai, elevenlabs via voice.py) are imported on first use, not at startup:
+# they dominate import time, and cold starts on scale-to-zero hosts are user-visible.
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+logger = logging.getLogger(__name__)
 
 # Same Azure OpenAI setup as output.py (env can override)
 OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", "https://hesdi-mm4zauz8-eastus2.cognitiveservices.azure.com/openai/v1/")
 OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-5.2-chat")
+OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "60"))
+_openai_clients: dict[str, "OpenAI"] = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Preload the teacher catalogue and its persona matrix so the first request does not pay for them."""
+    try:
+        teacher_matrix(get_teachers())
+    except FileNotFoundError:
+        pass  # endpoints report the missing file
+    yield
+    if _sharded_matcher is not None:
+        _sharded_matcher.close()
 
-app = FastAPI(title="Unitinder Match API", version="0.1.0")
+
+app = FastAPI(title="Unitinder Match API", version="0.1.0", lifespan=lifespan)
+# Endpoints are sampled while a request profile is active (see profiling.py); set before routes are declared
+app.router.route_class = profiling.ProfiledRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,16 +86,123 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in profiling: requests with X-Profile-Token: $UNITINDER_PROFILE_TOKEN are profiled on demand;
+# UNITINDER_PROFILE_SLOWEST=N samples every request and keeps the N slowest. Profiles are read back
+# (with the same header) from /api/debug/profiles.
+PROFILE_TOKEN = os.environ.get("UNITINDER_PROFILE_TOKEN") or None
+_profiles = profiling.ProfileStore(
+    keep_slowest=int(os.environ.get("UNITINDER_PROFILE_SLOWEST", "0")),
+    interval=float(os.environ.get("UNITINDER_PROFILE_INTERVAL_MS", "5")) / 1000.0,
+)
+app.add_middleware(profiling.ProfilingMiddleware, store=_profiles, token=PROFILE_TOKEN)
+
 # Paths: allow override via env so API works when run from any CWD (e.g. monorepo root)
 BASE_DIR = Path(__file__).resolve().parent
 TEACHERS_PATH = Path(os.environ["UNITINDER_TEACHERS_PATH"]) if os.environ.get("UNITINDER_TEACHERS_PATH") else BASE_DIR / "teachers.json"
 STUDENTS_PATH = Path(os.environ["UNITINDER_STUDENTS_PATH"]) if os.environ.get("UNITINDER_STUDENTS_PATH") else BASE_DIR / "students.json"
 LIKES_PATH = Path(os.environ["UNITINDER_LIKES_PATH"]) if os.environ.get("UNITINDER_LIKES_PATH") else BASE_DIR / "likes.json"
-AUDIO_DIR = BASE_DIR / "audio"
-AUDIO_DIR.mkdir(exist_ok=True)
+# Teacher list: the mmapped catalogue snapshot when it matches teachers.json, else the parsed JSON
 _teachers_cache: list | None = None
+# SHA-256 of the teachers.json bytes behind _teachers_cache; its prefix is the catalogue version (ETags, caches)
+_teachers_sha256: str | None = None
+# (inode, size, mtime) of teachers.json when it was loaded; a change (e.g. an import in another
+# uvicorn worker) makes get_teachers re-hash the file and reload it if the content differs
+_teachers_stat: tuple | None = None
+# Browser/CDN caching of catalogue responses (revalidated with ETags once stale)
+CATALOGUE_CACHE_CONTROL = f"public, max-age={int(os.environ.get('UNITINDER_CATALOGUE_MAX_AGE', '60'))}, stale-while-revalidate=300"
+_archetypes_cache: dict | None = None
+_archetypes_loaded = False
+# Sharded matching (see sharding.py): UNITINDER_SHARDS=N spawns N local shard processes per API worker,
+# host:port,… uses shard servers started with `python sharding.py serve`. Unfiltered matches with a
+# limit are scattered to the shards, which return their top `limit` (merged into the same entries as
+# ranking locally); matches without one, or deeper than UNITINDER_SHARD_MAX_K, are ranked locally.
+SHARDS = os.environ.get("UNITINDER_SHARDS", "").strip() or None
+SHARD_MAX_K = int(os.environ.get("UNITINDER_SHARD_MAX_K", "1000"))
+_sharded_matcher: "sharding.ShardedMatcher | None" = None
+_sharded_matcher_lock = threading.Lock()
+# Similar-teachers k-NN graph for the catalogue list it was built for (similar_teachers.npz when it matches
+# teachers.json; catalogues up to SIMILAR_BUILD_MAX teachers are built on first use otherwise)
+_similar_graph: "tuple[list, similar_teachers.SimilarityGraph] | None" = None
+_similar_graph_lock = threading.Lock()
+SIMILAR_BUILD_MAX = 5000
+# One bulk teacher import at a time (each batch swaps in a new _teachers_cache list)
+_import_lock = threading.Lock()
+# Uploads are spooled to disk past this size before parsing
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+# Result caches keyed by _match_key (catalogue version + quantized persona + subject + weight profile),
+# emptied when the catalogue is reloaded:
+#   _ranked_cache: rank_teachers results (no AI summaries), for returning users and repeated matches
+#   _refined_matches: exact rankings with summaries, computed in the background after a fast match
+_ranked_cache: OrderedDict = OrderedDict()
+RANKED_CACHE_MAX = int(os.environ.get("UNITINDER_RANKED_CACHE_MAX", "2048"))
+_refined_matches: OrderedDict = OrderedDict()
+REFINED_MATCHES_MAX = 1024
+# Modality prompts depend only on the teacher; study plans on teacher + topic + student persona
+_modality_prompts_cache: dict[str, dict] = {}
+_study_plan_cache: OrderedDict = OrderedDict()
+STUDY_PLAN_CACHE_MAX = 256
+# Study plan comparison: teachers per request, and plans generated at once per request
+COMPARE_MAX_TEACHERS = 20
+COMPARE_CONCURRENCY = int(os.environ.get("UNITINDER_COMPARE_CONCURRENCY", "6"))
+# Likes warm the Learn page in the background; set UNITINDER_PREFETCH_PLANS=1 to also pre-generate a plan for the subject
+PREFETCH_PLANS = os.environ.get("UNITINDER_PREFETCH_PLANS", "").strip() == "1"
+_prefetch_queue = PrefetchQueue(maxsize=64, workers=2)
+# Co-like model over likes.json (built on first use, then updated on every like/unlike)
+_colike_model: collab.CoLikeModel | None = None
+COLLAB_WEIGHT = float(os.environ.get("UNITINDER_COLLAB_WEIGHT", "0.2"))
+COLLAB_TOP_K = 20
+# Like/unlike event log and hourly/daily rollups per teacher (loaded on first use)
+_like_analytics: like_analytics.LikeAnalytics | None = None
+# Concurrent identical LLM calls (same teacher/topic/persona) share one upstream request
+_llm_flight = SingleFlight()
+
+
+def _openai_client(api_key: str) -> "OpenAI":
+    """Shared client per API key. SDK retries are off: upstream.get("openai") owns retries and backoff."""
+    client = _openai_clients.get(api_key)
+    if client is None:
+        from openai import OpenAI
+
+        client = OpenAI(base_url=OPENAI_BASE_URL, api_key=api_key, max_retries=0, timeout=OPENAI_TIMEOUT)
+        _openai_clients[api_key] = client
+    return client
+
+
+_voice_module = None
+_voice_checked = False
+
+
+def _voice():
+    """voice.py (ElevenLabs TTS/cloning), imported on first use; None if the elevenlabs package is not installed."""
+    global _voice_module, _voice_checked
+    if not _voice_checked:
+        if importlib.util.find_spec("elevenlabs") is not None:
+            import voice
+
+            _voice_module = voice
+        _voice_checked = True
+    return _voice_module
+
+
+def _chat_completion(api_key: str, prompt: prompts.Prompt, **kwargs):
+    """
+    chat.completions.create on OPENAI_MODEL with prompt's messages, through the shared rate limit /
+    retry / circuit breaker governor. Non-streaming calls are recorded in the prompt token metrics
+    here; streaming callers record the usage of the final chunk themselves.
+    """
+    client = _openai_client(api_key)
+    completion = upstream.get("openai").call(
+        lambda: client.chat.completions.create(model=OPENAI_MODEL, messages=prompt.messages, **kwargs)
+    )
+    if not kwargs.get("stream"):
+        prompts.record(prompt, getattr(completion, "usage", None))
+    return completion
 
 
+@_llm_flight.coalesce(
+    lambda teacher: tuple(teacher.get(k) for k in ("teacher_id", "name", "subject", "tagline", "archetype"))
+    + (json.dumps(teacher.get("why") or {}, sort_keys=True),)
+)
 def _generate_personalized_summary(teacher: dict) -> str:
     """
     For one ranked teacher, return an AI-generated 2–3 sentence summary for this student,
@@ -59,83 +215,36 @@ def _generate_personalized_summary(teacher: dict) -> str:
     if not api_key or disable_flag == "1":
         return fallback
 
-    name = teacher.get("name", "This teacher")
-    subject = teacher.get("subject", "")
-    tagline = teacher.get("tagline", "")
-    archetype = teacher.get("archetype", "")
-    why = teacher.get("why") or {}
-    best = why.get("best") or []
-    worst = why.get("worst") or []
-
-    prompt = f"""You are helping a student choose a teacher. Given this teacher and how they match this student, write a short 2–3 sentence summary in plain language (no bullet lists) explaining why this teacher might be a great fit or not for this specific student.
-
-Teacher: {name} ({subject})
-Archetype: {archetype}
-Tagline: {tagline}
-
-Where this student and teacher align well (best matching aspects): {', '.join(best) if best else '—'}
-Where they differ (aspects that may not match): {', '.join(worst) if worst else '—'}
-
-Write only the summary, nothing else. Be direct and helpful."""
-
     try:
-        client = OpenAI(base_url=OPENAI_BASE_URL, api_key=api_key)
-        completion = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You write brief, clear summaries for students choosing teachers. Output only the summary text, no labels or extra text."},
-                {"role": "user", "content": prompt},
-            ],
-            max_completion_tokens=200,
-        )
+        completion = _chat_completion(api_key, prompts.personalized_summary(teacher), max_completion_tokens=200)
         text = (completion.choices[0].message.content or "").strip()
         return text if text else fallback
     except Exception:
         return fallback
 
 
-def _generate_modality_prompts(teacher: dict) -> dict[str, str]:
-    """Generate text_prompt, audio_prompt, video_prompt for this teacher (mirror output.py)."""
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        return {"text_prompt": "", "audio_prompt": "", "video_prompt": ""}
-    teacher_data = {
+def _teacher_prompt_data(teacher: dict) -> dict:
+    """The teacher fields the modality prompts are generated from."""
+    return {
         "teacher_id": teacher.get("teacher_id"),
         "name": teacher.get("name"),
         "subject": teacher.get("subject"),
         "archetype": teacher.get("archetype"),
         "persona": teacher.get("persona") or {},
     }
-    prompt_content = f"""Based on the following Teacher Persona, your task is to generate 3 specific system prompts tailored to three different instructional modalities: Text, Audio, and Video.
-
-We are building a system where a student requests a study plan or lesson, and we use these prompts to generate the content in the teacher's exact style.
 
-1. Text Modality Prompt:
-Create a system prompt that will instruct an LLM to generate a personalized "Study Plan" or written lesson. It should enforce the teacher's specific pacing, structure, verbosity, and textual pedagogical style (e.g., Socratic questioning, formal vs. casual).
 
-2. Audio Modality Prompt:
-Create a system prompt that will instruct an LLM to write a script for a TTS (Text-to-Speech) engine. It should emphasize auditory elements: speech patterns, tone of voice, enthusiasm, pauses, and rhetorical questions, ensuring the script sounds natural and fits the teacher's emotional sensitivity and humor receptivity.
-
-3. Video Modality Prompt:
-Create a system prompt that will instruct an LLM to generate a script and visual cues for a Video/Avatar model. It must include instructions for the teacher's body language, facial expressions, visual dependency (e.g., describing props or whiteboard use), and overall on-screen energy.
-
-INPUT DATA (Teacher Persona):
-{json.dumps(teacher_data, indent=2)}
-
-OUTPUT FORMAT:
-Return exactly a JSON object with the following keys:
-"text_prompt": <the complete prompt for text modality>,
-"audio_prompt": <the complete prompt for audio modality>,
-"video_prompt": <the complete prompt for video modality>"""
+@_llm_flight.coalesce(lambda teacher: json.dumps(_teacher_prompt_data(teacher), sort_keys=True))
+def _generate_modality_prompts(teacher: dict) -> dict[str, str]:
+    """Generate text_prompt, audio_prompt, video_prompt for this teacher (mirror output.py)."""
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        return {"text_prompt": "", "audio_prompt": "", "video_prompt": ""}
     try:
-        client = OpenAI(base_url=OPENAI_BASE_URL, api_key=api_key)
-        completion = client.chat.completions.create(
-            model=OPENAI_MODEL,
+        completion = _chat_completion(
+            api_key,
+            prompts.modality_prompts(_teacher_prompt_data(teacher)),
             response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": "You are an expert Prompt Engineer for an AI education platform. Output your response as a valid JSON object."},
-                {"role": "user", "content": prompt_content},
-            ],
             max_completion_tokens=1500,
         )
         raw = completion.choices[0].message.content or "{}"
@@ -149,45 +258,17 @@ Return exactly a JSON object with the following keys:
         return {"text_prompt": "", "audio_prompt": "", "video_prompt": ""}
 
 
+@_llm_flight.coalesce(
+    lambda teacher, student_persona, topic, text_prompt: _study_plan_key(teacher, student_persona, topic) + (text_prompt,)
+)
 def _generate_study_plan(teacher: dict, student_persona: dict, topic: str, text_prompt: str) -> str:
     """Generate study plan for the student's topic in the teacher's style. Uses text_prompt if available, else a fallback so we still generate when modality prompts fail."""
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         return ""
-    # If modality prompts failed or were skipped, use a fallback system prompt so we still generate a plan for the topic
-    teacher_name = teacher.get("name", "This teacher")
-    teacher_subject = teacher.get("subject", "")
-    fallback_system = f"""You are {teacher_name}, teaching {teacher_subject}. Your task is to generate a study plan in YOUR teaching style only. The plan must be for the topic the student requests. Use your own pacing, structure, tone, and pedagogical approach—do not match or adapt to the student's learning style; the output must reflect how you teach. Output only the study plan text, no meta-commentary."""
-    system_content = (text_prompt.strip() or fallback_system)
-    # Explicit: plan for this topic, in the teacher's teaching style (not the student's learning style).
-    # Ask for a short Outline at the top (main sections only) so the UI can show a clean outline.
-    user_content = f"""The student has requested a study plan for this topic. Generate the plan only for this topic, in YOUR teaching style. The plan must reflect how you teach—your pace, structure, tone, and methods—not the student's preferred learning style. Student context is provided only for reference.
-
-Topic requested: {topic}
-
-Student context (for reference only; do not match your style to theirs):
-{json.dumps(student_persona, indent=2)}
-
-STRUCTURE YOUR RESPONSE AS FOLLOWS:
-1. First line: write exactly "Outline" (or "Table of Contents").
-2. Next lines: list only the MAIN section titles, one per line (e.g. "Week 1: Functions — The Language of Calculus", "Week 2: Limits — The Central Idea"). Include only major sections (weeks, parts, or chapters)—do NOT list subsections like "Core Ideas", "Emphasis", "Proof Component", "Problem Set", "Reflection", "Conceptual Anchor", "Theorem Focus" in this list.
-3. One blank line.
-4. Then the full study plan body with all details, subsections, and content.
-
-Generate the study plan now. Ensure it is specifically about "{topic}" and is written in the teacher's teaching style."""
     try:
-        client = OpenAI(base_url=OPENAI_BASE_URL, api_key=api_key)
-        for attempt, use_system in enumerate([system_content, fallback_system]):
-            if attempt == 1 and system_content == fallback_system:
-                break
-            completion = client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": use_system},
-                    {"role": "user", "content": user_content},
-                ],
-                max_completion_tokens=1500,
-            )
+        for prompt in prompts.study_plan(teacher, student_persona, topic, text_prompt):
+            completion = _chat_completion(api_key, prompt, max_completion_tokens=1500)
             raw = completion.choices[0].message.content if completion.choices else None
             out = (raw or "").strip()
             if out:
@@ -197,22 +278,273 @@ Generate the study plan now. Ensure it is specifically about "{topic}" and is wr
         return ""
 
 
+def _stream_study_plan(teacher: dict, student_persona: dict, topic: str, text_prompt: str):
+    """
+    Streaming variant of _generate_study_plan: yields text chunks as the completion arrives.
+    Falls back to the generic system prompt only if the first attempt produced nothing.
+    """
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        return
+    for prompt in prompts.study_plan(teacher, student_persona, topic, text_prompt):
+        stream = _chat_completion(
+            api_key,
+            prompt,
+            max_completion_tokens=1500,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        produced = False
+        usage = None
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                produced = True
+                yield delta
+        prompts.record(prompt, usage)
+        if produced:
+            return
+
+
+_OUTLINE_HEADER = re.compile(r"^\s*#*\s*(Outline|Table of Contents)\s*:?\s*$", re.IGNORECASE)
+
+
+class _OutlineSplitter:
+    """
+    Splits a streamed study plan into the leading "Outline" block and the body, so the
+    outline can be sent as soon as its closing blank line arrives. Yields NDJSON-ready events.
+    """
+
+    # Give up waiting for the outline's blank line after this many characters
+    MAX_HEAD_CHARS = 4000
+
+    def __init__(self):
+        self.head = ""
+        self.in_body = False
+
+    def feed(self, text: str) -> list[dict]:
+        if self.in_body:
+            return [{"type": "delta", "text": text}]
+        self.head += text
+        stripped = self.head.lstrip()
+        first_line, newline, rest = stripped.partition("\n")
+        if newline and not _OUTLINE_HEADER.match(first_line):
+            return self._finish_head([], self.head)
+        rest = rest.lstrip("\n")
+        if "\n\n" in rest:
+            outline_block, _, body = rest.partition("\n\n")
+            return self._finish_head(outline_block.splitlines(), body)
+        if len(self.head) > self.MAX_HEAD_CHARS:
+            return self._finish_head([], self.head)
+        return []
+
+    def flush(self) -> list[dict]:
+        if self.in_body:
+            return []
+        first_line, _, rest = self.head.lstrip().partition("\n")
+        if _OUTLINE_HEADER.match(first_line):
+            return self._finish_head(rest.splitlines(), "")
+        return self._finish_head([], self.head)
+
+    def _finish_head(self, outline_lines: list[str], body: str) -> list[dict]:
+        self.in_body = True
+        sections = [line.strip().lstrip("#").strip() for line in outline_lines if line.strip()]
+        events = [{"type": "outline", "sections": sections}]
+        if body:
+            events.append({"type": "delta", "text": body})
+        return events
+
+
+def _modality_prompts_key(teacher: dict) -> str:
+    return json.dumps(_teacher_prompt_data(teacher), sort_keys=True)
+
+
+def _get_modality_prompts(teacher: dict) -> dict[str, str]:
+    """Cached _generate_modality_prompts. Only successful (non-empty) results are cached."""
+    key = _modality_prompts_key(teacher)
+    modality_prompts = _modality_prompts_cache.get(key)
+    if modality_prompts is None:
+        modality_prompts = _generate_modality_prompts(teacher)
+        if any(modality_prompts.values()):
+            _modality_prompts_cache[key] = modality_prompts
+    return modality_prompts
+
+
+def _persona_key(persona: dict[str, float]) -> tuple:
+    """Hashable persona (24 values rounded to 3 decimals) for cache keys."""
+    return tuple(round(float(persona.get(d, 0.5)), 3) for d in DIMENSION_KEYS)
+
+
+def _study_plan_key(teacher: dict, student_persona: dict[str, float], topic: str) -> tuple:
+    return (teacher.get("teacher_id") or "").strip(), " ".join(topic.lower().split()), _persona_key(student_persona)
+
+
+def _lru_put(cache: OrderedDict, key, value, max_entries: int) -> None:
+    """
+    Store value as the most recently used entry and evict the oldest beyond max_entries. Called from
+    request and background threads without a lock: pop + reinsert never touches a key another thread
+    may just have removed (unlike move_to_end), and eviction stops if a clear() empties the cache.
+    """
+    cache.pop(key, None)
+    cache[key] = value
+    while len(cache) > max_entries:
+        try:
+            cache.popitem(last=False)
+        except KeyError:
+            return
+
+
+def _store_study_plan(key: tuple, plan: str) -> None:
+    _lru_put(_study_plan_cache, key, plan, STUDY_PLAN_CACHE_MAX)
+
+
+def _teachers_file_stat() -> tuple | None:
+    try:
+        st = TEACHERS_PATH.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
 def get_teachers() -> list:
-    global _teachers_cache
+    global _teachers_cache, _teachers_sha256, _teachers_stat
+    # This worker's own import swaps the list in batch by batch and records the file it wrote
+    if _teachers_cache is not None and not _import_lock.locked():
+        stat = _teachers_file_stat()
+        if stat != _teachers_stat:
+            if stat is not None and archetypes.file_sha256(TEACHERS_PATH) == _teachers_sha256:
+                _teachers_stat = stat  # touched or rewritten with the same content
+            else:
+                _invalidate_teachers()
+                # Study plans are keyed by teacher_id, and which teachers changed is unknown here
+                _study_plan_cache.clear()
     if _teachers_cache is None:
         if not TEACHERS_PATH.exists():
             raise FileNotFoundError(f"Teachers file not found: {TEACHERS_PATH}")
-        _teachers_cache = load_teachers(TEACHERS_PATH)
+        # Stat before hashing: a rewrite in between is then noticed on the next call
+        _teachers_stat = _teachers_file_stat()
+        _teachers_sha256 = archetypes.file_sha256(TEACHERS_PATH)
+        _teachers_cache = catalogue_snapshot.load_snapshot(source_sha256=_teachers_sha256)
+        if _teachers_cache is None:
+            if catalogue_snapshot.SNAPSHOT_PATH.exists():
+                logger.warning("%s is stale; loading teachers.json (rebuild: python catalogue_snapshot.py build-snapshot)", catalogue_snapshot.SNAPSHOT_PATH.name)
+            _teachers_cache = load_teachers(TEACHERS_PATH)
     return _teachers_cache
 
 
+def get_catalogue_version() -> str:
+    """Version of the loaded teacher catalogue (changes whenever teachers.json content changes)."""
+    get_teachers()
+    return (_teachers_sha256 or "")[:16]
+
+
+def _invalidate_teachers() -> None:
+    """Forget the loaded catalogue after teachers.json was rewritten (next access reloads it)."""
+    global _teachers_cache, _teachers_sha256, _archetypes_loaded
+    _teachers_cache = None
+    _teachers_sha256 = None
+    # The archetype model is checked against teachers.json too
+    _archetypes_loaded = False
+    # Keys carry the catalogue version, so this only frees memory early
+    _ranked_cache.clear()
+    _refined_matches.clear()
+
+
+def _apply_teacher_batch(batch: list[dict]) -> tuple[int, int]:
+    """
+    Upsert validated teachers into the served catalogue without a reload: the matrix, row map
+    and subject index are extended incrementally (matching.upsert_catalogue) and the new list
+    is swapped in, so in-flight requests finish on the list they started with.
+    """
+    global _teachers_cache, _teachers_sha256, _archetypes_loaded, _similar_graph
+    previous = get_teachers()
+    teachers, inserted, updated = upsert_catalogue(previous, batch)
+    if _similar_graph is not None and _similar_graph[0] is previous:
+        rows = teacher_rows(teachers)
+        graph = _similar_graph[1].updated(teacher_matrix(teachers), [rows[t["teacher_id"]] for t in batch])
+        _similar_graph = (teachers, graph)
+    # Not a file hash until teachers.json is written, but a new version for ETags and caches
+    digest = hashlib.sha256((_teachers_sha256 or "").encode("utf-8"))
+    for t in batch:
+        digest.update(json.dumps(t, sort_keys=True).encode("utf-8"))
+    _teachers_sha256, _teachers_cache = digest.hexdigest(), teachers
+    _archetypes_loaded = False
+    _ranked_cache.clear()
+    _refined_matches.clear()
+    # Study plans are keyed by teacher_id (modality prompts by content, so edits already miss)
+    ids = {t["teacher_id"] for t in batch}
+    for key in [k for k in list(_study_plan_cache) if k[0] in ids]:
+        _study_plan_cache.pop(key, None)
+    return inserted, updated
+
+
+def import_teachers(f: io.TextIOBase, fmt: str | None = None, batch_size: int = teacher_import.DEFAULT_BATCH_SIZE, dry_run: bool = False) -> dict:
+    """Stream-import teachers from f into the served catalogue, then persist teachers.json."""
+    global _teachers_sha256, _teachers_stat
+    with _import_lock:
+        report = teacher_import.import_records(teacher_import.iter_records(f, fmt), _apply_teacher_batch, batch_size, dry_run)
+        if report["batches"]:
+            fields = listing.object_fields(TEACHERS_PATH, "teachers") if TEACHERS_PATH.exists() else {}
+            teacher_import.write_catalogue(TEACHERS_PATH, fields, get_teachers())
+            _teachers_stat = _teachers_file_stat()
+            _teachers_sha256 = archetypes.file_sha256(TEACHERS_PATH)
+            graph = _similar_graph
+            if graph is not None and graph[0] is get_teachers():
+                graph[1].teachers_sha256 = _teachers_sha256
+                graph[1].save()
+    report["catalogue_version"] = get_catalogue_version()
+    report["teachers"] = len(get_teachers())
+    return report
+
+
+def get_similar_graph() -> "similar_teachers.SimilarityGraph | None":
+    """k-NN graph of the served catalogue, or None if it is not precomputed and too large to build per worker."""
+    global _similar_graph
+    teachers = get_teachers()
+    cached = _similar_graph
+    if cached is not None and cached[0] is teachers:
+        return cached[1]
+    with _similar_graph_lock:
+        if _similar_graph is not None and _similar_graph[0] is teachers:
+            return _similar_graph[1]
+        graph = similar_teachers.SimilarityGraph.load(teachers_sha256=_teachers_sha256)
+        if graph is None or len(graph) != len(teachers):
+            if len(teachers) > SIMILAR_BUILD_MAX:
+                return None
+            graph = similar_teachers.SimilarityGraph.build(teacher_matrix(teachers), teachers_sha256=_teachers_sha256)
+        _similar_graph = (teachers, graph)
+        return graph
+
+
+def get_archetypes() -> dict | None:
+    """Precomputed archetype model (archetypes.json), or None if missing or built from another teachers.json."""
+    global _archetypes_cache, _archetypes_loaded
+    if not _archetypes_loaded:
+        try:
+            get_teachers()
+        except FileNotFoundError:
+            pass
+        _archetypes_cache = archetypes.load_model(teachers_sha256=_teachers_sha256)
+        _archetypes_loaded = True
+    return _archetypes_cache
+
+
 class MatchRequest(BaseModel):
     studentPersona: dict[str, float] = Field(..., description="Student persona with 24 dimensions (0–1)")
     subject: str | None = Field(None, description="Optional subject filter (e.g. 'Analysis')")
+    fast: bool = Field(False, description="Serve the nearest archetype's precomputed ranking and refine it in the background")
+    weightProfile: str | None = Field(None, description="Optional weight profile name (default: the subject's profile)")
+    studentId: str | None = Field(None, description="Optional student ID; their likes re-rank the top candidates collaboratively")
+    collabWeight: float | None = Field(None, ge=0.0, le=1.0, description="Blend weight of the co-like score (default UNITINDER_COLLAB_WEIGHT)")
+    diversity: float = Field(0.0, ge=0.0, le=1.0, description="MMR trade-off between compatibility and variety at the top of the stack (0 = off)")
+    limit: int | None = Field(None, ge=1, description="Return only the best `limit` teachers (default: all)")
 
 
 class MatchResponse(BaseModel):
     ranked: list[dict]
+    archetype_id: str | None = None
+    approximate: bool = False
 
 
 class CreateStudentRequest(BaseModel):
@@ -232,6 +564,13 @@ class LearnStudyPlanRequest(BaseModel):
     topic: str = Field(..., description="Topic for the study plan")
 
 
+class CompareStudyPlansRequest(BaseModel):
+    studentPersona: dict[str, float] = Field(..., description="24 dimensions (0–1)")
+    topic: str = Field(..., description="Topic every teacher plans")
+    studentId: str | None = Field(None, description="Compare this student's liked teachers")
+    teacherIds: list[str] | None = Field(None, description="Or compare these teachers (takes precedence over studentId)")
+
+
 class LearnPersonalizedSummaryRequest(BaseModel):
     teacherId: str = Field(..., description="Teacher ID")
     studentPersona: dict[str, float] = Field(..., description="24 dimensions (0–1)")
@@ -254,6 +593,10 @@ class TeacherPreviewRequest(BaseModel):
 
 # Max chars for TTS to stay within ElevenLabs limits
 TTS_MAX_TEXT_LENGTH = 4500
+# Teacher previews rendered ahead of time by `python preview_audio.py prerender`
+_preview_store = preview_audio.PreviewStore()
+# Voice clone uploads by content hash (clones and extracted audio are reused for identical recordings)
+_clone_registry = voice_uploads.CloneRegistry()
 
 
 def _load_students_data() -> dict:
@@ -269,10 +612,12 @@ def _load_students_data() -> dict:
 
 
 def _save_students_data(data: dict) -> None:
-    """Write students.json preserving structure. Creates parent dirs if needed."""
+    """Write students.json preserving structure. Creates parent dirs if needed. Atomic: readers never see a partial file."""
     STUDENTS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(STUDENTS_PATH, "w", encoding="utf-8") as f:
+    tmp_path = STUDENTS_PATH.with_name(STUDENTS_PATH.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2)
+    os.replace(tmp_path, STUDENTS_PATH)
 
 
 def _load_likes_data() -> dict:
@@ -306,23 +651,118 @@ def _save_teachers_raw(data: dict) -> None:
         json.dump(data, f, indent=2)
 
 
+class AnswerSheet(BaseModel):
+    name: str = Field("Student", description="Student display name")
+    answers: dict[str, str | None] | list[str | None] = Field(
+        ..., description="Chosen option per question: {question_id: 'A'..'D'} or labels in question order"
+    )
+
+
+class BulkFromAnswersRequest(BaseModel):
+    sheets: list[AnswerSheet] = Field(..., description="Exported quiz answer sheets, one per student")
+    subject: str | None = Field(None, description="Optional subject filter for the returned matches")
+    top: int = Field(5, ge=0, le=100, description="Number of top matches returned per student")
+
+
 class AddLikeRequest(BaseModel):
     teacher_id: str = Field(..., description="Teacher ID to add to this student's liked list")
 
 
 # ── Student endpoints ─────────────────────────────────────────────────
 
+def _iter_students() -> Iterator[dict]:
+    """Students streamed from students.json one record at a time (nothing if missing or unreadable)."""
+    if not STUDENTS_PATH.exists():
+        return
+    try:
+        yield from listing.iter_json_array(STUDENTS_PATH, "students")
+    except (OSError, json.JSONDecodeError):
+        return
+
+
+def _list_response(
+    request: Request,
+    name: str,
+    version,
+    records,
+    record_id,
+    cache_control: str,
+    limit: int | None,
+    cursor: str | None,
+    fields: str | None,
+    exclude: str | None,
+    fmt: str | None,
+    cache_full: bool = False,
+) -> Response:
+    """
+    Shared listing for /api/students and /api/teachers. records() returns a fresh iterator.
+    No limit/cursor: the whole list, as before. With limit or cursor: one page in id order plus
+    next_cursor. format=ndjson: every record streamed, one JSON object per line, in storage order.
+    fields / exclude are comma-separated projections (e.g. exclude=persona).
+    Only whole lists with cache_full are kept in http_cache; everything else is built per request,
+    with an ETag derived from version so revalidation still answers 304 without building it.
+    """
+    try:
+        field_list, exclude_list = listing.parse_fields(fields), listing.parse_fields(exclude)
+        after = listing.decode_cursor(cursor) if cursor else None
+        size = listing.page_size(limit)
+    except listing.ListingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    project = listing.projector(field_list, exclude_list)
+    if fmt == "ndjson":
+        return StreamingResponse(listing.ndjson_lines(map(project, records())), media_type="application/x-ndjson")
+    if fmt not in (None, "json"):
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+    projection = (tuple(field_list or ()), tuple(exclude_list or ()))
+    if limit is None and cursor is None:
+        respond = http_cache.json_response if cache_full else http_cache.versioned_response
+        return respond(request, (name, version, projection), lambda: {name: [project(r) for r in records()]}, cache_control=cache_control)
+
+    def payload() -> dict:
+        page, next_cursor = listing.page_after(records(), record_id, after, size)
+        return {name: [project(r) for r in page], "next_cursor": next_cursor}
+
+    return http_cache.versioned_response(request, (name, version, projection, after, size), payload, cache_control=cache_control)
+
+
 @app.get("/api/students")
-def get_students() -> dict:
-    """Return all students from students.json."""
-    data = _load_students_data()
-    return {"students": data.get("students", [])}
+def get_students(
+    request: Request,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: str | None = None,
+    exclude: str | None = None,
+    fmt: str | None = Query(None, alias="format"),
+) -> Response:
+    """
+    Return students from students.json (ETag-revalidated; students.json size/mtime is the version).
+    Paginate with limit/cursor (ordered by student_id), project with fields/exclude, or export
+    everything as NDJSON with format=ndjson; records are streamed from the file either way.
+    """
+    try:
+        stat = STUDENTS_PATH.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        version = None
+    return _list_response(
+        request,
+        "students",
+        version,
+        _iter_students,
+        lambda s: s.get("student_id") or "",
+        "private, no-cache",
+        limit,
+        cursor,
+        fields,
+        exclude,
+        fmt,
+    )
 
 
 @app.post("/api/students")
 def create_student(request: CreateStudentRequest) -> JSONResponse:
     """Append a new student to students.json; return created student (201)."""
-    student_id = "stu_" + "".join(random.choices("0123456789abcdef", k=8))
+    student_id = _new_student_id(set())
     from datetime import datetime
     generated_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.000Z")
     student = {
@@ -341,6 +781,59 @@ def create_student(request: CreateStudentRequest) -> JSONResponse:
     return JSONResponse(content=student, status_code=status.HTTP_201_CREATED)
 
 
+def _new_student_id(taken: set[str]) -> str:
+    while True:
+        student_id = "stu_" + "".join(random.choices("0123456789abcdef", k=8))
+        if student_id not in taken:
+            return student_id
+
+
+@app.post("/api/students/bulk-from-answers")
+def create_students_from_answers(request: BulkFromAnswersRequest) -> JSONResponse:
+    """
+    Onboard many students from raw quiz answer sheets: score every sheet server-side
+    (same aggregation as the quiz UI), rank teachers for each, and append all students to
+    students.json in a single atomic write. Any invalid sheet rejects the whole batch (422).
+    """
+    if not request.sheets:
+        return JSONResponse(content={"results": []}, status_code=status.HTTP_201_CREATED)
+    try:
+        personas = quiz.get_quiz().score([sheet.answers for sheet in request.sheets])
+    except quiz.AnswerSheetError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        teachers = get_teachers()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    from datetime import datetime
+    generated_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    data = _load_students_data()
+    if "students" not in data:
+        data["students"] = []
+    taken = {s.get("student_id") for s in data["students"]}
+    results = []
+    for sheet, row in zip(request.sheets, personas):
+        persona = quiz.persona_from_row(row)
+        archetype, summary = quiz.derive_archetype_and_summary(persona)
+        student_id = _new_student_id(taken)
+        taken.add(student_id)
+        student = {
+            "student_id": student_id,
+            "name": (sheet.name or "Student").strip() or "Student",
+            "generated_at": generated_at,
+            "persona": persona,
+            "archetype": archetype,
+            "summary": summary,
+        }
+        data["students"].append(student)
+        ranked = _cached_rank(teachers, persona, request.subject, resolve_weight_profile(None, request.subject), request.top)
+        matches = [{k: r[k] for k in ("teacher_id", "name", "subject", "compatibility_score", "why")} for r in ranked]
+        results.append({"student": student, "matches": matches})
+    _save_students_data(data)
+    return JSONResponse(content={"results": results}, status_code=status.HTTP_201_CREATED)
+
+
 # ── Likes endpoints ──────────────────────────────────────────────────
 
 @app.get("/api/students/{student_id}/likes")
@@ -366,12 +859,20 @@ def add_student_like(student_id: str, request: AddLikeRequest) -> dict:
     tid = (request.teacher_id or "").strip()
     if not tid:
         raise HTTPException(status_code=400, detail="teacher_id is required")
+    analytics = get_like_analytics()  # loaded (and backfilled) before likes.json changes
     data = _load_likes_data()
     if student_id not in data:
         data[student_id] = []
-    if tid not in data[student_id]:
+    added = tid not in data[student_id]
+    if added:
         data[student_id].append(tid)
     _save_likes_data(data)
+    if added:
+        analytics.record("like", student_id, tid, _student_persona(student_id))
+    if _colike_model is not None:
+        _colike_model.add_like(student_id, tid)
+    if added:
+        _schedule_prefetch(student_id, tid)
     return {"teachers": data[student_id]}
 
 
@@ -379,29 +880,194 @@ def add_student_like(student_id: str, request: AddLikeRequest) -> dict:
 def remove_student_like(student_id: str, teacher_id: str) -> dict:
     """Remove a teacher from this student's liked list."""
     tid = (teacher_id or "").strip()
+    _prefetch_queue.cancel((student_id, tid))
+    analytics = get_like_analytics()
     data = _load_likes_data()
     if student_id not in data:
         return {"teachers": []}
-    data[student_id] = [x for x in data[student_id] if (x or "").strip() != tid]
+    kept = [x for x in data[student_id] if (x or "").strip() != tid]
+    removed = len(kept) < len(data[student_id])
+    data[student_id] = kept
     _save_likes_data(data)
+    if removed:
+        analytics.record("unlike", student_id, tid)
+    if _colike_model is not None:
+        _colike_model.remove_like(student_id, tid)
     return {"teachers": data[student_id]}
 
 
+def _schedule_prefetch(student_id: str, teacher_id: str) -> None:
+    """
+    A like is usually followed by opening /learn/{teacherId}: warm that teacher's modality
+    prompts and, with UNITINDER_PREFETCH_PLANS=1, a study plan for the teacher's subject.
+    Removing the like cancels whatever has not finished yet. The teacher and student are
+    looked up by the queued tasks, off the request path.
+    """
+    if not os.environ.get("OPENAI_API_KEY"):
+        return
+    group = (student_id, teacher_id)
+    _prefetch_queue.submit(group, 0, lambda cancelled: _prefetch_prompts(teacher_id, cancelled))
+    if PREFETCH_PLANS:
+        _prefetch_queue.submit(group, 1, lambda cancelled: _prefetch_plan(student_id, teacher_id, cancelled))
+
+
+def _prefetch_teacher(teacher_id: str) -> dict | None:
+    try:
+        teachers = get_teachers()
+    except FileNotFoundError:
+        return None
+    row = teacher_rows(teachers).get(teacher_id)
+    return teachers[row] if row is not None else None
+
+
+def _prefetch_prompts(teacher_id: str, cancelled: threading.Event) -> None:
+    teacher = _prefetch_teacher(teacher_id)
+    if teacher is not None and not cancelled.is_set():
+        _get_modality_prompts(teacher)
+
+
+def _prefetch_plan(student_id: str, teacher_id: str, cancelled: threading.Event) -> None:
+    teacher = _prefetch_teacher(teacher_id)
+    topic = (teacher.get("subject") or "").strip() if teacher is not None else ""
+    if not topic or cancelled.is_set():
+        return
+    persona = _student_persona(student_id)
+    if not isinstance(persona, dict):
+        return
+    key = _study_plan_key(teacher, persona, topic)
+    if key in _study_plan_cache or cancelled.is_set():
+        return
+    text_prompt = _get_modality_prompts(teacher).get("text_prompt", "")
+    if cancelled.is_set():
+        return
+    plan = _generate_study_plan(teacher, persona, topic, text_prompt)
+    if plan.strip() and not cancelled.is_set():
+        _store_study_plan(key, plan)
+
+
 # ── Match endpoint ────────────────────────────────────────────────────
 
-@app.post("/api/match", response_model=MatchResponse)
-def match(request: MatchRequest) -> MatchResponse:
+def get_colike_model() -> collab.CoLikeModel:
+    """Co-like model built from likes.json on first use; like endpoints keep it current afterwards."""
+    global _colike_model
+    if _colike_model is None:
+        _colike_model = collab.CoLikeModel.from_likes(_load_likes_data())
+    return _colike_model
+
+
+def get_like_analytics() -> like_analytics.LikeAnalytics:
+    """Like event log + rollups, restored on first use (the current likes.json is backfilled when there is no log yet)."""
+    global _like_analytics
+    if _like_analytics is None:
+        analytics = like_analytics.LikeAnalytics()
+        likes_mtime = LIKES_PATH.stat().st_mtime if LIKES_PATH.exists() else None
+        personas = {(s.get("student_id") or "").strip(): s.get("persona") or {} for s in _iter_students()}
+        analytics.load(_load_likes_data(), personas, likes_mtime)
+        _like_analytics = analytics
+    return _like_analytics
+
+
+def _student_persona(student_id: str) -> dict[str, float] | None:
+    return next((s.get("persona") for s in _iter_students() if (s.get("student_id") or "").strip() == student_id.strip()), None)
+
+
+def _collab_weight(request: "MatchRequest") -> float:
+    return COLLAB_WEIGHT if request.collabWeight is None else request.collabWeight
+
+
+def _collab_rerank(ranked: list[dict], request: "MatchRequest") -> list[dict]:
+    """Blend the student's co-like signal into the top candidates (no-op without studentId or likes)."""
+    if not request.studentId:
+        return ranked
+    return get_colike_model().rerank(ranked, request.studentId.strip(), _collab_weight(request), top_k=COLLAB_TOP_K)
+
+
+def _rerank(ranked: list[dict], request: "MatchRequest", teachers: list, weight_profile: str) -> list[dict]:
     """
-    Rank teachers by compatibility with the given student persona.
-    Optionally filter by subject. Each teacher's summary is replaced with an
-    AI-generated, student-specific summary when OPENAI_API_KEY is set.
+    Request-specific re-ranking of a ranking: co-likes first, then MMR diversity (if asked for).
+    MMR trades variety against the co-like blend, so it keeps the collaborative order at low diversity;
+    candidates past the co-liked head count with a co-like score of 0.
     """
+    ranked = _collab_rerank(ranked, request)
+    relevance = None
+    if request.diversity > 0 and any("collab_score" in r for r in ranked[:COLLAB_TOP_K]):
+        weight = _collab_weight(request)
+        relevance = [
+            r["collab_score"] if "collab_score" in r else (1.0 - weight) * (r.get("compatibility_score") or 0.0)
+            for r in ranked[:MMR_CANDIDATES]
+        ]
+    return diversify(ranked, teachers, request.diversity, weight_profile, relevance=relevance)
+
+
+def _match_key(student_persona: dict[str, float], subject: str | None, weight_profile: str) -> tuple:
+    return get_catalogue_version(), _persona_key(student_persona), (subject or "").strip(), weight_profile
+
+
+def get_sharded_matcher() -> "sharding.ShardedMatcher | None":
+    """Connection to the matching shards (spawned on first use), or None when sharding is off."""
+    global _sharded_matcher
+    if SHARDS is not None and _sharded_matcher is None:
+        with _sharded_matcher_lock:
+            if _sharded_matcher is None:
+                _sharded_matcher = sharding.ShardedMatcher.from_env(SHARDS, TEACHERS_PATH)
+    return _sharded_matcher
+
+
+def _sharded_rank(student_persona: dict[str, float], weight_profile: str, k: int) -> list[dict] | None:
+    """The unfiltered top k from the shards; None to rank locally (sharding off, shards stale or down)."""
     try:
-        teachers = get_teachers()
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        matcher = get_sharded_matcher()
+        if matcher is None:
+            return None
+        return matcher.rank(student_persona, _teachers_sha256 or "", weight_profile=weight_profile, k=k)
+    except (OSError, EOFError, RuntimeError) as e:
+        logger.warning("Sharded match failed, ranking locally: %s", e)
+        return None
 
-    ranked = rank_teachers(teachers, request.studentPersona, subject=request.subject)
+
+def _cached_rank(
+    teachers: list, student_persona: dict[str, float], subject: str | None, weight_profile: str, depth: int | None = None
+) -> list[dict]:
+    """
+    rank_teachers (its first `depth` entries, or all) through _ranked_cache. Returns fresh entry dicts (callers
+    fill in summaries). Unfiltered rankings of at most SHARD_MAX_K entries come from the shards when sharding is on.
+    """
+    key = _match_key(student_persona, subject, weight_profile)
+    # Entries are (ranking, complete): a shard top k serves later requests no deeper than it
+    entry = _ranked_cache.get(key)
+    if entry is not None and not entry[1] and (depth is None or len(entry[0]) < depth):
+        entry = None
+    if entry is None and subject is None and depth is not None and depth <= SHARD_MAX_K:
+        top = _sharded_rank(student_persona, weight_profile, depth)
+        if top is not None:
+            entry = (top, len(top) < depth)
+    if entry is None:
+        entry = (rank_teachers(teachers, student_persona, subject=subject, weight_profile=weight_profile), True)
+    _lru_put(_ranked_cache, key, entry, RANKED_CACHE_MAX)
+    return [dict(r) for r in entry[0][:depth]]
+
+
+def _rank_depth(request: MatchRequest) -> int | None:
+    """Entries a match must rank: its limit, or the deeper candidate lists the re-rankers use (None = all)."""
+    if request.limit is None:
+        return None
+    depth = request.limit
+    if request.studentId:
+        depth = max(depth, COLLAB_TOP_K)
+    if request.diversity > 0:
+        depth = max(depth, MMR_CANDIDATES)
+    return depth
+
+
+def _ranked_with_summaries(
+    teachers: list,
+    student_persona: dict[str, float],
+    subject: str | None,
+    weight_profile: str | None = None,
+    depth: int | None = None,
+) -> list[dict]:
+    """Exact ranking (the first `depth` entries, or all) with AI-generated personalized summaries."""
+    ranked = _cached_rank(teachers, student_persona, subject, resolve_weight_profile(weight_profile, subject), depth)
 
     # Generate personalized summaries in parallel (or use JSON summary if AI disabled)
     with ThreadPoolExecutor(max_workers=min(10, max(1, len(ranked)))) as executor:
@@ -412,19 +1078,146 @@ def match(request: MatchRequest) -> MatchResponse:
                 ranked[idx]["summary"] = future.result()
             except Exception:
                 pass  # keep original summary on error
+    return ranked
+
+
+def _refine_match(key: tuple, student_persona: dict[str, float], subject: str | None, weight_profile: str) -> None:
+    """Background task: compute the exact ranking behind a fast match so the next identical request gets it."""
+    try:
+        ranked = _ranked_with_summaries(get_teachers(), student_persona, subject, weight_profile)
+    except FileNotFoundError:
+        return
+    _lru_put(_refined_matches, key, ranked, REFINED_MATCHES_MAX)
+
 
-    return MatchResponse(ranked=ranked)
+@app.post("/api/match", response_model=MatchResponse)
+def match(request: MatchRequest, background_tasks: BackgroundTasks) -> MatchResponse:
+    """
+    Rank teachers by compatibility with the given student persona.
+    Optionally filter by subject. Each teacher's summary is replaced with an
+    AI-generated, student-specific summary when OPENAI_API_KEY is set.
+    With fast=true, the nearest archetype's precomputed ranking is returned immediately
+    (approximate=true) and the exact ranking is computed in the background.
+    diversity > 0 re-orders the top of the stack so similar teachers are spread out (MMR).
+    limit returns only the best teachers; with sharding on, only those are fetched from the shards.
+    """
+    try:
+        teachers = get_teachers()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    try:
+        weight_profile = resolve_weight_profile(request.weightProfile, request.subject)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+
+    if request.fast:
+        key = _match_key(request.studentPersona, request.subject, weight_profile)
+        refined = _refined_matches.get(key)
+        if refined is not None:
+            return MatchResponse(ranked=_rerank([dict(r) for r in refined], request, teachers, weight_profile)[: request.limit])
+        model = get_archetypes()
+        # Archetype rankings are precomputed with each subject's default profile only
+        if model is not None and weight_profile == resolve_weight_profile(None, request.subject):
+            index = archetypes.nearest_archetype(model, request.studentPersona)
+            cached = archetypes.cached_ranking(model, index, request.subject)
+            if cached is not None:
+                background_tasks.add_task(_refine_match, key, dict(request.studentPersona), request.subject, weight_profile)
+                return MatchResponse(
+                    ranked=_rerank(cached, request, teachers, weight_profile)[: request.limit],
+                    archetype_id=model["archetypes"][index]["archetype_id"],
+                    approximate=True,
+                )
+
+    ranked = _ranked_with_summaries(teachers, request.studentPersona, request.subject, weight_profile, _rank_depth(request))
+    return MatchResponse(ranked=_rerank(ranked, request, teachers, weight_profile)[: request.limit])
+
+
+@app.websocket("/api/match/what-if")
+async def match_what_if(websocket: WebSocket) -> None:
+    """
+    Live re-scoring while a student drags persona sliders (JSON messages, no LLM calls).
+    First message: {"studentPersona": {...}, "subject"?, "weightProfile"?, "topK"?}; then any
+    number of {"changes": {"pace": 0.7, ...}}. Each is answered with
+    {"type": "ranking", "persona": {...}, "ranked": [...top-k]} or {"type": "error", "detail": ...}.
+    """
+    await websocket.accept()
+    try:
+        try:
+            start = await websocket.receive_json()
+            if not isinstance(start.get("studentPersona"), dict):
+                raise ValueError("studentPersona is required")
+            session = WhatIfSession(
+                get_teachers(),
+                start["studentPersona"],
+                subject=start.get("subject"),
+                weight_profile=start.get("weightProfile"),
+                top_k=int(start.get("topK") or DEFAULT_TOP_K),
+            )
+        except KeyError as e:
+            await websocket.send_json({"type": "error", "detail": str(e.args[0])})
+            await websocket.close(code=1008)
+            return
+        except (json.JSONDecodeError, FileNotFoundError, TypeError, ValueError, AttributeError) as e:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            await websocket.close(code=1008)
+            return
+        await websocket.send_json({"type": "ranking", "persona": session.persona(), "ranked": session.ranking()})
+        while True:
+            try:
+                message = await websocket.receive_json()
+                session.update(message.get("changes") or {})
+            except (json.JSONDecodeError, TypeError, ValueError, AttributeError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            await websocket.send_json({"type": "ranking", "persona": session.persona(), "ranked": session.ranking()})
+    except WebSocketDisconnect:
+        return
+
+
+@app.get("/api/weight-profiles")
+def list_weight_profiles() -> dict:
+    """Registered weight profiles (per-dimension weights) and the subject → profile defaults."""
+    return {"profiles": WEIGHT_PROFILES, "subject_defaults": SUBJECT_WEIGHT_PROFILES}
 
 
 # ── Teacher endpoints ─────────────────────────────────────────────────
 
 @app.get("/api/teachers")
-def list_teachers(subject: str | None = None) -> dict:
-    """Return all teachers, optionally filtered by subject."""
+def list_teachers(
+    request: Request,
+    subject: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: str | None = None,
+    exclude: str | None = None,
+    fmt: str | None = Query(None, alias="format"),
+) -> Response:
+    """
+    Return teachers, optionally filtered by subject. Pre-serialized per catalogue version, with ETag/304 and gzip/br.
+    Same limit/cursor (ordered by teacher_id), fields/exclude and format=ndjson options as /api/students.
+    """
     teachers = get_teachers()
-    if subject:
-        teachers = [t for t in teachers if t.get("subject", "").lower() == subject.lower()]
-    return {"teachers": teachers}
+
+    def records() -> Iterator[dict]:
+        if subject:
+            return (t for t in teachers if t.get("subject", "").lower() == subject.lower())
+        return iter(teachers)
+
+    return _list_response(
+        request,
+        "teachers",
+        (get_catalogue_version(), (subject or "").lower()),
+        records,
+        lambda t: (t.get("teacher_id") or "").strip(),
+        CATALOGUE_CACHE_CONTROL,
+        limit,
+        cursor,
+        fields,
+        exclude,
+        fmt,
+        cache_full=True,
+    )
 
 
 def _teacher_insights(teacher_id: str) -> dict:
@@ -460,7 +1253,6 @@ def _teacher_insights(teacher_id: str) -> dict:
     archetype_distribution = [{"archetype": k, "count": v} for k, v in sorted(archetype_counts.items(), key=lambda x: -x[1])]
 
     # Average persona of likers (per dimension)
-    from matching import DIMENSION_KEYS
     avg_persona: dict[str, float] = {}
     for dim in DIMENSION_KEYS:
         vals = []
@@ -503,16 +1295,117 @@ def get_teacher_insights(teacher_id: str) -> dict:
     return result
 
 
+@app.get("/api/teachers/{teacher_id}/insights/timeseries")
+def get_teacher_insights_timeseries(
+    teacher_id: str,
+    granularity: str = Query("day", description="hour, day or week (weeks start on Monday, UTC)"),
+    start: str | None = Query(None, description="Window start, ISO 8601 or epoch seconds (default: 48 hours / 30 days / 12 weeks back)"),
+    end: str | None = Query(None, description="Window end, ISO 8601 or epoch seconds (default: now)"),
+    persona: bool = Query(True, description="Include the average persona of new likers per bucket"),
+) -> dict:
+    """Likes, unlikes and average new-liker persona per time bucket for this teacher (anonymized)."""
+    tid = teacher_id.strip()
+    if not any((t.get("teacher_id") or "").strip() == tid for t in get_teachers()):
+        raise HTTPException(status_code=404, detail="Teacher not found")
+    try:
+        result = get_like_analytics().timeseries(
+            tid, granularity, like_analytics.parse_time(start), like_analytics.parse_time(end), persona=persona
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"teacher_id": tid, **result}
+
+
+@app.get("/api/teachers/{teacher_id}/similar")
+def similar_teachers_endpoint(
+    teacher_id: str,
+    request: Request,
+    k: int = Query(10, ge=1, le=100),
+    scope: str = Query("all", description="all, same (same subject) or other (other subjects)"),
+) -> Response:
+    """
+    The teachers most similar to this one (weighted persona distance), nearest first, read from
+    the precomputed k-NN graph (at most its K, default 20, per teacher). scope filters the stored
+    neighbours, so same/other may return fewer than k. Cached like /api/teachers.
+    """
+    if scope not in ("all", "same", "other"):
+        raise HTTPException(status_code=400, detail="scope must be all, same or other")
+    teachers = get_teachers()
+    index = teacher_rows(teachers).get(teacher_id.strip())
+    if index is None:
+        raise HTTPException(status_code=404, detail="Teacher not found")
+    graph = get_similar_graph()
+    if graph is None:
+        raise HTTPException(status_code=503, detail="Similar teachers are not precomputed. Run: python similar_teachers.py")
+
+    def build() -> dict:
+        subject = (teachers[index].get("subject") or "").strip()
+        similar = []
+        for i, distance in graph.similar(index):
+            t = teachers[i]
+            same = (t.get("subject") or "").strip() == subject
+            if scope == "same" and not same or scope == "other" and same:
+                continue
+            similar.append(
+                {
+                    "teacher_id": t.get("teacher_id"),
+                    "name": t.get("name"),
+                    "subject": t.get("subject"),
+                    "archetype": t.get("archetype"),
+                    "tagline": t.get("tagline"),
+                    "distance": round(distance, 3),
+                    "similarity": compatibility_score(distance),
+                }
+            )
+            if len(similar) == k:
+                break
+        return {"teacher_id": teachers[index].get("teacher_id"), "scope": scope, "similar": similar}
+
+    key = ("similar", get_catalogue_version(), teacher_id.strip(), k, scope)
+    return http_cache.json_response(request, key, build, cache_control=CATALOGUE_CACHE_CONTROL)
+
+
 @app.get("/api/teachers/{teacher_id}")
-def get_teacher(teacher_id: str) -> dict:
-    """Return a single teacher by teacher_id. 404 if not found."""
+def get_teacher(teacher_id: str, request: Request) -> Response:
+    """Return a single teacher by teacher_id. 404 if not found. Cached like /api/teachers."""
     teachers = get_teachers()
     for t in teachers:
         if (t.get("teacher_id") or "").strip() == teacher_id.strip():
-            return t
+            key = ("teacher", get_catalogue_version(), teacher_id.strip())
+            return http_cache.json_response(request, key, lambda: t, cache_control=CATALOGUE_CACHE_CONTROL)
     raise HTTPException(status_code=404, detail="Teacher not found")
 
 
+@app.post("/api/teachers/import")
+async def import_teachers_endpoint(
+    request: Request,
+    fmt: str | None = Query(None, alias="format", description="ndjson or json (default: detected)"),
+    dry_run: bool = False,
+    batch_size: int = Query(teacher_import.DEFAULT_BATCH_SIZE, ge=1, le=50_000),
+) -> dict:
+    """
+    Bulk-import teachers from the request body: NDJSON (one teacher per line) or JSON (an array,
+    or {"teachers": [...]}). Records are parsed one at a time, validated, and upserted by
+    teacher_id in batches into the catalogue this worker serves, with no reload; teachers.json
+    is rewritten at the end. Invalid records are skipped and reported. Other API workers pick
+    up the new teachers.json on restart. dry_run=true only validates.
+    """
+    if fmt is not None and fmt not in teacher_import.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(teacher_import.FORMATS)}")
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+    try:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        text = io.TextIOWrapper(spool, encoding="utf-8", errors="replace")
+        try:
+            return await run_in_threadpool(import_teachers, text, fmt, batch_size, dry_run)
+        except teacher_import.UploadError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        spool.close()
+
+
 # ── Learn endpoints (study plan, prompts) ─────────────────────────────
 
 @app.post("/api/learn/personalized-summary")
@@ -523,13 +1416,8 @@ def learn_personalized_summary(request: LearnPersonalizedSummaryRequest) -> dict
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
     subject = (teacher.get("subject") or "").strip()
-    ranked = rank_teachers(teachers, request.studentPersona, subject=subject or None)
-    ranked_teacher = next((r for r in ranked if (r.get("teacher_id") or "").strip() == request.teacherId.strip()), None)
-    if not ranked_teacher:
-        summary = teacher.get("summary") or "No summary available."
-    else:
-        summary = _generate_personalized_summary(ranked_teacher)
-    return {"summary": summary}
+    # Only this teacher's "why" is needed: same entry as in the subject ranking, without ranking the subject
+    return {"summary": _generate_personalized_summary(explain_match(teacher, request.studentPersona, subject=subject or None))}
 
 
 @app.post("/api/learn/prompts")
@@ -539,7 +1427,7 @@ def learn_prompts(request: LearnPromptsRequest) -> dict:
     teacher = next((t for t in teachers if (t.get("teacher_id") or "").strip() == request.teacherId.strip()), None)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
-    return _generate_modality_prompts(teacher)
+    return _get_modality_prompts(teacher)
 
 
 @app.post("/api/learn/study-plan")
@@ -554,15 +1442,141 @@ def learn_study_plan(request: LearnStudyPlanRequest) -> dict:
             status_code=503,
             detail="OPENAI_API_KEY is not set. Add it to .env and restart the API.",
         )
-    prompts = _generate_modality_prompts(teacher)
-    text_prompt = prompts.get("text_prompt", "")
-    plan = _generate_study_plan(teacher, request.studentPersona, request.topic, text_prompt)
+    modality_prompts = _get_modality_prompts(teacher)
+    text_prompt = modality_prompts.get("text_prompt", "")
+    key = _study_plan_key(teacher, request.studentPersona, request.topic)
+    plan = _study_plan_cache.get(key)
+    if plan is None:
+        plan = _generate_study_plan(teacher, request.studentPersona, request.topic, text_prompt)
+        if not (plan or "").strip():
+            raise HTTPException(
+                status_code=503,
+                detail="Study plan could not be generated. Check OPENAI_API_KEY and API availability.",
+            )
+        _store_study_plan(key, plan)
+    return {"study_plan": plan, "text_prompt": text_prompt}
+
+
+@app.post("/api/learn/study-plan/stream")
+def learn_study_plan_stream(request: LearnStudyPlanRequest) -> StreamingResponse:
+    """
+    Streaming variant of /api/learn/study-plan (NDJSON, one event per line):
+    {"type": "start", "cached": ...} right away (before any upstream call),
+    {"type": "outline", "sections": [...]} as soon as the outline block is complete,
+    then {"type": "delta", "text": ...} body chunks, then {"type": "done", "text_prompt": ...}
+    or {"type": "error", "detail": ...}.
+    """
+    teachers = get_teachers()
+    teacher = next((t for t in teachers if (t.get("teacher_id") or "").strip() == request.teacherId.strip()), None)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher not found")
+    if not os.environ.get("OPENAI_API_KEY"):
+        raise HTTPException(
+            status_code=503,
+            detail="OPENAI_API_KEY is not set. Add it to .env and restart the API.",
+        )
+
+    def events():
+        key = _study_plan_key(teacher, request.studentPersona, request.topic)
+        cached = _study_plan_cache.get(key)
+        yield json.dumps({"type": "start", "cached": cached is not None}) + "\n"
+        splitter = _OutlineSplitter()
+        parts = []
+        try:
+            if cached is not None:
+                # The plan is done; report the text prompt only if it is already known
+                text_prompt = (_modality_prompts_cache.get(_modality_prompts_key(teacher)) or {}).get("text_prompt", "")
+                chunks = [cached]
+            else:
+                text_prompt = _get_modality_prompts(teacher).get("text_prompt", "")
+                chunks = _stream_study_plan(teacher, request.studentPersona, request.topic, text_prompt)
+            for chunk in chunks:
+                parts.append(chunk)
+                for event in splitter.feed(chunk):
+                    yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": f"Study plan generation failed: {e}"}) + "\n"
+            return
+        for event in splitter.flush():
+            yield json.dumps(event) + "\n"
+        plan = "".join(parts).strip()
+        if not plan:
+            yield json.dumps({"type": "error", "detail": "Study plan could not be generated. Check OPENAI_API_KEY and API availability."}) + "\n"
+            return
+        if cached is None:
+            _store_study_plan(key, plan)
+        yield json.dumps({"type": "done", "text_prompt": text_prompt}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+def _comparison_plan(teacher: dict, student_persona: dict[str, float], topic: str) -> dict:
+    """One teacher's entry of a study plan comparison: prompt lookup, then the (cached) plan."""
+    entry = {"teacher_id": teacher.get("teacher_id"), "name": teacher.get("name"), "subject": teacher.get("subject")}
+    key = _study_plan_key(teacher, student_persona, topic)
+    plan = _study_plan_cache.get(key)
+    if plan is not None:
+        return dict(entry, type="plan", study_plan=plan, cached=True)
+    text_prompt = _get_modality_prompts(teacher).get("text_prompt", "")
+    plan = _generate_study_plan(teacher, student_persona, topic, text_prompt)
     if not (plan or "").strip():
+        return dict(entry, type="error", detail="Study plan could not be generated. Check OPENAI_API_KEY and API availability.")
+    _store_study_plan(key, plan)
+    return dict(entry, type="plan", study_plan=plan, cached=False)
+
+
+@app.post("/api/learn/study-plan/compare")
+def compare_study_plans(request: CompareStudyPlansRequest) -> StreamingResponse:
+    """
+    Study plans for the same topic from several teachers (the given teacherIds, else the student's
+    liked teachers), generated concurrently (UNITINDER_COMPARE_CONCURRENCY at a time) and streamed
+    as NDJSON in completion order: {"type": "start", "teacher_ids": [...]}, then per teacher
+    {"type": "plan", "teacher_id", "name", "subject", "study_plan", "cached"} or
+    {"type": "error", "teacher_id", ..., "detail"}, then {"type": "done", "plans", "errors"}.
+    """
+    by_id = {(t.get("teacher_id") or "").strip(): t for t in get_teachers()}
+    if request.teacherIds is not None:
+        ids = [(tid or "").strip() for tid in request.teacherIds]
+        missing = [tid for tid in ids if tid not in by_id]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Teachers not found: {missing}")
+    elif request.studentId:
+        ids = [(tid or "").strip() for tid in _load_likes_data().get(request.studentId) or []]
+        ids = [tid for tid in ids if tid in by_id]
+    else:
+        raise HTTPException(status_code=400, detail="Provide teacherIds or studentId")
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise HTTPException(status_code=404, detail="No teachers to compare")
+    if len(ids) > COMPARE_MAX_TEACHERS:
+        raise HTTPException(status_code=400, detail=f"At most {COMPARE_MAX_TEACHERS} teachers can be compared")
+    if not os.environ.get("OPENAI_API_KEY"):
         raise HTTPException(
             status_code=503,
-            detail="Study plan could not be generated. Check OPENAI_API_KEY and API availability.",
+            detail="OPENAI_API_KEY is not set. Add it to .env and restart the API.",
         )
-    return {"study_plan": plan, "text_prompt": text_prompt}
+    teachers = [by_id[tid] for tid in ids]
+
+    def events():
+        yield json.dumps({"type": "start", "teacher_ids": ids}) + "\n"
+        executor = ThreadPoolExecutor(max_workers=max(1, min(COMPARE_CONCURRENCY, len(teachers))))
+        futures = {executor.submit(_comparison_plan, t, request.studentPersona, request.topic): t for t in teachers}
+        counts = {"plan": 0, "error": 0}
+        try:
+            for future in as_completed(futures):
+                try:
+                    event = future.result()
+                except Exception as e:
+                    t = futures[future]
+                    event = {"type": "error", "teacher_id": t.get("teacher_id"), "name": t.get("name"), "subject": t.get("subject"), "detail": f"Study plan generation failed: {e}"}
+                counts[event["type"]] += 1
+                yield json.dumps(event) + "\n"
+        finally:
+            # Client gone: drop the plans that have not started (running ones still fill the cache)
+            executor.shutdown(wait=False, cancel_futures=True)
+        yield json.dumps({"type": "done", "plans": counts["plan"], "errors": counts["error"]}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
 
 
 # ── Voice cloning endpoints ───────────────────────────────────────────
@@ -577,30 +1591,21 @@ async def clone_voice(
     Upload an audio or video file to clone a teacher's voice via ElevenLabs.
     - If video: extracts audio first using moviepy, then clones.
     - If audio: clones directly.
+    - If this recording (by content hash) was cloned for this teacher before: reuses its voice_id (200, reused="voice");
+      if only its clone failed before: reuses the extracted audio (reused="audio").
     Saves voice_id back to teachers.json.
     """
-    if full_pipeline is None or clone_teacher_voice is None:
+    voice = _voice()
+    if voice is None:
         raise HTTPException(
             status_code=503,
             detail="Voice cloning unavailable. Install elevenlabs and moviepy: pip install elevenlabs moviepy",
         )
-    VIDEO_EXTENSIONS = {".mp4", ".mov", ".webm", ".avi", ".mkv"}
-    
-    # Save uploaded file locally
-    suffix = Path(audio.filename or ".mp3").suffix.lower()
-    upload_path = AUDIO_DIR / f"{teacher_id}_upload{suffix}"
-    content = await audio.read()
-    with open(upload_path, "wb") as f:
-        f.write(content)
 
+    # Hash while saving: a recording that was cloned before is not extracted or cloned again
+    sha256, upload_path = await _clone_registry.receive(audio)
     try:
-        if suffix in VIDEO_EXTENSIONS:
-            # Video → extract audio → clone
-            result = full_pipeline(str(upload_path), teacher_name, teacher_id)
-            voice_id = result["voice_id"]
-        else:
-            # Audio → clone directly
-            voice_id = clone_teacher_voice(str(upload_path), teacher_name)
+        voice_id, reused = await run_in_threadpool(_clone_registry.clone, voice, sha256, upload_path, teacher_id.strip(), teacher_name)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Voice clone failed: {e}")
 
@@ -613,12 +1618,17 @@ async def clone_voice(
     _save_teachers_raw(raw)
 
     # Invalidate teachers cache
-    global _teachers_cache
-    _teachers_cache = None
+    _invalidate_teachers()
 
     return JSONResponse(
-        content={"voice_id": voice_id, "teacher_id": teacher_id, "message": "Voice cloned successfully"},
-        status_code=status.HTTP_201_CREATED,
+        content={
+            "voice_id": voice_id,
+            "teacher_id": teacher_id,
+            "upload_sha256": sha256,
+            "reused": reused,
+            "message": "Voice already cloned from this recording" if reused == "voice" else "Voice cloned successfully",
+        },
+        status_code=status.HTTP_200_OK if reused == "voice" else status.HTTP_201_CREATED,
     )
 
 
@@ -628,13 +1638,14 @@ def generate_audio(request: TTSRequest) -> Response:
     Generate speech audio from text using a cloned voice.
     Returns MP3 audio bytes directly.
     """
-    if generate_speech is None:
+    voice = _voice()
+    if voice is None:
         raise HTTPException(
             status_code=503,
             detail="TTS unavailable. Install elevenlabs: pip install elevenlabs",
         )
     try:
-        audio_bytes = generate_speech(request.voice_id, request.text)
+        audio_bytes = voice.generate_speech(request.voice_id, request.text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"TTS failed: {e}")
 
@@ -648,7 +1659,8 @@ def generate_audio_by_teacher(request: GenerateByTeacherRequest) -> Response:
     Returns 400 if the teacher has no voice_id (upload a video first).
     Text is truncated to TTS_MAX_TEXT_LENGTH characters to stay within API limits.
     """
-    if generate_speech is None:
+    voice = _voice()
+    if voice is None:
         raise HTTPException(
             status_code=503,
             detail="TTS unavailable. Install elevenlabs: pip install elevenlabs",
@@ -672,12 +1684,15 @@ def generate_audio_by_teacher(request: GenerateByTeacherRequest) -> Response:
     if len(text) > TTS_MAX_TEXT_LENGTH:
         text = text[: TTS_MAX_TEXT_LENGTH - 3].rstrip() + "..."
     try:
-        audio_bytes = generate_speech(voice_id, text)
+        audio_bytes = voice.generate_speech(voice_id, text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"TTS failed: {e}")
     return Response(content=audio_bytes, media_type="audio/mpeg")
 
 
+@_llm_flight.coalesce(
+    lambda teacher, topic: (json.dumps(_teacher_prompt_data(teacher), sort_keys=True), teacher.get("tagline"), " ".join(topic.lower().split()))
+)
 def _generate_teaching_preview(teacher: dict, topic: str) -> str:
     """
     Generate a ~2 minute script where the teacher introduces how they would
@@ -688,64 +1703,31 @@ def _generate_teaching_preview(teacher: dict, topic: str) -> str:
     if not api_key:
         return ""
 
-    name = teacher.get("name", "Teacher")
-    subject = teacher.get("subject", "")
-    archetype = teacher.get("archetype", "")
-    tagline = teacher.get("tagline", "")
-    persona = teacher.get("persona", {})
-
-    prompt = f"""You are {name}, a {subject} teacher. Your archetype is "{archetype}" and your tagline is "{tagline}".
-
-Write a 300-400 word monologue (approximately 2 minutes when spoken aloud) where you introduce yourself and explain how you would teach "{topic}" to a student.
-
-IMPORTANT RULES:
-- Write in FIRST PERSON as if you are the teacher speaking directly to a student
-- Match the teacher's personality: if they are warm and casual, be warm and casual; if formal and rigorous, be formal and rigorous
-- Start with a brief self-introduction ("Hey, I'm {name}..." or "Good morning, I'm Professor {name}..." depending on style)
-- Explain YOUR approach to teaching {topic} — what makes your method unique
-- Give a small taste/example of how a typical lesson would go
-- End with something encouraging or motivating
-- Do NOT use bullet points, headers, or formatting — this is a SPOKEN monologue meant for text-to-speech
-- Do NOT include stage directions, emojis, or anything that isn't spoken words
-- Keep it natural and conversational, as if speaking to a student sitting in front of you
-
-Teacher personality traits (0-1 scale, for reference):
-- Pace: {persona.get('pace', 0.5)} (0=slow, 1=fast)
-- Formality: {persona.get('formality', 0.5)} (0=casual, 1=formal)
-- Humor: {persona.get('humor_receptivity', 0.5)} (0=serious, 1=humorous)
-- Interactivity: {persona.get('interactivity', 0.5)} (0=lecture-style, 1=interactive)
-- Abstraction: {persona.get('abstraction', 0.5)} (0=concrete examples, 1=abstract theory)
-- Storytelling: {persona.get('storytelling_affinity', 0.5)} (0=factual, 1=storyteller)
-
-Write ONLY the monologue text. No labels, no formatting."""
-
     try:
-        client = OpenAI(base_url=OPENAI_BASE_URL, api_key=api_key)
-        completion = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": f"You are {name}, a {subject} teacher. Write exactly as you would speak — natural, in-character, no formatting."},
-                {"role": "user", "content": prompt},
-            ],
-            max_completion_tokens=800,
-        )
+        completion = _chat_completion(api_key, prompts.teaching_preview(teacher, topic), max_completion_tokens=800)
         text = (completion.choices[0].message.content or "").strip()
         return text
     except Exception:
         return ""
 
 
+def _preview_script(teacher: dict, topic: str) -> str:
+    """Teaching preview script, truncated to what TTS accepts ("" if it could not be generated)."""
+    script = _generate_teaching_preview(teacher, topic)
+    if len(script) > TTS_MAX_TEXT_LENGTH:
+        script = script[:TTS_MAX_TEXT_LENGTH - 3].rstrip() + "..."
+    return script
+
+
 @app.post("/api/voice/teacher-preview")
 def teacher_preview(request: TeacherPreviewRequest) -> Response:
     """
     Generate a ~2 minute audio preview of how a teacher would teach a given topic.
+    Pre-rendered previews (preview_audio.py) are served from disk; otherwise:
     1. LLM generates a monologue script in the teacher's style
     2. ElevenLabs TTS speaks it in the teacher's voice
     Returns MP3 audio.
     """
-    if generate_speech is None:
-        raise HTTPException(status_code=503, detail="TTS unavailable. Install elevenlabs.")
-
     teachers = get_teachers()
     teacher = next(
         (t for t in teachers if (t.get("teacher_id") or "").strip() == request.teacher_id.strip()),
@@ -758,39 +1740,97 @@ def teacher_preview(request: TeacherPreviewRequest) -> Response:
     if not voice_id:
         raise HTTPException(status_code=400, detail="Teacher has no voice assigned.")
 
+    key = preview_audio.preview_key(teacher, request.topic)
+    prerendered = _preview_store.get(key)
+    if prerendered is not None:
+        return FileResponse(prerendered, media_type="audio/mpeg", headers={"X-Preview-Source": "prerendered"})
+
+    voice = _voice()
+    if voice is None:
+        raise HTTPException(status_code=503, detail="TTS unavailable. Install elevenlabs.")
+
     # Step 1: Generate the teaching preview script
-    script = _generate_teaching_preview(teacher, request.topic)
+    script = _preview_script(teacher, request.topic)
     if not script:
         raise HTTPException(status_code=503, detail="Failed to generate teaching preview script. Check OPENAI_API_KEY.")
 
-    # Truncate if needed
-    if len(script) > TTS_MAX_TEXT_LENGTH:
-        script = script[:TTS_MAX_TEXT_LENGTH - 3].rstrip() + "..."
-
     # Step 2: Generate audio with teacher's voice
     try:
-        audio_bytes = generate_speech(voice_id, script)
+        audio_bytes = voice.generate_speech(voice_id, script)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"TTS failed: {e}")
 
-    return Response(content=audio_bytes, media_type="audio/mpeg")
+    # Keep live renders of the common topics too; arbitrary topics would grow the store without bound
+    if preview_audio.is_common_topic(teacher.get("subject"), request.topic):
+        try:
+            _preview_store.put(key, audio_bytes, teacher_id=teacher.get("teacher_id"), voice_id=voice_id, topic=request.topic, script=script)
+        except OSError:
+            pass
+    return Response(content=audio_bytes, media_type="audio/mpeg", headers={"X-Preview-Source": "live"})
 
 
 @app.get("/api/voice/list")
 def list_voices() -> dict:
     """List all available ElevenLabs voices."""
-    if list_cloned_voices is None:
+    voice = _voice()
+    if voice is None:
         raise HTTPException(
             status_code=503,
             detail="Voice list unavailable. Install elevenlabs: pip install elevenlabs",
         )
     try:
-        voices = list_cloned_voices()
+        voices = voice.list_cloned_voices()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list voices: {e}")
     return {"voices": voices}
 
 
+# ── Upstream metrics ──────────────────────────────────────────────────
+
+@app.get("/api/upstream/metrics")
+def upstream_metrics() -> dict:
+    """Per-provider rate limit / retry / circuit breaker counters, prompt token accounting, request coalescing and prefetch stats."""
+    return {
+        "providers": upstream.metrics(),
+        "prompts": prompts.metrics(),
+        "llm_singleflight": dict(_llm_flight.stats),
+        "prefetch": dict(_prefetch_queue.stats, pending=_prefetch_queue.pending()),
+    }
+
+
+# ── Profiling ─────────────────────────────────────────────────────────
+
+def _require_profile_token(request: Request) -> None:
+    if PROFILE_TOKEN is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled. Set UNITINDER_PROFILE_TOKEN.")
+    if not profiling.token_matches(request.headers.get("x-profile-token"), PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Profile-Token")
+
+
+@app.get("/api/debug/profiles")
+def list_profiles(request: Request) -> dict:
+    """Recent on-demand request profiles and the slowest always-on ones (summaries only)."""
+    _require_profile_token(request)
+    return _profiles.summaries()
+
+
+@app.get("/api/debug/profiles/{profile_id}")
+def get_profile(profile_id: str, request: Request) -> Response:
+    """One profile as collapsed stacks (flamegraph.pl / speedscope input)."""
+    _require_profile_token(request)
+    profile = _profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return Response(
+        content=profile.collapsed(),
+        media_type="text/plain; charset=utf-8",
+        headers={
+            "Content-Disposition": f'attachment; filename="{profile.id}.collapsed"',
+            "X-Profile-Duration-Ms": str(profile.duration_ms),
+        },
+    )
+
+
 # ── Health check ──────────────────────────────────────────────────────
 
 @app.get("/health")
@@ -5,9 +5,13 @@ with compatibility score and best-3 / worst-2 dimension "why".
 """
 
 import json
+import os
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any
 
+import numpy as np
+
 # All 24 dimensions (must match teachers.json and student quiz output)
 DIMENSION_KEYS = [
     "pace",
@@ -62,17 +66,259 @@ def _get_weights() -> dict[str, float]:
 
 WEIGHTS = _get_weights()
 
+# Same weights as an array in DIMENSION_KEYS order, for vectorized distance over many personas
+WEIGHT_VECTOR = np.array([WEIGHTS[d] for d in DIMENSION_KEYS], dtype=np.float64)
+
+
+def persona_vector(persona: dict[str, float]) -> np.ndarray:
+    """Persona dict as a 24-vector in DIMENSION_KEYS order (missing dimensions = 0.5)."""
+    return np.array([float(persona.get(d, 0.5)) for d in DIMENSION_KEYS], dtype=np.float64)
+
+
+def persona_matrix(personas: list[dict[str, float]]) -> np.ndarray:
+    """Stack personas into an (n, 24) matrix, one row per persona."""
+    if not personas:
+        return np.empty((0, len(DIMENSION_KEYS)), dtype=np.float64)
+    return np.vstack([persona_vector(p) for p in personas])
+
 
-def weighted_distance(student_persona: dict[str, float], teacher_persona: dict[str, float]) -> float:
+def weighted_distances(vector: np.ndarray, matrix: np.ndarray, weights: np.ndarray = WEIGHT_VECTOR) -> np.ndarray:
+    """Weighted Manhattan distance from one persona vector to every row of matrix."""
+    return np.abs(matrix - vector) @ weights
+
+
+def weighted_distance(
+    student_persona: dict[str, float], teacher_persona: dict[str, float], weights: dict[str, float] = WEIGHTS
+) -> float:
     """Weighted Manhattan distance over 24 dimensions."""
     total = 0.0
     for dim in DIMENSION_KEYS:
         s = student_persona.get(dim, 0.5)
         t = teacher_persona.get(dim, 0.5)
-        total += WEIGHTS[dim] * abs(s - t)
+        total += weights[dim] * abs(s - t)
+    return total
+
+
+# ── Weight profiles ──────────────────────────────────────────────────
+# Named weightings selectable per request (A/B experiments) or per subject. "default" is WEIGHTS.
+DEFAULT_WEIGHT_PROFILE = "default"
+WEIGHT_PROFILES: dict[str, dict[str, float]] = {DEFAULT_WEIGHT_PROFILE: WEIGHTS}
+# Their weights as 24-vectors in DIMENSION_KEYS order, compiled at registration (one per profile)
+_weight_vectors: dict[str, np.ndarray] = {DEFAULT_WEIGHT_PROFILE: WEIGHT_VECTOR}
+
+# Subject → profile used when the request does not name one
+SUBJECT_WEIGHT_PROFILES: dict[str, str] = {}
+
+
+def register_weight_profile(name: str, overrides: dict[str, float], base: str = DEFAULT_WEIGHT_PROFILE) -> dict[str, float]:
+    """Add (or replace) a profile: base profile's weights with overrides applied. Returns the full weights."""
+    unknown = set(overrides) - set(DIMENSION_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown dimensions in weight profile {name!r}: {sorted(unknown)}")
+    if any(w < 0 for w in overrides.values()):
+        raise ValueError(f"Weights must be non-negative in profile {name!r}")
+    weights = dict(get_weight_profile(base))
+    weights.update({d: float(w) for d, w in overrides.items()})
+    WEIGHT_PROFILES[name] = weights
+    _weight_vectors[name] = np.array([weights[d] for d in DIMENSION_KEYS], dtype=np.float64)
+    return weights
+
+
+def get_weight_profile(name: str) -> dict[str, float]:
+    """Weights of a registered profile. Raises KeyError for unknown names."""
+    if name not in WEIGHT_PROFILES:
+        raise KeyError(f"Unknown weight profile: {name!r}")
+    return WEIGHT_PROFILES[name]
+
+
+def resolve_weight_profile(profile: str | None = None, subject: str | None = None) -> str:
+    """Explicit profile if given, else the subject's profile, else "default"."""
+    if profile:
+        get_weight_profile(profile)
+        return profile
+    if subject is not None:
+        return SUBJECT_WEIGHT_PROFILES.get(subject.strip(), DEFAULT_WEIGHT_PROFILE)
+    return DEFAULT_WEIGHT_PROFILE
+
+
+# Derived data of teacher catalogues (persona matrix, id → row, distances), keyed by (id(teachers), kind).
+# Each entry keeps a reference to its teachers list so the id cannot be reused while cached;
+# get_teachers() replaces the list on reload, which naturally misses the cache. LRU-bounded.
+CATALOGUE_CACHE_MAX = 16
+_catalogue_cache: OrderedDict = OrderedDict()
+
+
+def _per_catalogue(teachers: list[dict[str, Any]], kind: str, build):
+    key = (id(teachers), kind)
+    # pop + reinsert (not move_to_end) and a guarded eviction: requests call this concurrently without a lock
+    entry = _catalogue_cache.pop(key, None)
+    if entry is None or entry[0] is not teachers:
+        entry = (teachers, build())
+    _catalogue_cache[key] = entry
+    while len(_catalogue_cache) > CATALOGUE_CACHE_MAX:
+        try:
+            _catalogue_cache.popitem(last=False)
+        except KeyError:
+            break
+    return entry[1]
+
+
+def teacher_matrix(teachers: list[dict[str, Any]]) -> np.ndarray:
+    """(n, 24) persona matrix of this teacher list, built once per catalogue (or mapped from its snapshot)."""
+    precompiled = getattr(teachers, "matrix", None)
+    if precompiled is not None:
+        return precompiled
+    return _per_catalogue(teachers, "matrix", lambda: persona_matrix([t.get("persona") or {} for t in teachers]))
+
+
+def teacher_rows(teachers: list[dict[str, Any]]) -> dict[str, int]:
+    """teacher_id → row of teacher_matrix, built once per catalogue."""
+
+    def build() -> dict[str, int]:
+        ids = teachers.teacher_ids() if hasattr(teachers, "teacher_ids") else [(t.get("teacher_id") or "").strip() for t in teachers]
+        return {tid: i for i, tid in enumerate(ids)}
+
+    return _per_catalogue(teachers, "rows", build)
+
+
+def _subject_index(teachers: list[dict[str, Any]]) -> dict[str, list[int]]:
+    def build() -> dict[str, list[int]]:
+        if hasattr(teachers, "subjects"):
+            return {subject: teachers.subject_indices(subject) for subject in teachers.subjects()}
+        index: dict[str, list[int]] = {}
+        for i, t in enumerate(teachers):
+            index.setdefault((t.get("subject") or "").strip(), []).append(i)
+        return index
+
+    return _per_catalogue(teachers, "subjects", build)
+
+
+def subject_indices(teachers: list[dict[str, Any]], subject: str) -> list[int]:
+    """Catalogue indices of the teachers in a subject, in catalogue order (indexed once per catalogue, or by its snapshot)."""
+    lookup = getattr(teachers, "subject_indices", None)
+    if lookup is not None:
+        return lookup(subject)
+    return list(_subject_index(teachers).get(subject.strip(), ()))
+
+
+class _MatrixBuffer:
+    """Persona matrix rows with spare capacity, so catalogue inserts append without copying the matrix."""
+
+    def __init__(self, matrix: np.ndarray, capacity: int):
+        self.rows = np.empty((max(capacity, len(matrix)), len(DIMENSION_KEYS)), dtype=np.float64)
+        self.rows[: len(matrix)] = matrix
+        self.size = len(matrix)
+
+
+def upsert_catalogue(teachers: list[dict[str, Any]], records: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], int, int]:
+    """
+    A new catalogue list with records inserted (new teacher_id, appended) or replacing the
+    teacher with the same id in place, plus (inserted, updated) counts. `teachers` is left
+    untouched, so requests still holding it stay consistent.
+
+    The derived data of the old list is carried over incrementally: persona rows are appended
+    to a growable buffer shared with the old list's matrix (whose view never sees rows past its
+    own length), and the id → row map and subject index are copied and extended. A batch that
+    replaces existing teachers copies the matrix once. Pairwise distances are rebuilt lazily.
+    """
+    rows = dict(teacher_rows(teachers))
+    subjects = {subject: indices for subject, indices in _subject_index(teachers).items()}
+    result = list(teachers)
+    new_rows: list[dict[str, float]] = []
+    replaced: dict[int, dict[str, float]] = {}
+    touched: set[str] = set()
+    for record in records:
+        tid = (record.get("teacher_id") or "").strip()
+        subject = (record.get("subject") or "").strip()
+        i = rows.get(tid)
+        if i is None:
+            i = rows[tid] = len(result)
+            result.append(record)
+            new_rows.append(record.get("persona") or {})
+        else:
+            old_subject = (result[i].get("subject") or "").strip()
+            if old_subject != subject:
+                if old_subject not in touched:
+                    subjects[old_subject] = list(subjects.get(old_subject, ()))
+                    touched.add(old_subject)
+                subjects[old_subject].remove(i)
+            result[i] = record
+            replaced[i] = record.get("persona") or {}
+            if old_subject == subject:
+                continue
+        if subject not in touched:
+            subjects[subject] = list(subjects.get(subject, ()))
+            touched.add(subject)
+        subjects[subject].append(i)
+    for subject in touched:
+        subjects[subject].sort()  # catalogue order, as a fresh index would have it
+        if not subjects[subject]:
+            del subjects[subject]
+
+    entry = _catalogue_cache.get((id(teachers), "matrix_buffer"))
+    buffer = entry[1] if entry is not None and entry[0] is teachers else None
+    n_old = len(teachers)
+    if buffer is None or buffer.size != n_old or replaced or n_old + len(new_rows) > len(buffer.rows):
+        # First growth, another list already appended past n_old, rows replaced, or out of capacity
+        buffer = _MatrixBuffer(teacher_matrix(teachers), capacity=2 * (n_old + len(new_rows)))
+    if new_rows:
+        buffer.rows[n_old : n_old + len(new_rows)] = persona_matrix(new_rows)
+    for i, persona in replaced.items():
+        buffer.rows[i] = persona_vector(persona)
+    buffer.size = len(result)
+
+    _per_catalogue(result, "matrix_buffer", lambda: buffer)
+    _per_catalogue(result, "matrix", lambda: buffer.rows[: len(result)])
+    _per_catalogue(result, "rows", lambda: rows)
+    _per_catalogue(result, "subjects", lambda: subjects)
+    return result, len(new_rows), len(records) - len(new_rows)
+
+
+def weight_vector(profile: str = DEFAULT_WEIGHT_PROFILE) -> np.ndarray:
+    """A registered profile's weights as a 24-vector. Raises KeyError for unknown names."""
+    get_weight_profile(profile)
+    return _weight_vectors[profile]
+
+
+def contribution_matrix(matrix: np.ndarray, vector: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Per-dimension weighted contributions w * |s - t| for every row (same arithmetic as dimension_contributions)."""
+    return np.abs(vector - matrix) * weights
+
+
+def sum_contributions(contributions: np.ndarray) -> np.ndarray:
+    """Row sums accumulated dimension by dimension, so totals match weighted_distance exactly."""
+    total = np.zeros(len(contributions), dtype=np.float64)
+    for j in range(contributions.shape[1]):
+        total += contributions[:, j]
     return total
 
 
+# Example profiles, selectable per request (weightProfile). A subject uses one only when mapped
+# in UNITINDER_SUBJECT_WEIGHT_PROFILES, e.g. "Cryptography=theory,Databases=applied".
+register_weight_profile(
+    "theory",
+    {"abstraction": 3.0, "cognitive_load_tolerance": 3.0, "challenge_preference": 2.0, "real_world_need": 1.0},
+)
+register_weight_profile(
+    "applied",
+    {"real_world_need": 3.0, "interactivity": 3.0, "abstraction": 1.0, "visual_dependency": 2.0},
+)
+
+
+def _subject_weight_profiles_from_env() -> dict[str, str]:
+    mapping = {}
+    for item in os.environ.get("UNITINDER_SUBJECT_WEIGHT_PROFILES", "").split(","):
+        if not item.strip():
+            continue
+        subject, _, profile = item.partition("=")
+        get_weight_profile(profile.strip())  # unknown profile names fail at startup
+        mapping[subject.strip()] = profile.strip()
+    return mapping
+
+
+SUBJECT_WEIGHT_PROFILES.update(_subject_weight_profiles_from_env())
+
+
 def compatibility_score(distance: float) -> float:
     """Convert distance to 0–100 score (higher = better match)."""
     if distance < 0:
@@ -80,15 +326,20 @@ def compatibility_score(distance: float) -> float:
     return round(100.0 / (1.0 + distance), 2)
 
 
+# Scores are rounded to cents: a row whose unrounded score is within this of a rounded score may
+# round to it, so top-k selections keep every such row as a candidate for the k-th place
+SCORE_TIE_MARGIN = 0.01
+
+
 def dimension_contributions(
-    student_persona: dict[str, float], teacher_persona: dict[str, float]
+    student_persona: dict[str, float], teacher_persona: dict[str, float], weights: dict[str, float] = WEIGHTS
 ) -> list[tuple[str, float]]:
     """Per-dimension weighted contribution to distance. Returns list of (dimension, contribution) sorted by contribution ascending (best first)."""
     contributions = []
     for dim in DIMENSION_KEYS:
         s = student_persona.get(dim, 0.5)
         t = teacher_persona.get(dim, 0.5)
-        contrib = WEIGHTS[dim] * abs(s - t)
+        contrib = weights[dim] * abs(s - t)
         contributions.append((dim, contrib))
     contributions.sort(key=lambda x: x[1])
     return contributions
@@ -108,51 +359,212 @@ def load_teachers(path: str | Path) -> list[dict[str, Any]]:
     return data.get("teachers", data) if isinstance(data, dict) else data
 
 
+def explain_match(
+    teacher: dict[str, Any],
+    student_persona: dict[str, float],
+    subject: str | None = None,
+    weight_profile: str | None = None,
+) -> dict[str, Any]:
+    """
+    One teacher's entry as rank_teachers would build it (same weights and "why"), without ranking
+    the catalogue. compatibility_score is the raw 0–100 score: normalization needs the whole list.
+    """
+    weights = weight_vector(resolve_weight_profile(weight_profile, subject))
+    contributions = contribution_matrix(persona_vector(teacher.get("persona") or {})[None, :], persona_vector(student_persona), weights)
+    score = compatibility_score(float(sum_contributions(contributions)[0]))
+    return ranked_entry(teacher, score, np.argsort(contributions[0], kind="stable"))
+
+
 def rank_teachers(
     teachers: list[dict[str, Any]],
     student_persona: dict[str, float],
     subject: str | None = None,
+    weight_profile: str | None = None,
 ) -> list[dict[str, Any]]:
     """
     Filter by subject (if given), compute weighted distance and score for each teacher,
     add best/worst dimension "why", and return list sorted by compatibility (best first).
+    weight_profile selects a registered profile; by default the subject's profile is used.
+    The catalogue's persona matrix and the profile's weight vector are cached, so only the
+    student-dependent arithmetic runs per request.
     """
+    weights = weight_vector(resolve_weight_profile(weight_profile, subject))
+    matrix = teacher_matrix(teachers)
     if subject is not None:
-        subject_clean = subject.strip()
-        teachers = [t for t in teachers if (t.get("subject") or "").strip() == subject_clean]
+        indices = subject_indices(teachers, subject)
+    else:
+        indices = list(range(len(teachers)))
+
+    contributions = contribution_matrix(matrix[indices], persona_vector(student_persona), weights)
+    distances = sum_contributions(contributions)
+    # Stable argsort keeps DIMENSION_KEYS order among equal contributions, like dimension_contributions
+    order = np.argsort(contributions, axis=1, kind="stable")
 
     results = []
-    for t in teachers:
-        persona = t.get("persona") or {}
-        dist = weighted_distance(student_persona, persona)
-        score = compatibility_score(dist)
-        contributions = dimension_contributions(student_persona, persona)
-        why = why_best_worst(contributions)
-
-        results.append(
-            {
-                "teacher_id": t.get("teacher_id"),
-                "name": t.get("name"),
-                "subject": t.get("subject"),
-                "archetype": t.get("archetype"),
-                "tagline": t.get("tagline"),
-                "summary": t.get("summary"),
-                "compatibility_score": score,
-                "why": why,
-            }
-        )
+    for row, i in enumerate(indices):
+        results.append(ranked_entry(teachers[i], compatibility_score(float(distances[row])), order[row]))
 
     results.sort(key=lambda r: r["compatibility_score"], reverse=True)
 
     # Normalize compatibility_score to 0–100 so best = 100, worst = 0 (raw formula gives ~1–20 for typical distances)
     if results:
         scores = [r["compatibility_score"] for r in results]
-        min_s, max_s = min(scores), max(scores)
-        if max_s > min_s:
-            for r in results:
-                r["compatibility_score"] = round(100.0 * (r["compatibility_score"] - min_s) / (max_s - min_s), 2)
-        else:
-            for r in results:
-                r["compatibility_score"] = 100.0
+        normalize_scores(results, min(scores), max(scores))
 
     return results
+
+
+def ranked_entry(teacher: dict[str, Any], score: float, order: np.ndarray) -> dict[str, Any]:
+    """A rank_teachers entry (raw or normalized score); order is the row's stable argsort of dimension contributions."""
+    return {
+        "teacher_id": teacher.get("teacher_id"),
+        "name": teacher.get("name"),
+        "subject": teacher.get("subject"),
+        "archetype": teacher.get("archetype"),
+        "tagline": teacher.get("tagline"),
+        "summary": teacher.get("summary"),
+        "compatibility_score": score,
+        "why": {
+            "best": [DIMENSION_KEYS[j] for j in order[:3]],
+            "worst": [DIMENSION_KEYS[j] for j in order[-2:][::-1]],
+        },
+    }
+
+
+def normalize_scores(results: list[dict[str, Any]], min_score: float, max_score: float) -> None:
+    """rank_teachers' min-max normalization of raw compatibility_score (min → 0, max → 100), in place."""
+    if max_score > min_score:
+        for r in results:
+            r["compatibility_score"] = round(100.0 * (r["compatibility_score"] - min_score) / (max_score - min_score), 2)
+    else:
+        for r in results:
+            r["compatibility_score"] = 100.0
+
+
+def top_k_raw(
+    teachers: list[dict[str, Any]],
+    student_persona: dict[str, float],
+    k: int | None,
+    subject: str | None = None,
+    weight_profile: str | None = None,
+    positions: Any = None,
+) -> dict[str, Any]:
+    """
+    The k best (k=None: all) rank_teachers entries of `teachers` with raw (unnormalized) scores, plus the raw
+    min/max score and count over every candidate: what a coordinator needs to merge partial
+    catalogues (shards) into the global ranking. Entries are (position, entry) pairs in
+    rank_teachers order; positions[i] (default i) is teacher i's catalogue position, which
+    orders equal scores as rank_teachers does. Only the top rows get entries built.
+    """
+    weights = weight_vector(resolve_weight_profile(weight_profile, subject))
+    matrix = teacher_matrix(teachers)
+    indices = np.asarray(subject_indices(teachers, subject) if subject is not None else range(len(teachers)), dtype=np.intp)
+    if not len(indices) or (k is not None and k <= 0):
+        return {"entries": [], "min_score": None, "max_score": None, "count": int(len(indices))}
+    vector = persona_vector(student_persona)
+    distances = sum_contributions(contribution_matrix(matrix[indices], vector, weights))
+    k = len(indices) if k is None else min(k, len(indices))
+    # The score is rounded: every row within a rounding step of the k-th best may tie with it
+    threshold = compatibility_score(float(np.partition(distances, k - 1)[k - 1]))
+    candidates = np.nonzero(100.0 / (1.0 + distances) >= threshold - SCORE_TIE_MARGIN)[0]
+    position = (lambda i: i) if positions is None else (lambda i: positions[i])
+    best = sorted(
+        ((compatibility_score(float(distances[r])), position(int(indices[r])), int(r)) for r in candidates),
+        key=lambda c: (-c[0], c[1]),
+    )[:k]
+    rows = indices[[r for _, _, r in best]]
+    order = np.argsort(contribution_matrix(matrix[rows], vector, weights), axis=1, kind="stable")
+    return {
+        "entries": [(pos, ranked_entry(teachers[int(i)], score, order[j])) for j, ((score, pos, _), i) in enumerate(zip(best, rows))],
+        # Scores fall as distance grows, and rounding keeps that order
+        "min_score": compatibility_score(float(distances.max())),
+        "max_score": compatibility_score(float(distances.min())),
+        "count": int(len(indices)),
+    }
+
+
+# ── Diversity re-ranking (MMR) ───────────────────────────────────────
+# Maximal marginal relevance over the best MMR_CANDIDATES entries picks the first MMR_TOP_K
+# greedily, trading compatibility against distance to the teachers already picked, so
+# near-identical teachers are not shown back to back.
+MMR_CANDIDATES = 50
+MMR_TOP_K = 10
+# Catalogues up to this size get a precomputed teacher × teacher distance matrix per weight profile
+# (float32, 16 MB at the limit); larger ones compute the candidates' rows per request
+PAIRWISE_MAX_TEACHERS = 2048
+
+
+def pairwise_distances(matrix: np.ndarray, weights: np.ndarray = WEIGHT_VECTOR) -> np.ndarray:
+    """(n, n) weighted Manhattan distances between the rows of matrix (one dimension at a time, O(n²) memory)."""
+    distances = np.zeros((len(matrix), len(matrix)), dtype=np.float64)
+    for j in range(matrix.shape[1]):
+        column = matrix[:, j]
+        distances += weights[j] * np.abs(column[:, None] - column[None, :])
+    return distances
+
+
+def teacher_distances(teachers: list[dict[str, Any]], weight_profile: str = DEFAULT_WEIGHT_PROFILE) -> np.ndarray | None:
+    """
+    Teacher × teacher weighted distances under a profile, built once per catalogue and profile
+    weights. None for catalogues larger than PAIRWISE_MAX_TEACHERS.
+    """
+    if len(teachers) > PAIRWISE_MAX_TEACHERS:
+        return None
+    weights = weight_vector(weight_profile)
+    return _per_catalogue(
+        teachers,
+        ("distances", weights.tobytes()),
+        lambda: pairwise_distances(teacher_matrix(teachers), weights).astype(np.float32),
+    )
+
+
+def diversify(
+    ranked: list[dict[str, Any]],
+    teachers: list[dict[str, Any]],
+    diversity: float,
+    weight_profile: str = DEFAULT_WEIGHT_PROFILE,
+    candidates: int = MMR_CANDIDATES,
+    top_k: int = MMR_TOP_K,
+    relevance: list[float] | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Re-order a rank_teachers result so its first top_k entries maximize
+      (1 - diversity) * relevance / 100 + diversity * novelty
+    where novelty is the weighted distance (weight_profile) to the closest teacher already picked,
+    scaled by the largest possible distance. relevance (0–100, one per entry of ranked, at least
+    its first `candidates`) defaults to compatibility_score; pass it when ranked was re-ordered by
+    another score. diversity=0 leaves the ranking unchanged. The other candidates keep their order
+    after the picks; entries past `candidates` are untouched.
+    """
+    head, tail = ranked[:candidates], ranked[candidates:]
+    if diversity <= 0 or len(head) < 3:
+        return ranked
+    rows = teacher_rows(teachers)
+    try:
+        index = [rows[(r.get("teacher_id") or "").strip()] for r in head]
+    except KeyError:
+        return ranked  # not from this catalogue
+    weights = weight_vector(weight_profile)
+    catalogue_distances = teacher_distances(teachers, weight_profile)
+    if catalogue_distances is not None:
+        distances = catalogue_distances[np.ix_(index, index)].astype(np.float64)
+    else:
+        distances = pairwise_distances(teacher_matrix(teachers)[index], weights)
+    distances /= max(float(weights.sum()), 1e-12)
+    if relevance is None:
+        relevance = [r.get("compatibility_score") or 0.0 for r in head]
+    relevance = np.array(relevance[: len(head)], dtype=np.float64) / 100.0
+
+    picked = [int(np.argmax(relevance))]
+    available = np.ones(len(head), dtype=bool)
+    available[picked[0]] = False
+    novelty = distances[picked[0]].copy()
+    for _ in range(min(top_k, len(head)) - 1):
+        scores = np.where(available, (1.0 - diversity) * relevance + diversity * novelty, -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.minimum(novelty, distances[best], out=novelty)
+    rest = [i for i in range(len(head)) if available[i]]
+    return [head[i] for i in picked + rest] + tail
+
@@ -0,0 +1,100 @@
+"""
+prefetch.py — bounded background work queue for speculative prefetching.
+
+Tasks carry a priority (lower runs first) and a group key, e.g. (student_id, teacher_id).
+Cancelling a group drops its pending tasks and flags running ones, so their results
+can be discarded instead of cached.
+
+  queue = PrefetchQueue(maxsize=64, workers=2)
+  queue.submit(("stu_1", "tch_1"), 0, lambda cancelled: warm(...))
+  queue.cancel(("stu_1", "tch_1"))
+"""
+
+import heapq
+import itertools
+import threading
+from typing import Any, Callable, Hashable
+
+
+class PrefetchTask:
+    def __init__(self, group: Hashable, priority: int, fn: Callable[[threading.Event], Any]):
+        self.group = group
+        self.priority = priority
+        self.fn = fn
+        self.cancelled = threading.Event()
+
+
+class PrefetchQueue:
+    """Priority queue drained by daemon worker threads (started on first submit)."""
+
+    def __init__(self, maxsize: int = 64, workers: int = 2):
+        self.maxsize = maxsize
+        self.workers = workers
+        self._heap: list[tuple[int, int, PrefetchTask]] = []
+        self._running: set[PrefetchTask] = set()
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "dropped": 0}
+
+    def submit(self, group: Hashable, priority: int, fn: Callable[[threading.Event], Any]) -> bool:
+        """
+        Queue fn(cancelled_event). When full, the lowest-priority pending task is dropped to
+        make room if the new task outranks it; otherwise the new task is rejected (returns False).
+        """
+        task = PrefetchTask(group, priority, fn)
+        with self._cond:
+            if len(self._heap) >= self.maxsize:
+                worst = max(self._heap)
+                if worst[0] <= priority:
+                    self.stats["dropped"] += 1
+                    return False
+                self._heap.remove(worst)
+                heapq.heapify(self._heap)
+                self.stats["dropped"] += 1
+            heapq.heappush(self._heap, (priority, next(self._counter), task))
+            self.stats["submitted"] += 1
+            self._ensure_workers()
+            self._cond.notify()
+        return True
+
+    def cancel(self, group: Hashable) -> int:
+        """Drop pending tasks of this group and flag its running ones. Returns how many were affected."""
+        with self._cond:
+            keep = [entry for entry in self._heap if entry[2].group != group]
+            affected = len(self._heap) - len(keep)
+            if affected:
+                self._heap = keep
+                heapq.heapify(self._heap)
+            for task in self._running:
+                if task.group == group:
+                    task.cancelled.set()
+                    affected += 1
+            self.stats["cancelled"] += affected
+        return affected
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def _ensure_workers(self) -> None:
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._work, name=f"prefetch-{len(self._threads)}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, task = heapq.heappop(self._heap)
+                self._running.add(task)
+            try:
+                task.fn(task.cancelled)
+                key = "completed"
+            except Exception:
+                key = "failed"
+            with self._cond:
+                self._running.discard(task)
+                self.stats[key] += 1
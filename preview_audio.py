@@ -0,0 +1,233 @@
+"""
+preview_audio.py — pre-rendered teacher preview audio for /api/voice/teacher-preview.
+
+`prerender` generates the preview script (LLM) and audio (TTS) for every teacher with a voice_id
+and each common topic of their subject ahead of time, on a bounded worker pool:
+
+  python preview_audio.py prerender --workers 4
+  python preview_audio.py status
+
+Audio is content-addressed: objects/ab/abcdef….mp3 is named by the SHA-256 of its bytes, so
+identical renders are stored once and a file is never rewritten in place. manifest.ndjson maps
+each preview key to its object. The key hashes everything a preview depends on (the teacher's
+persona fields, voice_id and the normalized topic), so editing a teacher or reassigning a
+voice is a miss rather than stale audio.
+
+The manifest is an append-only log, one JSON line per finished preview (a later line for the
+same key wins). Each line is a single O_APPEND write, so the API and prerender workers in any
+number of processes never lose each other's entries, and readers parse only the lines added
+since their last read.
+
+The job is resumable: each finished preview is appended to the manifest as it completes and
+keys already present are skipped, so an interrupted run continues where it stopped. The API
+serves manifest hits from disk and renders live only on a miss.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+BASE_DIR = Path(__file__).resolve().parent
+PREVIEW_DIR = Path(os.environ["UNITINDER_PREVIEW_DIR"]) if os.environ.get("UNITINDER_PREVIEW_DIR") else BASE_DIR / "audio" / "previews"
+# Bump when the script prompt or TTS model changes, so every preview is re-rendered
+KEY_VERSION = 2
+
+# Topics pre-rendered per subject; teachers of other subjects get one preview for the subject itself
+COMMON_TOPICS: dict[str, list[str]] = {
+    "Analysis": ["Limits", "Continuity", "Derivatives", "Integrals", "Sequences and series"],
+    "Statistics": ["Probability distributions", "Hypothesis testing", "Confidence intervals", "Linear regression", "Bayesian inference"],
+    "Algorithms and Data Structures": ["Big-O notation", "Sorting algorithms", "Graph traversal", "Dynamic programming", "Hash tables"],
+    "Cryptography": ["Symmetric encryption", "Public-key cryptography", "Hash functions", "Digital signatures", "Key exchange"],
+    "Databases": ["SQL joins", "Normalization", "Indexing", "Transactions", "Query optimization"],
+}
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+
+def topics_for(subject: str | None, topics: dict[str, list[str]] | None = None) -> list[str]:
+    subject = (subject or "").strip()
+    return (topics or COMMON_TOPICS).get(subject) or ([subject] if subject else [])
+
+
+def is_common_topic(subject: str | None, topic: str) -> bool:
+    return normalize_topic(topic) in {normalize_topic(t) for t in topics_for(subject)}
+
+
+def preview_key(teacher: dict[str, Any], topic: str) -> str:
+    """Content key of a teacher's preview for topic (changes with anything the script or voice depends on)."""
+    data = {
+        "v": KEY_VERSION,
+        "teacher_id": (teacher.get("teacher_id") or "").strip(),
+        "name": teacher.get("name"),
+        "subject": teacher.get("subject"),
+        "archetype": teacher.get("archetype"),
+        "tagline": teacher.get("tagline"),
+        "persona": teacher.get("persona") or {},
+        "voice_id": (teacher.get("voice_id") or "").strip(),
+        "topic": normalize_topic(topic),
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class PreviewStore:
+    """Content-addressed preview audio plus a manifest log (key → object); safe to share between threads and processes."""
+
+    def __init__(self, root: Path = PREVIEW_DIR):
+        self.root = Path(root)
+        self.manifest_path = self.root / "manifest.ndjson"
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Any]] = {}
+        # Bytes of the manifest already read, and the file they were read from
+        self._offset = 0
+        self._inode: int | None = None
+
+    def _refresh(self) -> None:
+        """Read manifest lines appended since the last call (by this or another process)."""
+        try:
+            f = open(self.manifest_path, "rb")
+        except FileNotFoundError:
+            self._entries, self._offset, self._inode = {}, 0, None
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                # Replaced or truncated (e.g. deleted to re-render everything): read it from the start
+                self._entries, self._offset, self._inode = {}, 0, stat.st_ino
+            if stat.st_size == self._offset:
+                return
+            f.seek(self._offset)
+            data = f.read()
+        # A line still being appended is picked up by a later call
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            key = record.pop("key", None) if isinstance(record, dict) else None
+            if key:
+                self._entries[key] = record
+        self._offset += end
+
+    def object_path(self, sha256: str) -> Path:
+        return self.root / "objects" / sha256[:2] / f"{sha256}.mp3"
+
+    def get(self, key: str) -> Path | None:
+        """Path of the pre-rendered audio for key, or None on a miss."""
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        path = self.object_path(entry["sha256"])
+        return path if path.exists() else None
+
+    def keys(self) -> set[str]:
+        with self._lock:
+            self._refresh()
+            return set(self._entries)
+
+    def entries(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return dict(self._entries)
+
+    def put(self, key: str, audio: bytes, **meta: Any) -> Path:
+        """Store audio (once per distinct content) and append key → object to the manifest."""
+        sha256 = hashlib.sha256(audio).hexdigest()
+        path = self.object_path(sha256)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(audio)
+            os.replace(tmp, path)
+        line = json.dumps(dict(meta, key=key, sha256=sha256, bytes=len(audio), rendered_at=time.time()), ensure_ascii=False) + "\n"
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            fd = os.open(self.manifest_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+            self._refresh()
+        return path
+
+
+def plan_jobs(teachers: list[dict[str, Any]], topics: dict[str, list[str]] | None = None) -> list[tuple[str, dict[str, Any], str]]:
+    """(key, teacher, topic) for every voiced teacher and common topic of their subject."""
+    jobs = []
+    for teacher in teachers:
+        if not (teacher.get("voice_id") or "").strip():
+            continue
+        for topic in topics_for(teacher.get("subject"), topics):
+            jobs.append((preview_key(teacher, topic), teacher, topic))
+    return jobs
+
+
+# ── CLI ──────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    parser = argparse.ArgumentParser(description="Pre-render teacher preview audio into the content-addressed preview store.")
+    parser.add_argument("command", choices=["prerender", "status"])
+    parser.add_argument("--workers", type=int, default=4, help="previews rendered concurrently (default 4)")
+    parser.add_argument("--teacher", action="append", default=None, help="only this teacher_id (repeatable)")
+    parser.add_argument("--topics", type=Path, default=None, help='JSON file {"<subject>": ["<topic>", ...]} replacing COMMON_TOPICS')
+    parser.add_argument("--limit", type=int, default=None, help="render at most this many previews in this run")
+    args = parser.parse_args()
+
+    # Reuse main's catalogue, script generator and TTS client so the job renders exactly what the API would
+    import main
+
+    topics = json.loads(args.topics.read_text(encoding="utf-8")) if args.topics else None
+    teachers = [t for t in main.get_teachers() if args.teacher is None or t.get("teacher_id") in args.teacher]
+    store = PreviewStore()
+    jobs = plan_jobs(teachers, topics)
+    done = store.keys()
+    todo = [job for job in jobs if job[0] not in done]
+
+    if args.command == "status":
+        print(f"{store.root}: {len(jobs) - len(todo)}/{len(jobs)} previews rendered, {len(todo)} missing.")
+        raise SystemExit(0 if not todo else 1)
+
+    if args.limit is not None:
+        todo = todo[: args.limit]
+    if not todo:
+        print(f"All {len(jobs)} previews are rendered.")
+        raise SystemExit(0)
+    voice = main._voice()
+    if voice is None:
+        raise SystemExit("elevenlabs is not installed: pip install elevenlabs")
+    if not os.environ.get("OPENAI_API_KEY"):
+        raise SystemExit("OPENAI_API_KEY is not set.")
+    print(f"Rendering {len(todo)} of {len(jobs)} previews with {args.workers} worker(s).")
+
+    def render(key: str, teacher: dict[str, Any], topic: str) -> int:
+        script = main._preview_script(teacher, topic)
+        if not script:
+            raise RuntimeError("empty script")
+        audio = voice.generate_speech(teacher["voice_id"].strip(), script)
+        store.put(key, audio, teacher_id=teacher.get("teacher_id"), voice_id=teacher["voice_id"].strip(), topic=topic, script=script)
+        return len(audio)
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(render, *job): job for job in todo}
+        for i, future in enumerate(as_completed(futures), 1):
+            _, teacher, topic = futures[future]
+            try:
+                size = future.result()
+                print(f"  [{i}/{len(todo)}] {teacher.get('teacher_id')} · {topic}: {size} bytes", flush=True)
+            except Exception as e:
+                failed += 1
+                print(f"  [{i}/{len(todo)}] {teacher.get('teacher_id')} · {topic}: FAILED ({e})", flush=True)
+    print(f"Rendered {len(todo) - failed}, failed {failed}; rerun to retry failures.")
+    raise SystemExit(1 if failed else 0)
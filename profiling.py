@@ -0,0 +1,266 @@
+"""
+profiling.py — opt-in request profiling with collapsed-stack (flamegraph) output.
+
+A sampling profiler: while a profiled endpoint runs, a daemon thread reads the stack of the
+thread executing it every `interval` seconds (sys._current_frames) and counts identical stacks.
+The result is in the collapsed format read by flamegraph.pl, speedscope and inferno:
+
+  threading:Thread._bootstrap;...;main:match;matching:rank_teachers 37
+
+Two ways to get profiles:
+  - on demand: a request carrying the X-Profile-Token header (matching the configured token)
+    is profiled and answered with an X-Profile-Id header naming the stored profile;
+  - always on: with keep_slowest=N every request is sampled and the N slowest profiles are kept.
+
+Sampling happens only while a profiled endpoint is running, and costs one stack walk per
+running endpoint per interval. ProfiledRoute attaches the endpoint's thread: sync endpoints
+run in a worker thread of their own; async endpoints share the event loop thread, so their
+profiles also contain whatever other coroutines ran meanwhile. The body of a streaming
+response is produced after the endpoint returns and is not sampled (its time still counts
+towards the request duration).
+
+  store = ProfileStore(keep_slowest=20)
+  app.add_middleware(ProfilingMiddleware, store=store, token=os.environ.get("UNITINDER_PROFILE_TOKEN"))
+  app.router.route_class = ProfiledRoute  # before routes are declared
+"""
+
+import functools
+import heapq
+import hmac
+import inspect
+import itertools
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import CodeType
+from typing import Any, Callable, Iterator
+
+from fastapi.routing import APIRoute
+
+DEFAULT_INTERVAL = 0.005
+RECENT_MAX = 32
+TOKEN_HEADER = b"x-profile-token"
+_current: ContextVar["Profile | None"] = ContextVar("unitinder_profile", default=None)
+_labels: dict[CodeType, str] = {}
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    label = _labels.get(code)
+    if label is None:
+        label = f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+        _labels[code] = label
+    return label
+
+
+def collapse(frame) -> str:
+    """Root-first, ';'-joined function labels of a frame's stack."""
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class Sampler:
+    """Daemon thread sampling the stacks of attached threads every `interval` seconds; idle when none are attached."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self._attached: dict[int, list["Profile"]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @contextmanager
+    def attached(self, profile: "Profile") -> Iterator[None]:
+        """Sample the calling thread into profile for the duration of the block."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._attached.setdefault(ident, []).append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="profile-sampler")
+                self._thread.start()
+        self._wake.set()
+        try:
+            yield
+        finally:
+            with self._lock:
+                profiles = self._attached[ident]
+                profiles.remove(profile)
+                if not profiles:
+                    del self._attached[ident]
+
+    def _run(self) -> None:
+        while True:
+            while not self._attached:
+                self._wake.wait()
+                self._wake.clear()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                attached = [(ident, list(profiles)) for ident, profiles in self._attached.items()]
+            for ident, profiles in attached:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = collapse(frame)
+                for profile in profiles:
+                    profile.samples[stack] += 1
+            del frames
+
+
+class Profile:
+    """Stack samples of one request, plus its outcome once finished."""
+
+    def __init__(self, sampler: Sampler, method: str, path: str, on_demand: bool):
+        self.id = uuid.uuid4().hex[:16]
+        self.sampler = sampler
+        self.method = method
+        self.path = path
+        self.on_demand = on_demand
+        self.started_at = time.time()
+        self.duration_ms: float | None = None
+        self.status_code: int | None = None
+        self.samples: Counter = Counter()
+
+    def collecting(self):
+        return self.sampler.attached(self)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.samples.items()))
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "samples": sum(self.samples.values()),
+            "interval_ms": round(self.sampler.interval * 1000.0, 3),
+            "on_demand": self.on_demand,
+        }
+
+
+class ProfileStore:
+    """The last RECENT_MAX on-demand profiles, and the `keep_slowest` slowest profiles of all requests (0 = off)."""
+
+    def __init__(self, keep_slowest: int = 0, interval: float = DEFAULT_INTERVAL, recent_max: int = RECENT_MAX):
+        self.keep_slowest = keep_slowest
+        self.sampler = Sampler(interval)
+        self.recent_max = recent_max
+        self._recent: OrderedDict[str, Profile] = OrderedDict()
+        self._slowest: list[tuple[float, int, Profile]] = []  # min-heap on duration
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            if profile.on_demand:
+                self._recent[profile.id] = profile
+                while len(self._recent) > self.recent_max:
+                    self._recent.popitem(last=False)
+            if self.keep_slowest > 0 and profile.samples:
+                entry = (profile.duration_ms or 0.0, next(self._seq), profile)
+                if len(self._slowest) < self.keep_slowest:
+                    heapq.heappush(self._slowest, entry)
+                elif entry[0] > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, entry)
+
+    def get(self, profile_id: str) -> Profile | None:
+        with self._lock:
+            profile = self._recent.get(profile_id)
+            if profile is None:
+                profile = next((p for _, _, p in self._slowest if p.id == profile_id), None)
+            return profile
+
+    def summaries(self) -> dict[str, list[dict[str, Any]]]:
+        """Recent on-demand profiles (newest first) and the slowest kept profiles (slowest first)."""
+        with self._lock:
+            recent = [p.summary() for p in reversed(self._recent.values())]
+            slowest = [p.summary() for _, _, p in sorted(self._slowest, key=lambda e: (-e[0], e[1]))]
+        return {"recent": recent, "slowest": slowest}
+
+
+def token_matches(presented: str | None, token: str | None) -> bool:
+    return bool(token) and presented is not None and hmac.compare_digest(presented.encode("utf-8"), token.encode("utf-8"))
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware starting a Profile for requests that asked for one (X-Profile-Token equal to
+    `token`) or, when the store keeps the slowest profiles, for every request. Paths under
+    `exclude_prefix` (the profile download endpoints) are never profiled.
+    """
+
+    def __init__(self, app, store: ProfileStore, token: str | None = None, exclude_prefix: str = "/api/debug/"):
+        self.app = app
+        self.store = store
+        self.token = token or None
+        self.exclude_prefix = exclude_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefix):
+            await self.app(scope, receive, send)
+            return
+        presented = next((v for k, v in scope["headers"] if k == TOKEN_HEADER), None) if self.token else None
+        on_demand = presented is not None and token_matches(presented.decode("latin-1"), self.token)
+        if not on_demand and self.store.keep_slowest <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(self.store.sampler, scope["method"], scope["path"], on_demand)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                if on_demand:
+                    message = dict(message, headers=[*message.get("headers", []), (b"x-profile-id", profile.id.encode("ascii"))])
+            await send(message)
+
+        context = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current.reset(context)
+            profile.duration_ms = round((time.perf_counter() - started) * 1000.0, 2)
+            self.store.add(profile)
+
+
+def _track(endpoint: Callable) -> Callable:
+    """Wrap an endpoint so the thread running it is sampled into the request's Profile, if any."""
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def tracked(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            with profile.collecting():
+                return await endpoint(*args, **kwargs)
+
+    else:
+
+        @functools.wraps(endpoint)
+        def tracked(*args, **kwargs):
+            profile = _current.get()  # context is copied into the worker thread
+            if profile is None:
+                return endpoint(*args, **kwargs)
+            with profile.collecting():
+                return endpoint(*args, **kwargs)
+
+    return tracked
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint is sampled while a ProfilingMiddleware profile is active."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _track(endpoint), **kwargs)
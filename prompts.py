@@ -0,0 +1,265 @@
+"""
+prompts.py — LLM prompt builders and prompt token accounting.
+
+Every prompt is laid out static-first: the system message and the instruction block are
+identical across requests (per teacher at most), and per-request data (teacher, topic,
+persona) comes last, so provider-side prompt-prefix caching can reuse the instructions.
+Personas are encoded compactly instead of as indented JSON:
+
+  teacher personas   one quantized line per dimension    pace=0.85
+  student context    dimensions grouped into coarse bands high: pace, formality / medium: …
+
+Builders return a Prompt; _chat_completion records each call's prompt tokens, the tokens
+saved over the indented-JSON encoding, and the provider-reported prompt/cached tokens.
+Tokens are counted with tiktoken when it is installed, else estimated at 4 characters per
+token. metrics() is served under /api/upstream/metrics.
+"""
+
+import importlib.util
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+from matching import DIMENSION_KEYS
+
+TOKENIZER = os.environ.get("UNITINDER_TOKENIZER", "o200k_base")
+PERSONA_STEP = 0.05
+LOW_BAND, HIGH_BAND = 0.35, 0.65
+
+
+@dataclass
+class Prompt:
+    kind: str
+    messages: list[dict[str, str]]
+    saved_tokens: int = 0  # vs. the same prompt with personas as indented JSON
+
+
+# ── Token counting ───────────────────────────────────────────────────
+
+_encoding: Any = None
+_encoding_checked = False
+
+
+def _tiktoken_encoding():
+    """tiktoken encoding, loaded on first use; None if tiktoken is not installed or the encoding cannot load."""
+    global _encoding, _encoding_checked
+    if not _encoding_checked:
+        if importlib.util.find_spec("tiktoken") is not None:
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.get_encoding(TOKENIZER)
+            except Exception:
+                _encoding = None
+        _encoding_checked = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def prompt_tokens(messages: list[dict[str, str]]) -> int:
+    return sum(count_tokens(m.get("content") or "") for m in messages)
+
+
+# ── Persona encodings ────────────────────────────────────────────────
+
+def _ordered(persona: dict[str, float]) -> list[str]:
+    return [d for d in DIMENSION_KEYS if d in persona] + sorted(k for k in persona if k not in DIMENSION_KEYS)
+
+
+def encode_persona(persona: dict[str, float], step: float = PERSONA_STEP) -> str:
+    """One `dim=value` line per dimension, values rounded to `step` (DIMENSION_KEYS order)."""
+    lines = []
+    for d in _ordered(persona):
+        value = round(round(float(persona[d]) / step) * step, 2)
+        lines.append(f"{d}={value:g}")
+    return "\n".join(lines)
+
+
+def persona_bands(persona: dict[str, float]) -> str:
+    """Dimensions grouped into high / medium / low bands (three lines, empty bands omitted)."""
+    bands: dict[str, list[str]] = {"high": [], "medium": [], "low": []}
+    for d in _ordered(persona):
+        value = float(persona[d])
+        bands["high" if value >= HIGH_BAND else "low" if value <= LOW_BAND else "medium"].append(d)
+    return "\n".join(f"{band}: {', '.join(dims)}" for band, dims in bands.items() if dims)
+
+
+def _saved(legacy: str, compact: str) -> int:
+    return max(0, count_tokens(legacy) - count_tokens(compact))
+
+
+# ── Builders ─────────────────────────────────────────────────────────
+
+SUMMARY_SYSTEM = "You write brief, clear summaries for students choosing teachers. Output only the summary text, no labels or extra text."
+SUMMARY_INSTRUCTIONS = """You are helping a student choose a teacher. Given the teacher below and how they match this student, write a short 2–3 sentence summary in plain language (no bullet lists) explaining why this teacher might be a great fit or not for this specific student.
+
+Write only the summary, nothing else. Be direct and helpful."""
+
+
+def personalized_summary(teacher: dict[str, Any]) -> Prompt:
+    why = teacher.get("why") or {}
+    best = why.get("best") or []
+    worst = why.get("worst") or []
+    data = f"""Teacher: {teacher.get("name", "This teacher")} ({teacher.get("subject", "")})
+Archetype: {teacher.get("archetype", "")}
+Tagline: {teacher.get("tagline", "")}
+
+Where this student and teacher align well (best matching aspects): {', '.join(best) if best else '—'}
+Where they differ (aspects that may not match): {', '.join(worst) if worst else '—'}"""
+    return Prompt(
+        "personalized_summary",
+        [{"role": "system", "content": SUMMARY_SYSTEM}, {"role": "user", "content": f"{SUMMARY_INSTRUCTIONS}\n\n{data}"}],
+    )
+
+
+MODALITY_SYSTEM = "You are an expert Prompt Engineer for an AI education platform. Output your response as a valid JSON object."
+MODALITY_INSTRUCTIONS = """Based on the Teacher Persona at the end of this message, your task is to generate 3 specific system prompts tailored to three different instructional modalities: Text, Audio, and Video.
+
+We are building a system where a student requests a study plan or lesson, and we use these prompts to generate the content in the teacher's exact style.
+
+1. Text Modality Prompt:
+Create a system prompt that will instruct an LLM to generate a personalized "Study Plan" or written lesson. It should enforce the teacher's specific pacing, structure, verbosity, and textual pedagogical style (e.g., Socratic questioning, formal vs. casual).
+
+2. Audio Modality Prompt:
+Create a system prompt that will instruct an LLM to write a script for a TTS (Text-to-Speech) engine. It should emphasize auditory elements: speech patterns, tone of voice, enthusiasm, pauses, and rhetorical questions, ensuring the script sounds natural and fits the teacher's emotional sensitivity and humor receptivity.
+
+3. Video Modality Prompt:
+Create a system prompt that will instruct an LLM to generate a script and visual cues for a Video/Avatar model. It must include instructions for the teacher's body language, facial expressions, visual dependency (e.g., describing props or whiteboard use), and overall on-screen energy.
+
+OUTPUT FORMAT:
+Return exactly a JSON object with the following keys:
+"text_prompt": <the complete prompt for text modality>,
+"audio_prompt": <the complete prompt for audio modality>,
+"video_prompt": <the complete prompt for video modality>"""
+
+
+def modality_prompts(teacher_data: dict[str, Any]) -> Prompt:
+    """teacher_data: teacher_id, name, subject, archetype and persona (as main._teacher_prompt_data builds it)."""
+    persona = teacher_data.get("persona") or {}
+    identity = "\n".join(f"{k}: {teacher_data.get(k)}" for k in ("teacher_id", "name", "subject", "archetype"))
+    data = f"{identity}\npersona (0–1 scale):\n{encode_persona(persona)}"
+    return Prompt(
+        "modality_prompts",
+        [
+            {"role": "system", "content": MODALITY_SYSTEM},
+            {"role": "user", "content": f"{MODALITY_INSTRUCTIONS}\n\nINPUT DATA (Teacher Persona):\n{data}"},
+        ],
+        saved_tokens=_saved(json.dumps(teacher_data, indent=2), data),
+    )
+
+
+STUDY_PLAN_INSTRUCTIONS = """The student has requested a study plan for the topic given at the end of this message. Generate the plan only for that topic, in YOUR teaching style. The plan must reflect how you teach—your pace, structure, tone, and methods—not the student's preferred learning style. Student context is provided only for reference.
+
+STRUCTURE YOUR RESPONSE AS FOLLOWS:
+1. First line: write exactly "Outline" (or "Table of Contents").
+2. Next lines: list only the MAIN section titles, one per line (e.g. "Week 1: Functions — The Language of Calculus", "Week 2: Limits — The Central Idea"). Include only major sections (weeks, parts, or chapters)—do NOT list subsections like "Core Ideas", "Emphasis", "Proof Component", "Problem Set", "Reflection", "Conceptual Anchor", "Theorem Focus" in this list.
+3. One blank line.
+4. Then the full study plan body with all details, subsections, and content.
+
+Generate the study plan now. Ensure it is specifically about the requested topic and is written in the teacher's teaching style."""
+
+
+def study_plan(teacher: dict[str, Any], student_persona: dict[str, float], topic: str, text_prompt: str) -> list[Prompt]:
+    """
+    Attempts in order: the teacher's text modality prompt as system prompt, then a generic
+    fallback system prompt (the only attempt if modality prompts failed or were skipped).
+    """
+    teacher_name = teacher.get("name", "This teacher")
+    teacher_subject = teacher.get("subject", "")
+    fallback_system = f"""You are {teacher_name}, teaching {teacher_subject}. Your task is to generate a study plan in YOUR teaching style only. The plan must be for the topic the student requests. Use your own pacing, structure, tone, and pedagogical approach—do not match or adapt to the student's learning style; the output must reflect how you teach. Output only the study plan text, no meta-commentary."""
+    context = persona_bands(student_persona)
+    user_content = f"""{STUDY_PLAN_INSTRUCTIONS}
+
+Topic requested: {topic}
+
+Student context (dimension bands; for reference only; do not match your style to theirs):
+{context}"""
+    saved = _saved(json.dumps(student_persona, indent=2), context)
+    systems = [text_prompt.strip(), fallback_system] if text_prompt.strip() else [fallback_system]
+    return [
+        Prompt("study_plan", [{"role": "system", "content": system}, {"role": "user", "content": user_content}], saved_tokens=saved)
+        for system in systems
+    ]
+
+
+PREVIEW_SYSTEM = "You are a teacher recording a spoken preview of your teaching. Write exactly as you would speak — natural, in-character, no formatting."
+PREVIEW_INSTRUCTIONS = """Write a 300-400 word monologue (approximately 2 minutes when spoken aloud) where you, the teacher described at the end of this message, introduce yourself and explain how you would teach the given topic to a student.
+
+IMPORTANT RULES:
+- Write in FIRST PERSON as if you are the teacher speaking directly to a student
+- Match the teacher's personality: if they are warm and casual, be warm and casual; if formal and rigorous, be formal and rigorous
+- Start with a brief self-introduction ("Hey, I'm …" or "Good morning, I'm Professor …" depending on style)
+- Explain YOUR approach to teaching the topic — what makes your method unique
+- Give a small taste/example of how a typical lesson would go
+- End with something encouraging or motivating
+- Do NOT use bullet points, headers, or formatting — this is a SPOKEN monologue meant for text-to-speech
+- Do NOT include stage directions, emojis, or anything that isn't spoken words
+- Keep it natural and conversational, as if speaking to a student sitting in front of you
+
+Write ONLY the monologue text. No labels, no formatting."""
+PREVIEW_TRAITS = [
+    ("pace", "0=slow, 1=fast"),
+    ("formality", "0=casual, 1=formal"),
+    ("humor_receptivity", "0=serious, 1=humorous"),
+    ("interactivity", "0=lecture-style, 1=interactive"),
+    ("abstraction", "0=concrete examples, 1=abstract theory"),
+    ("storytelling_affinity", "0=factual, 1=storyteller"),
+]
+
+
+def teaching_preview(teacher: dict[str, Any], topic: str) -> Prompt:
+    persona = teacher.get("persona") or {}
+    traits = "\n".join(f"- {d}={persona.get(d, 0.5)} ({scale})" for d, scale in PREVIEW_TRAITS)
+    data = f"""You are {teacher.get("name", "Teacher")}, a {teacher.get("subject", "")} teacher. Your archetype is "{teacher.get("archetype", "")}" and your tagline is "{teacher.get("tagline", "")}".
+
+Topic: {topic}
+
+Teacher personality traits (0-1 scale, for reference):
+{traits}"""
+    return Prompt(
+        "teaching_preview",
+        [{"role": "system", "content": PREVIEW_SYSTEM}, {"role": "user", "content": f"{PREVIEW_INSTRUCTIONS}\n\n{data}"}],
+    )
+
+
+# ── Accounting ───────────────────────────────────────────────────────
+
+_stats: dict[str, dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def record(prompt: Prompt, usage: Any = None) -> None:
+    """Count one upstream call made with prompt; usage is the completion's usage object, if reported."""
+    tokens = prompt_tokens(prompt.messages)
+    details = getattr(usage, "prompt_tokens_details", None)
+    with _stats_lock:
+        s = _stats.setdefault(
+            prompt.kind,
+            {"calls": 0, "prompt_tokens": 0, "saved_tokens": 0, "reported_calls": 0, "reported_prompt_tokens": 0, "reported_cached_tokens": 0},
+        )
+        s["calls"] += 1
+        s["prompt_tokens"] += tokens
+        s["saved_tokens"] += prompt.saved_tokens
+        if usage is not None:
+            s["reported_calls"] += 1
+            s["reported_prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            s["reported_cached_tokens"] += getattr(details, "cached_tokens", 0) or 0
+
+
+def metrics() -> dict[str, Any]:
+    """Per prompt kind: calls, counted prompt tokens and tokens saved by the compact encoding, plus provider-reported tokens."""
+    with _stats_lock:
+        kinds = {kind: dict(s) for kind, s in _stats.items()}
+    for s in kinds.values():
+        baseline = s["prompt_tokens"] + s["saved_tokens"]
+        s["saved_pct"] = round(100.0 * s["saved_tokens"] / baseline, 1) if baseline else 0.0
+        s["cached_pct"] = round(100.0 * s["reported_cached_tokens"] / s["reported_prompt_tokens"], 1) if s["reported_prompt_tokens"] else 0.0
+    return {"tokenizer": f"tiktoken {TOKENIZER}" if _tiktoken_encoding() is not None else "estimate (4 chars/token)", "kinds": kinds}
@@ -0,0 +1,120 @@
+"""
+quiz.py — server-side scoring of the 20-question student quiz.
+
+Same aggregation as student-quiz/run-quiz.js aggregatePersona (and frontend/src/lib/quiz.ts):
+each chosen option contributes values to 1–3 dimensions, a dimension's score is the mean of
+its contributions rounded to 2 decimals, and untouched dimensions are 0.5.
+
+The question bank is compiled once into an (options × 24) value matrix plus a 0/1 mask of
+which dimensions each option touches. Scoring a batch of answer sheets is then one selection
+matrix (sheets × options) times those two matrices, and a divide by the counts.
+
+Questions are read from student-quiz/questions.json, generated from questions.js with:
+  cd student-quiz && node -e "const {DIMENSION_KEYS, QUESTIONS} = require('./questions.js'); \\
+    console.log(JSON.stringify({_schema_notes: '...', DIMENSION_KEYS, QUESTIONS}, null, 2))" > questions.json
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from matching import DIMENSION_KEYS
+
+BASE_DIR = Path(__file__).resolve().parent
+QUESTIONS_PATH = Path(os.environ["UNITINDER_QUESTIONS_PATH"]) if os.environ.get("UNITINDER_QUESTIONS_PATH") else BASE_DIR / "student-quiz" / "questions.json"
+
+
+class AnswerSheetError(ValueError):
+    """An answer sheet references an unknown question or option, or answers nothing."""
+
+
+class CompiledQuiz:
+    """Question bank as dense matrices: values[o, d] and mask[o, d] for option row o and dimension d."""
+
+    def __init__(self, questions: list[dict[str, Any]]):
+        self.question_ids = [int(q["id"]) for q in questions]
+        self.option_rows: dict[tuple[int, str], int] = {}
+        rows = []
+        for q in questions:
+            for opt in q.get("options") or []:
+                self.option_rows[(int(q["id"]), opt["label"].upper())] = len(rows)
+                rows.append(opt.get("dimensions") or {})
+        dim_index = {d: i for i, d in enumerate(DIMENSION_KEYS)}
+        self.values = np.zeros((len(rows), len(DIMENSION_KEYS)), dtype=np.float64)
+        self.mask = np.zeros_like(self.values)
+        for r, dims in enumerate(rows):
+            for dim, value in dims.items():
+                if dim in dim_index:  # same as run-quiz.js: unknown dimensions are ignored
+                    self.values[r, dim_index[dim]] = float(value)
+                    self.mask[r, dim_index[dim]] = 1.0
+
+    def _option_rows_for(self, answers: dict | list) -> list[int]:
+        """Option rows selected by one sheet: {question_id: label} or labels in question order."""
+        if isinstance(answers, list):
+            answers = dict(zip(self.question_ids, answers))
+        if not isinstance(answers, dict):
+            raise AnswerSheetError("answers must be an object {question_id: label} or a list of labels")
+        rows = []
+        for qid, label in answers.items():
+            if label is None or str(label).strip() == "":
+                continue  # unanswered
+            try:
+                key = (int(qid), str(label).strip().upper())
+            except (TypeError, ValueError):
+                raise AnswerSheetError(f"invalid question id {qid!r}")
+            if key not in self.option_rows:
+                raise AnswerSheetError(f"question {qid}: unknown option {label!r}")
+            rows.append(self.option_rows[key])
+        if not rows:
+            raise AnswerSheetError("no answers recorded")
+        return rows
+
+    def selection_matrix(self, sheets: list[dict | list]) -> np.ndarray:
+        """(sheets × options) 0/1 matrix of chosen options. Raises AnswerSheetError naming the bad sheet index."""
+        selection = np.zeros((len(sheets), len(self.values)), dtype=np.float64)
+        for i, answers in enumerate(sheets):
+            try:
+                selection[i, self._option_rows_for(answers)] = 1.0
+            except AnswerSheetError as e:
+                raise AnswerSheetError(f"sheet {i}: {e}") from None
+        return selection
+
+    def score(self, sheets: list[dict | list]) -> np.ndarray:
+        """(sheets × 24) persona matrix for a batch of answer sheets."""
+        selection = self.selection_matrix(sheets)
+        sums = selection @ self.values
+        counts = selection @ self.mask
+        means = np.divide(sums, counts, out=np.full_like(sums, 0.5), where=counts > 0)
+        # Math.round(x * 100) / 100 rounds half up, unlike np.round
+        return np.floor(means * 100 + 0.5) / 100
+
+
+def persona_from_row(row: np.ndarray) -> dict[str, float]:
+    return {d: float(v) for d, v in zip(DIMENSION_KEYS, row)}
+
+
+def derive_archetype_and_summary(persona: dict[str, float]) -> tuple[str, str]:
+    """Same placeholder archetype/summary as run-quiz.js deriveArchetypeAndSummary."""
+    entries = sorted(persona.items(), key=lambda kv: -kv[1])
+    top = [k for k, _ in entries[:3]]
+    low = [k for k, _ in entries[-2:]]
+    summary = f"Strong on: {', '.join(top)}. Lower on: {', '.join(low)}. Profile generated from 20-question quiz — use for teacher matching."
+    return "Learner profile", summary
+
+
+_compiled: CompiledQuiz | None = None
+
+
+def get_quiz() -> CompiledQuiz:
+    """The compiled question bank (loaded from QUESTIONS_PATH on first use)."""
+    global _compiled
+    if _compiled is None:
+        with open(QUESTIONS_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("DIMENSION_KEYS", DIMENSION_KEYS) != DIMENSION_KEYS:
+            raise ValueError(f"{QUESTIONS_PATH} dimensions do not match matching.DIMENSION_KEYS")
+        _compiled = CompiledQuiz(data["QUESTIONS"])
+    return _compiled
@@ -0,0 +1,326 @@
+"""
+sharding.py — subject-sharded matching with scatter-gather across processes or nodes.
+
+The catalogue is partitioned into N shards by subject: subjects are placed largest first on the
+least loaded shard, and a subject with more than 1/N of all teachers is split over several
+shards by a hash of teacher_id. Every shard derives the same plan from teachers.json, so shard
+servers need only their number and N, and each keeps just its own teachers in memory:
+
+  python sharding.py serve --shard 0 --of 4 --port 9400     # one per shard, on any node
+  UNITINDER_SHARDS=host-a:9400,host-a:9401,host-b:9400,host-b:9401 uvicorn main:app
+
+or UNITINDER_SHARDS=4 to have the API spawn four local shard processes. Shards talk JSON
+messages over multiprocessing.connection byte frames (never pickle), after its HMAC handshake.
+Shard servers and an API using them must share UNITINDER_SHARD_AUTHKEY (there is no default);
+spawned local shards get a random key.
+
+For a match, the coordinator asks every shard for its local top k (matching.top_k_raw: raw
+scores, catalogue positions, and the raw min/max score over all its candidates), merges the
+entries by (score, catalogue position) and applies rank_teachers' min-max normalization with
+the global min and max: the result equals the first k of rank_teachers(...) on the whole
+catalogue. Shards send only k entries each, so the API asks for the page it needs and ranks
+deeper pages itself.
+Replies carry the shard's teachers.json hash; on a mismatch the coordinator asks the shards to
+reload and, if they still disagree, the caller ranks locally.
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+from queue import Empty, SimpleQueue
+from typing import Any
+
+import archetypes
+import listing
+from matching import normalize_scores, top_k_raw
+
+BASE_DIR = Path(__file__).resolve().parent
+TEACHERS_PATH = Path(os.environ["UNITINDER_TEACHERS_PATH"]) if os.environ.get("UNITINDER_TEACHERS_PATH") else BASE_DIR / "teachers.json"
+AUTHKEY = os.environ["UNITINDER_SHARD_AUTHKEY"].encode("utf-8") if os.environ.get("UNITINDER_SHARD_AUTHKEY") else None
+DEFAULT_PORT = 9400
+# How long spawned shard processes may take to load their teachers before spawn() gives up
+SPAWN_TIMEOUT = 300.0
+# Largest request a shard accepts, and largest reply (up to a shard's full ranking) the coordinator accepts
+MAX_REQUEST_BYTES = 1024 * 1024
+MAX_REPLY_BYTES = int(os.environ.get("UNITINDER_SHARD_MAX_REPLY_MB", "512")) * 1024 * 1024
+
+
+def _require_authkey(authkey: bytes | None) -> bytes:
+    if not authkey:
+        raise RuntimeError("UNITINDER_SHARD_AUTHKEY must be set for shard servers and the API connecting to them")
+    return authkey
+
+
+def _send(conn, message: dict[str, Any]) -> None:
+    conn.send_bytes(json.dumps(message).encode("utf-8"))
+
+
+def _recv(conn, max_bytes: int) -> dict[str, Any]:
+    return json.loads(conn.recv_bytes(max_bytes))
+
+
+def plan_shards(subject_counts: dict[str, int], shards: int) -> dict[str, list[int]]:
+    """subject → shards holding it. Deterministic for the same counts, so every shard agrees."""
+    capacity = max(1, math.ceil(sum(subject_counts.values()) / shards))
+    load = [0.0] * shards
+    plan = {}
+    for subject, count in sorted(subject_counts.items(), key=lambda sc: (-sc[1], sc[0])):
+        parts = max(1, min(shards, math.ceil(count / capacity)))
+        owners = sorted(sorted(range(shards), key=lambda s: (load[s], s))[:parts])
+        for s in owners:
+            load[s] += count / parts
+        plan[subject] = owners
+    return plan
+
+
+def shard_of(teacher: dict[str, Any], plan: dict[str, list[int]], shards: int) -> int:
+    owners = plan.get((teacher.get("subject") or "").strip()) or list(range(shards))
+    if len(owners) == 1:
+        return owners[0]
+    digest = hashlib.blake2b((teacher.get("teacher_id") or "").strip().encode("utf-8"), digest_size=8).digest()
+    return owners[int.from_bytes(digest, "big") % len(owners)]
+
+
+class Shard:
+    """One shard's teachers (streamed from teachers.json) and their catalogue positions."""
+
+    def __init__(self, path: Path, shard: int, shards: int):
+        if not 0 <= shard < shards:
+            raise ValueError(f"shard must be in [0, {shards})")
+        self.path = Path(path)
+        self.shard, self.shards = shard, shards
+        self._lock = threading.Lock()
+        self.sha256: str | None = None
+        self.teachers: list[dict[str, Any]] = []
+        self.positions: list[int] = []
+        self.reload()
+
+    def reload(self) -> bool:
+        """Re-read teachers.json if it changed; True if it did."""
+        with self._lock:
+            sha256 = archetypes.file_sha256(self.path)
+            if sha256 == self.sha256:
+                return False
+            counts = Counter((t.get("subject") or "").strip() for t in listing.iter_json_array(self.path, "teachers"))
+            plan = plan_shards(counts, self.shards)
+            teachers, positions = [], []
+            for i, t in enumerate(listing.iter_json_array(self.path, "teachers")):
+                if shard_of(t, plan, self.shards) == self.shard:
+                    teachers.append(t)
+                    positions.append(i)
+            # One assignment, so a concurrent query sees either the old or the new catalogue
+            self.teachers, self.positions, self.sha256 = teachers, positions, sha256
+            return True
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        op = request.get("op")
+        if op == "reload":
+            self.reload()
+        elif op == "top_k":
+            teachers, positions, sha256 = self.teachers, self.positions, self.sha256
+            result = top_k_raw(
+                teachers, request["persona"], request["k"], subject=request.get("subject"),
+                weight_profile=request.get("weight_profile"), positions=positions,
+            )
+            return dict(result, shard=self.shard, shards=self.shards, sha256=sha256)
+        elif op != "info":
+            raise ValueError(f"unknown op {op!r}")
+        return {"shard": self.shard, "shards": self.shards, "sha256": self.sha256, "teachers": len(self.teachers)}
+
+
+def serve(shard: Shard, address: tuple[str, int], authkey: bytes | None = AUTHKEY, ready=None) -> None:
+    """Answer coordinator requests forever, one thread per connection. ready (a queue) receives (shard, bound address)."""
+    with Listener(address, authkey=_require_authkey(authkey)) as listener:
+        if ready is not None:
+            ready.put((shard.shard, listener.address))
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError:
+                continue  # failed handshake (wrong authkey) or a client that went away
+            threading.Thread(target=_serve_connection, args=(shard, conn), daemon=True).start()
+
+
+def _serve_connection(shard: Shard, conn) -> None:
+    with conn:
+        while True:
+            try:
+                request = _recv(conn, MAX_REQUEST_BYTES)
+            except (EOFError, OSError, ValueError):
+                return  # closed, oversized or not JSON: drop the connection
+            try:
+                _send(conn, {"ok": True, "result": shard.handle(request)})
+            except Exception as e:
+                _send(conn, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+
+def _run_local_shard(path: str, shard: int, shards: int, authkey: bytes, ready) -> None:
+    serve(Shard(Path(path), shard, shards), ("127.0.0.1", 0), authkey, ready)
+
+
+class ShardClient:
+    """Pooled connections to one shard server; calls are safe from many threads."""
+
+    def __init__(self, address: tuple[str, int], authkey: bytes | None = AUTHKEY):
+        self.address = address
+        self.authkey = _require_authkey(authkey)
+        self._idle: SimpleQueue = SimpleQueue()
+
+    def call(self, request: dict[str, Any]) -> dict[str, Any]:
+        try:
+            conn = self._idle.get_nowait()
+        except Empty:
+            conn = Client(self.address, authkey=self.authkey)
+        try:
+            _send(conn, request)
+            reply = _recv(conn, MAX_REPLY_BYTES)
+        except (EOFError, OSError):
+            conn.close()
+            # Stale pooled connection (shard restarted): retry once on a new one
+            conn = Client(self.address, authkey=self.authkey)
+            _send(conn, request)
+            reply = _recv(conn, MAX_REPLY_BYTES)
+        self._idle.put(conn)
+        if not reply["ok"]:
+            raise RuntimeError(f"shard {self.address[0]}:{self.address[1]}: {reply['error']}")
+        return reply["result"]
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                return
+
+
+class ShardedMatcher:
+    """Scatter a match to every shard and merge their rankings into the global ranking."""
+
+    def __init__(self, addresses: list[tuple[str, int]], authkey: bytes | None = AUTHKEY, processes: list | None = None):
+        self.clients = [ShardClient(a, authkey) for a in addresses]
+        self._processes = processes or []
+        self._executor = ThreadPoolExecutor(max_workers=len(self.clients), thread_name_prefix="shard")
+
+    @classmethod
+    def spawn(cls, shards: int, path: Path = TEACHERS_PATH, authkey: bytes | None = None) -> "ShardedMatcher":
+        """Start `shards` local shard processes (127.0.0.1, ephemeral ports, a fresh random key) and connect to them."""
+        import multiprocessing
+
+        authkey = authkey or os.urandom(32)
+
+        ctx = multiprocessing.get_context("spawn")
+        ready = ctx.Queue()
+        processes = []
+        for shard in range(shards):
+            process = ctx.Process(target=_run_local_shard, args=(str(path), shard, shards, authkey, ready), daemon=True)
+            process.start()
+            processes.append(process)
+        # Shards report their ports as they finish loading; clients are kept in shard order.
+        # A shard that dies while loading never reports, so poll and fail as soon as one has exited.
+        reported = []
+        deadline = time.monotonic() + SPAWN_TIMEOUT
+        while len(reported) < shards:
+            try:
+                reported.append(ready.get(timeout=0.5))
+                continue
+            except Empty:
+                pass
+            dead = [p for p in processes if not p.is_alive()]
+            if dead or time.monotonic() > deadline:
+                for process in processes:
+                    process.terminate()
+                if dead:
+                    raise RuntimeError(f"shard process exited with code {dead[0].exitcode} before it was ready")
+                raise RuntimeError(f"shard processes not ready after {SPAWN_TIMEOUT:.0f}s")
+        return cls([address for _, address in sorted(reported)], authkey, processes)
+
+    @classmethod
+    def from_env(cls, value: str, path: Path = TEACHERS_PATH) -> "ShardedMatcher":
+        """UNITINDER_SHARDS: a process count to spawn, or comma-separated host:port shard servers."""
+        if value.strip().isdigit():
+            return cls.spawn(int(value), path)
+        addresses = []
+        for item in value.split(","):
+            host, _, port = item.strip().rpartition(":")
+            addresses.append((host or "127.0.0.1", int(port or DEFAULT_PORT)))
+        return cls(addresses)
+
+    def _scatter(self, request: dict[str, Any]) -> list[dict[str, Any]]:
+        return list(self._executor.map(lambda c: c.call(request), self.clients))
+
+    def rank(
+        self,
+        student_persona: dict[str, float],
+        sha256: str,
+        subject: str | None = None,
+        weight_profile: str | None = None,
+        k: int | None = None,
+    ) -> list[dict[str, Any]] | None:
+        """
+        rank_teachers(...) over the sharded catalogue (its first k if k is given), or None if the shards do not serve
+        the teachers.json with this hash (even after a reload) or do not cover every shard.
+        """
+        request = {"op": "top_k", "persona": dict(student_persona), "k": k, "subject": subject, "weight_profile": weight_profile}
+        parts = self._scatter(request)
+        if any(p["sha256"] != sha256 for p in parts):
+            self._scatter({"op": "reload"})
+            parts = self._scatter(request)
+        shards = {p["shards"] for p in parts}
+        if any(p["sha256"] != sha256 for p in parts) or len(shards) != 1 or sorted(p["shard"] for p in parts) != list(range(shards.pop())):
+            return None
+        return merge(parts, k)
+
+    def info(self) -> list[dict[str, Any]]:
+        return self._scatter({"op": "info"})
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        for client in self.clients:
+            client.close()
+        for process in self._processes:
+            process.terminate()
+
+
+def merge(parts: list[dict[str, Any]], k: int | None = None) -> list[dict[str, Any]]:
+    """Global ranking (top k if given) from shard results, normalized with the global raw min/max like rank_teachers."""
+    scored = [p for p in parts if p["count"]]
+    if not scored:
+        return []
+    entries = sorted((pe for p in scored for pe in p["entries"]), key=lambda pe: (-pe[1]["compatibility_score"], pe[0]))[:k]
+    ranked = [dict(entry) for _, entry in entries]
+    normalize_scores(ranked, min(p["min_score"] for p in scored), max(p["max_score"] for p in scored))
+    return ranked
+
+
+# ── CLI ──────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve one shard of the teacher catalogue for sharded matching.")
+    parser.add_argument("command", choices=["serve", "plan"])
+    parser.add_argument("--shard", type=int, default=0)
+    parser.add_argument("--of", type=int, required=True, help="total number of shards")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--teachers", type=Path, default=TEACHERS_PATH)
+    args = parser.parse_args()
+
+    if args.command == "plan":
+        counts = Counter((t.get("subject") or "").strip() for t in listing.iter_json_array(args.teachers, "teachers"))
+        for subject, owners in plan_shards(counts, args.of).items():
+            print(f"  {subject or '(none)'}: {counts[subject]} teachers → shard(s) {', '.join(map(str, owners))}")
+        raise SystemExit(0)
+
+    if not AUTHKEY:
+        raise SystemExit("Set UNITINDER_SHARD_AUTHKEY (the same secret on every shard and the API).")
+    shard = Shard(args.teachers, args.shard, args.of)
+    print(f"Shard {args.shard}/{args.of}: {len(shard.teachers)} teachers, listening on {args.host}:{args.port}", flush=True)
+    serve(shard, (args.host, args.port))
@@ -0,0 +1,210 @@
+"""
+similar_teachers.py — precomputed k-nearest-neighbour graph over teacher personas.
+
+For every teacher, the K most similar other teachers (any subject) under matching's weighted
+Manhattan distance with the default WEIGHTS, stored compactly as two (n, K) arrays:
+
+  neighbors  int32    catalogue indices, nearest first (-1 pads catalogues with ≤ K teachers)
+  distances  float16  their distances
+
+so "teachers like this one" is a row read, O(K), at 6 bytes per edge (12 MB for 100k
+teachers at K = 20). Distances are computed in row blocks, one dimension at a time, so
+memory stays O(block × n) however large the catalogue.
+
+The graph is saved to similar_teachers.npz with the SHA-256 of the teachers.json it was built
+from. A teacher import updates it incrementally (SimilarityGraph.updated): new and edited
+teachers get full rows, and every other row only merges in the edited teachers, so the cost
+is O(changed × n) instead of a rebuild's O(n²).
+
+  python similar_teachers.py            # build (or rebuild) similar_teachers.npz
+  python similar_teachers.py --k 30
+"""
+
+import os
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from matching import WEIGHT_VECTOR
+
+BASE_DIR = Path(__file__).resolve().parent
+SIMILAR_PATH = Path(os.environ["UNITINDER_SIMILAR_PATH"]) if os.environ.get("UNITINDER_SIMILAR_PATH") else BASE_DIR / "similar_teachers.npz"
+GRAPH_VERSION = 1
+DEFAULT_K = 20
+# Distance cells per block (float32): 4M cells = 16 MB
+BLOCK_CELLS = 1 << 22
+
+
+def _blocks(rows: np.ndarray, width: int) -> Iterator[np.ndarray]:
+    size = max(1, BLOCK_CELLS // max(1, width))
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def block_distances(rows: np.ndarray, matrix: np.ndarray, weights: np.ndarray = WEIGHT_VECTOR) -> np.ndarray:
+    """(len(rows), len(matrix)) weighted Manhattan distances, accumulated one dimension at a time in float32."""
+    rows = rows.astype(np.float32)
+    matrix = matrix.astype(np.float32)
+    out = np.zeros((len(rows), len(matrix)), dtype=np.float32)
+    tmp = np.empty_like(out)
+    for j in range(matrix.shape[1]):
+        np.subtract(rows[:, j, None], matrix[None, :, j], out=tmp)
+        np.abs(tmp, out=tmp)
+        tmp *= np.float32(weights[j])
+        out += tmp
+    return out
+
+
+def _row_distances(rows: np.ndarray, others: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """(b, k) distances from each row to its own k others (b, k, dims); same float32 arithmetic as block_distances."""
+    rows = rows.astype(np.float32)
+    others = others.astype(np.float32)
+    out = np.zeros(others.shape[:2], dtype=np.float32)
+    for j in range(others.shape[2]):
+        tmp = np.abs(rows[:, j, None] - others[:, :, j])
+        tmp *= np.float32(weights[j])
+        out += tmp
+    return out
+
+
+def _k_smallest(distances: np.ndarray, ids: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Per row, the k smallest distances and their ids, nearest first (equal distances by id), padded with -1/inf."""
+    if distances.shape[1] > k:
+        part = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        distances = np.take_along_axis(distances, part, axis=1)
+        ids = np.take_along_axis(ids, part, axis=1)
+    order = np.lexsort((ids, distances), axis=1)
+    distances = np.take_along_axis(distances, order, axis=1)
+    ids = np.take_along_axis(ids, order, axis=1)
+    ids = np.where(np.isinf(distances), -1, ids)
+    if distances.shape[1] < k:
+        pad = k - distances.shape[1]
+        distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+        ids = np.pad(ids, ((0, 0), (0, pad)), constant_values=-1)
+    return distances, ids
+
+
+class SimilarityGraph:
+    """neighbors (n, k) int32 and distances (n, k) float16 for a catalogue; never modified in place."""
+
+    def __init__(self, neighbors: np.ndarray, distances: np.ndarray, teachers_sha256: str | None = None):
+        self.neighbors = neighbors
+        self.distances = distances
+        self.teachers_sha256 = teachers_sha256
+
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.neighbors)
+
+    def similar(self, index: int, k: int | None = None) -> list[tuple[int, float]]:
+        """(catalogue index, distance) of the k nearest teachers to teacher `index`, nearest first."""
+        row, dist = self.neighbors[index, :k], self.distances[index, :k]
+        return [(int(i), float(d)) for i, d in zip(row, dist) if i >= 0]
+
+    def _fill_rows(self, rows: np.ndarray, matrix: np.ndarray, neighbors: np.ndarray, distances: np.ndarray, weights: np.ndarray) -> None:
+        ids = np.arange(len(matrix), dtype=np.int32)
+        for block in _blocks(rows, len(matrix)):
+            d = block_distances(matrix[block], matrix, weights)
+            d[np.arange(len(block)), block] = np.inf  # not its own neighbour
+            d, nb = _k_smallest(d, np.broadcast_to(ids, d.shape), self.k)
+            neighbors[block], distances[block] = nb, d.astype(np.float16)
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, k: int = DEFAULT_K, weights: np.ndarray = WEIGHT_VECTOR, teachers_sha256: str | None = None) -> "SimilarityGraph":
+        n = len(matrix)
+        graph = cls(np.full((n, k), -1, dtype=np.int32), np.full((n, k), np.inf, dtype=np.float16), teachers_sha256)
+        graph._fill_rows(np.arange(n), matrix, graph.neighbors, graph.distances, weights)
+        return graph
+
+    def updated(self, matrix: np.ndarray, changed: list[int], weights: np.ndarray = WEIGHT_VECTOR, teachers_sha256: str | None = None) -> "SimilarityGraph":
+        """
+        The graph for the catalogue `matrix` after teachers at indices `changed` were added
+        (indices ≥ len(self)) or edited. Rows whose lists contain an edited teacher are rebuilt
+        (their next-nearest is unknown); every other row merges the changed teachers into its
+        list, with its current neighbours' distances recomputed exactly.
+        """
+        n_old, n = len(self), len(matrix)
+        changed = np.unique(np.asarray(changed, dtype=np.int32))
+        neighbors = np.full((n, self.k), -1, dtype=np.int32)
+        distances = np.full((n, self.k), np.inf, dtype=np.float16)
+        neighbors[:n_old], distances[:n_old] = self.neighbors, self.distances
+        if not len(changed):
+            return SimilarityGraph(neighbors, distances, teachers_sha256)
+
+        edited = changed[changed < n_old]
+        stale = np.nonzero(np.isin(self.neighbors, edited).any(axis=1))[0] if len(edited) else np.empty(0, dtype=np.int64)
+        # Rows with padding (catalogue was smaller than k + 1) are cheap to redo as well
+        padded = np.nonzero((self.neighbors < 0).any(axis=1))[0]
+        full = np.union1d(np.union1d(changed, stale), padded).astype(np.int64)
+        self._fill_rows(full, matrix, neighbors, distances, weights)
+
+        rest = np.setdiff1d(np.arange(n_old), full)
+        changed_rows = matrix[changed]
+        for block in _blocks(rest, len(changed) + self.k):
+            current = neighbors[block]
+            # Exact float32 distances of the current neighbours, as a fresh build compares them
+            current_d = _row_distances(matrix[block], matrix[current], weights)
+            new_d = block_distances(matrix[block], changed_rows, weights)
+            d = np.concatenate([current_d, new_d], axis=1)
+            ids = np.concatenate([current, np.broadcast_to(changed, (len(block), len(changed)))], axis=1)
+            d, nb = _k_smallest(d, ids, self.k)
+            neighbors[block], distances[block] = nb, d.astype(np.float16)
+        return SimilarityGraph(neighbors, distances, teachers_sha256)
+
+    def save(self, path: str | Path = SIMILAR_PATH) -> None:
+        path = Path(path)
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(
+            tmp,
+            version=np.array(GRAPH_VERSION),
+            teachers_sha256=np.array(self.teachers_sha256 or ""),
+            weights=WEIGHT_VECTOR,
+            neighbors=self.neighbors,
+            distances=self.distances,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | Path = SIMILAR_PATH, teachers_sha256: str | None = None) -> "SimilarityGraph | None":
+        """The saved graph, or None if missing, unreadable, built with other weights or from another teachers.json."""
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != GRAPH_VERSION or not np.array_equal(data["weights"], WEIGHT_VECTOR):
+                    return None
+                sha256 = str(data["teachers_sha256"])
+                if teachers_sha256 is not None and sha256 != teachers_sha256:
+                    return None
+                return cls(data["neighbors"], data["distances"], sha256)
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+# ── CLI ──────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import archetypes
+    from matching import load_teachers, teacher_matrix
+
+    parser = argparse.ArgumentParser(description="Build the similar-teachers k-NN graph (similar_teachers.npz).")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help=f"neighbours per teacher (default {DEFAULT_K})")
+    parser.add_argument("--teachers", type=Path, default=None, help="teachers.json (default: the API's)")
+    parser.add_argument("--out", type=Path, default=SIMILAR_PATH)
+    args = parser.parse_args()
+
+    if args.teachers is None:
+        from main import TEACHERS_PATH
+
+        args.teachers = TEACHERS_PATH
+    teachers = load_teachers(args.teachers)
+    started = time.perf_counter()
+    graph = SimilarityGraph.build(teacher_matrix(teachers), args.k, teachers_sha256=archetypes.file_sha256(args.teachers))
+    graph.save(args.out)
+    size = graph.neighbors.nbytes + graph.distances.nbytes
+    print(f"Wrote {args.out}: {len(graph)} teachers × {graph.k} neighbours ({size / 1e6:.1f} MB) in {time.perf_counter() - started:.1f}s.")
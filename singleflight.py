@@ -0,0 +1,61 @@
+"""
+singleflight.py — coalesce concurrent identical calls into one in-flight call.
+
+While a call for a key is running, other callers with the same key wait for it and
+receive the same result (or exception) instead of issuing their own upstream request.
+Nothing is cached once the call finishes; pair it with a result cache for that.
+
+  flight = SingleFlight()
+
+  @flight.coalesce(lambda teacher, topic: (teacher["teacher_id"], topic.lower()))
+  def expensive(teacher, topic): ...
+"""
+
+import functools
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) unless a call with this key is already in flight; then wait for its result."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.stats["calls"] += 1
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def coalesce(self, key_fn: Callable[..., Hashable]):
+        """Decorator: coalesce calls whose key_fn(*args, **kwargs) is equal (keys are namespaced per function)."""
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                return self.do((fn.__name__, key_fn(*args, **kwargs)), fn, *args, **kwargs)
+
+            return wrapper
+
+        return decorator
@@ -1,6 +1,7 @@
 /**
  * Unitinder — 20-question student questionnaire.
  * Each option maps to 1–3 dimensions (0.0–1.0). Final persona = average per dimension.
+ * questions.json is generated from this file for the Python quiz engine (see quiz.py); regenerate it after edits.
  */
 
 const DIMENSION_KEYS = [
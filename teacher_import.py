@@ -0,0 +1,239 @@
+"""
+teacher_import.py — streaming bulk import of teachers (NDJSON or JSON) with validation.
+
+Uploads are parsed one record at a time, so memory stays O(batch) however large the file:
+
+  NDJSON   one teacher object per line
+  JSON     an array of teachers, or an object with a "teachers" array (the teachers.json shape)
+
+Each record is validated (teacher_id, name, subject, and a persona with every DIMENSION_KEYS
+dimension as a number in [0, 1]; no unknown dimensions). Valid records are upserted by
+teacher_id in batches: existing teachers are replaced, new ones appended. Invalid records are
+skipped and reported; they never stop the import.
+
+  python teacher_import.py faculty.ndjson                      # merge into teachers.json
+  python teacher_import.py faculty.json --dry-run              # validate only
+  python teacher_import.py faculty.ndjson --api http://127.0.0.1:8765   # POST to a running API
+
+Writing into teachers.json directly is for offline use: running API workers keep serving the
+catalogue they loaded until restarted. Importing through the API (POST /api/teachers/import)
+updates the serving worker batch by batch with no reload.
+"""
+
+import json
+import math
+import os
+from pathlib import Path
+from typing import IO, Any, Callable, Iterable, Iterator
+
+import listing
+from matching import DIMENSION_KEYS
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+FORMATS = ("ndjson", "json")
+_DIMENSIONS = set(DIMENSION_KEYS)
+_OPTIONAL_TEXT = ("archetype", "tagline", "summary", "voice_id")
+
+
+class UploadError(ValueError):
+    """The upload as a whole cannot be read (bad format or malformed JSON)."""
+
+
+def validate_teacher(record: Any) -> tuple[dict[str, Any] | None, list[str]]:
+    """(teacher, []) for a valid record (ids and text stripped), else (None, errors)."""
+    if not isinstance(record, dict):
+        return None, ["record is not a JSON object"]
+    errors = []
+    teacher = dict(record)
+    for field in ("teacher_id", "name", "subject"):
+        value = record.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors.append(f"{field} must be a non-empty string")
+        else:
+            teacher[field] = value.strip()
+    for field in _OPTIONAL_TEXT:
+        if record.get(field) is not None and not isinstance(record[field], str):
+            errors.append(f"{field} must be a string")
+    persona = record.get("persona")
+    if not isinstance(persona, dict):
+        errors.append("persona must be an object")
+    else:
+        missing = [d for d in DIMENSION_KEYS if d not in persona]
+        unknown = sorted(set(persona) - _DIMENSIONS)
+        if missing:
+            errors.append(f"persona is missing {missing}")
+        if unknown:
+            errors.append(f"persona has unknown dimensions {unknown}")
+        for d in DIMENSION_KEYS:
+            value = persona.get(d)
+            if d in persona and (isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or not 0.0 <= value <= 1.0):
+                errors.append(f"persona.{d} must be a number in [0, 1]")
+        if not errors:
+            teacher["persona"] = {d: float(persona[d]) for d in DIMENSION_KEYS}
+    return (None, errors) if errors else (teacher, [])
+
+
+def detect_format(f: IO[str]) -> str:
+    """'json' for an array or a multi-line object, 'ndjson' when the first line is a complete object."""
+    head = f.read(1 << 16)
+    f.seek(0)
+    stripped = head.lstrip()
+    if stripped.startswith("["):
+        return "json"
+    first_line = stripped.split("\n", 1)[0]
+    try:
+        value = json.loads(first_line)
+    except json.JSONDecodeError:
+        return "json"
+    return "ndjson" if isinstance(value, dict) and "teachers" not in value else "json"
+
+
+def iter_records(f: IO[str], fmt: str | None = None) -> Iterator[tuple[int, Any]]:
+    """(position, record) pairs streamed from an upload; position is the 1-based line (NDJSON) or element index."""
+    fmt = fmt or detect_format(f)
+    if fmt not in FORMATS:
+        raise UploadError(f"format must be one of {FORMATS}")
+    if fmt == "ndjson":
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, UploadError(f"invalid JSON: {e.msg}")
+        return
+    try:
+        yield from enumerate(listing.iter_json_stream(f, "teachers"))
+    except json.JSONDecodeError as e:
+        raise UploadError(f"invalid JSON at character {e.pos}: {e.msg}") from None
+
+
+def import_records(
+    records: Iterable[tuple[int, Any]],
+    apply_batch: Callable[[list[dict[str, Any]]], tuple[int, int]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    dry_run: bool = False,
+) -> dict[str, Any]:
+    """
+    Validate records and hand valid ones to apply_batch in batches; apply_batch returns
+    (inserted, updated). Returns counts and the first MAX_REPORTED_ERRORS errors.
+    """
+    report: dict[str, Any] = {"received": 0, "valid": 0, "invalid": 0, "inserted": 0, "updated": 0, "batches": 0, "errors": []}
+    batch: list[dict[str, Any]] = []
+
+    def flush() -> None:
+        if batch and not dry_run:
+            inserted, updated = apply_batch(batch)
+            report["inserted"] += inserted
+            report["updated"] += updated
+            report["batches"] += 1
+        batch.clear()
+
+    for position, record in records:
+        report["received"] += 1
+        if isinstance(record, Exception):
+            teacher, errors = None, [str(record)]
+        else:
+            teacher, errors = validate_teacher(record)
+        if teacher is None:
+            report["invalid"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                tid = record.get("teacher_id") if isinstance(record, dict) else None
+                report["errors"].append({"position": position, "teacher_id": tid, "errors": errors})
+            continue
+        report["valid"] += 1
+        batch.append(teacher)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return report
+
+
+def _indented(value: Any, level: int) -> str:
+    return json.dumps(value, indent=2).replace("\n", "\n" + "  " * level)
+
+
+def write_catalogue(path: Path, fields: dict[str, Any], teachers: Iterable[dict[str, Any]]) -> None:
+    """
+    Write teachers.json (other top-level fields first, then "teachers") one record at a time,
+    byte-identical to json.dump(..., indent=2), and atomically replace path.
+    """
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("{")
+        for name, value in fields.items():
+            if name != "teachers":
+                f.write(f"\n  {json.dumps(name)}: {_indented(value, 1)},")
+        f.write('\n  "teachers": [')
+        first = True
+        for teacher in teachers:
+            f.write(("" if first else ",") + "\n    " + _indented(teacher, 2))
+            first = False
+        f.write("\n  ]\n}" if not first else "]\n}")
+    os.replace(tmp, path)
+
+
+# ── CLI ──────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import urllib.request
+
+    parser = argparse.ArgumentParser(description="Stream-import teachers (NDJSON or JSON) with validation.")
+    parser.add_argument("file", type=Path, help="NDJSON (one teacher per line) or JSON (array or {\"teachers\": [...]})")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="default: detected from the content")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="validate only")
+    parser.add_argument("--api", default=None, help="POST the file to this running API instead of writing teachers.json")
+    parser.add_argument("--teachers", type=Path, default=None, help="teachers.json to merge into (default: the API's)")
+    args = parser.parse_args()
+
+    if args.api:
+        fmt = args.format
+        if fmt is None:
+            with open(args.file, encoding="utf-8") as f:
+                fmt = detect_format(f)
+        query = f"?format={fmt}&batch_size={args.batch_size}" + ("&dry_run=true" if args.dry_run else "")
+        with open(args.file, "rb") as body:
+            request = urllib.request.Request(
+                args.api.rstrip("/") + "/api/teachers/import" + query,
+                data=body,
+                method="POST",
+                headers={"Content-Type": "application/x-ndjson" if fmt == "ndjson" else "application/json", "Content-Length": str(args.file.stat().st_size)},
+            )
+            with urllib.request.urlopen(request) as response:
+                report = json.load(response)
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if report.get("invalid") else 0)
+
+    from matching import load_teachers, upsert_catalogue
+
+    if args.teachers is None:
+        from main import TEACHERS_PATH
+
+        args.teachers = TEACHERS_PATH
+    teachers = load_teachers(args.teachers) if args.teachers.exists() else []
+
+    def apply_batch(batch: list[dict[str, Any]]) -> tuple[int, int]:
+        global teachers
+        teachers, inserted, updated = upsert_catalogue(teachers, batch)
+        return inserted, updated
+
+    try:
+        with open(args.file, encoding="utf-8") as f:
+            report = import_records(iter_records(f, args.format), apply_batch, args.batch_size, args.dry_run)
+    except UploadError as e:
+        sys.exit(f"{args.file}: {e}")
+    if not args.dry_run and report["valid"]:
+        fields = listing.object_fields(args.teachers, "teachers") if args.teachers.exists() else {}
+        write_catalogue(args.teachers, fields, teachers)
+        print(f"Wrote {args.teachers}: {len(teachers)} teachers (rebuild the snapshot: python catalogue_snapshot.py build-snapshot).")
+    for error in report["errors"]:
+        print(f"  {error['position']}: {error['teacher_id'] or '?'}: {'; '.join(error['errors'])}")
+    print(
+        f"{report['received']} received, {report['valid']} valid, {report['invalid']} invalid; "
+        f"{report['inserted']} inserted, {report['updated']} updated."
+    )
+    sys.exit(1 if report["invalid"] else 0)
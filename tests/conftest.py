@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# Tests import the API modules from the repository root, without reading .env
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("UNITINDER_SKIP_DOTENV", "1")
@@ -0,0 +1,46 @@
+import numpy as np
+
+import archetypes
+from matching import DIMENSION_KEYS, WEIGHT_VECTOR
+
+
+def _blobs(centers: list[float], per_cluster: int = 30, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.vstack([np.clip(c + rng.normal(0, 0.03, (per_cluster, len(DIMENSION_KEYS))), 0, 1) for c in centers])
+
+
+def test_kmedians_recovers_separated_clusters():
+    X = _blobs([0.1, 0.5, 0.9])
+    centroids, labels = archetypes.kmedians(X, 3)
+    assert sorted(np.bincount(labels).tolist()) == [30, 30, 30]
+    for j in range(3):
+        assert len(set(labels[j * 30 : (j + 1) * 30])) == 1
+    assert sorted(round(float(np.median(c)), 1) for c in centroids) == [0.1, 0.5, 0.9]
+
+
+def test_kmedians_fixed_point():
+    X = _blobs([0.2, 0.8], seed=2)
+    centroids, labels = archetypes.kmedians(X, 2)
+    # Every row is assigned to its nearest centroid under the matching weights
+    distances = np.column_stack([np.abs(X - c) @ WEIGHT_VECTOR for c in centroids])
+    assert np.array_equal(labels, distances.argmin(axis=1))
+    # Every centroid is the per-dimension median of its members
+    for j, c in enumerate(centroids):
+        assert np.allclose(c, np.median(X[labels == j], axis=0))
+    # Restarting from the result changes nothing
+    again, again_labels = archetypes.kmedians(X, 2, init=centroids)
+    assert np.array_equal(again_labels, labels) and np.allclose(again, centroids)
+
+
+def test_kmedians_caps_k_at_rows():
+    X = _blobs([0.5], per_cluster=2)
+    centroids, labels = archetypes.kmedians(X, 5)
+    assert len(centroids) == 2 and set(labels.tolist()) <= {0, 1}
+
+
+def test_nearest_archetype():
+    model = {"_centroids": np.vstack([np.full(len(DIMENSION_KEYS), 0.1), np.full(len(DIMENSION_KEYS), 0.9)])}
+    low = {d: 0.2 for d in DIMENSION_KEYS}
+    high = {d: 0.7 for d in DIMENSION_KEYS}
+    assert archetypes.nearest_archetype(model, low) == 0
+    assert archetypes.nearest_archetype(model, high) == 1
@@ -0,0 +1,64 @@
+import json
+
+import numpy as np
+import pytest
+
+import archetypes
+import catalogue_snapshot
+import main
+import matching
+from matching import DIMENSION_KEYS, load_teachers, rank_teachers
+
+
+@pytest.fixture(scope="module")
+def teachers():
+    return load_teachers(main.TEACHERS_PATH)
+
+
+@pytest.fixture
+def snapshot_path(tmp_path, teachers):
+    return catalogue_snapshot.build_snapshot(teachers, "a" * 64, tmp_path / "teachers.snapshot")
+
+
+def test_round_trip(teachers, snapshot_path):
+    snapshot = catalogue_snapshot.load_snapshot(snapshot_path, source_sha256="a" * 64)
+    assert len(snapshot) == len(teachers) and list(snapshot) == teachers
+    assert snapshot[-1] == teachers[-1] and snapshot[1:4] == teachers[1:4]
+    with pytest.raises(IndexError):
+        snapshot[len(teachers)]
+    assert snapshot.teacher_ids() == [t["teacher_id"].strip() for t in teachers]
+    assert snapshot.index_of(f" {teachers[3]['teacher_id']} ") == 3 and snapshot.index_of("missing") is None
+    # The mmapped matrix is 64-byte aligned and equal to the one built from the records
+    assert snapshot.matrix.ctypes.data % catalogue_snapshot.ALIGN == 0
+    np.testing.assert_array_equal(snapshot.matrix, matching.persona_matrix([t["persona"] for t in teachers]))
+
+
+def test_matching_on_a_snapshot_equals_the_list(teachers, snapshot_path):
+    snapshot = catalogue_snapshot.load_snapshot(snapshot_path)
+    persona = {d: 0.35 for d in DIMENSION_KEYS}
+    assert rank_teachers(snapshot, persona) == rank_teachers(teachers, persona)
+    for subject in {t["subject"] for t in teachers} | {"No such subject"}:
+        assert matching.subject_indices(snapshot, f" {subject}") == matching.subject_indices(teachers, subject)
+        assert rank_teachers(snapshot, persona, subject=subject) == rank_teachers(teachers, persona, subject=subject)
+
+
+def test_stale_or_foreign_snapshots_are_ignored(tmp_path, snapshot_path, monkeypatch):
+    assert catalogue_snapshot.load_snapshot(snapshot_path, source_sha256="b" * 64) is None
+    assert catalogue_snapshot.load_snapshot(tmp_path / "missing.snapshot") is None
+    not_a_snapshot = tmp_path / "teachers.json"
+    not_a_snapshot.write_text(json.dumps({"teachers": []}), encoding="utf-8")
+    assert catalogue_snapshot.load_snapshot(not_a_snapshot) is None
+    truncated = tmp_path / "truncated.snapshot"
+    truncated.write_bytes(snapshot_path.read_bytes()[:20])
+    assert catalogue_snapshot.load_snapshot(truncated) is None
+    monkeypatch.setattr(catalogue_snapshot, "FORMAT_VERSION", catalogue_snapshot.FORMAT_VERSION + 1)
+    assert catalogue_snapshot.load_snapshot(snapshot_path) is None
+
+
+def test_snapshot_tracks_the_teachers_json_hash(tmp_path, teachers):
+    source = tmp_path / "teachers.json"
+    source.write_text(json.dumps({"teachers": teachers[:5]}), encoding="utf-8")
+    path = catalogue_snapshot.build_snapshot(load_teachers(source), archetypes.file_sha256(source), tmp_path / "s.snapshot")
+    assert len(catalogue_snapshot.load_snapshot(path, source_sha256=archetypes.file_sha256(source))) == 5
+    source.write_text(json.dumps({"teachers": teachers[:6]}), encoding="utf-8")
+    assert catalogue_snapshot.load_snapshot(path, source_sha256=archetypes.file_sha256(source)) is None
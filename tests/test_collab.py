@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import main
+from collab import CoLikeModel, likes_to_csr
+from matching import DIMENSION_KEYS, rank_teachers
+
+PERSONA = {d: 0.4 for d in DIMENSION_KEYS}
+
+
+def test_diversity_keeps_the_collaborative_order(monkeypatch):
+    teachers = main.get_teachers()
+    ranked = rank_teachers(teachers, PERSONA)
+    liked, target = ranked[-1]["teacher_id"], ranked[5]["teacher_id"]
+    # Students who like the same teacher as stu_me also like the target
+    model = CoLikeModel.from_likes({"stu_me": [liked], **{f"stu_{i}": [liked, target] for i in range(3)}})
+    monkeypatch.setattr(main, "get_colike_model", lambda: model)
+
+    request = main.MatchRequest(studentPersona=PERSONA, studentId="stu_me", collabWeight=0.9)
+    collab_order = main._rerank([dict(r) for r in ranked], request, teachers, "default")
+    assert collab_order[0]["teacher_id"] == target
+
+    diversified = main._rerank([dict(r) for r in ranked], request.model_copy(update={"diversity": 0.01}), teachers, "default")
+    assert diversified[0]["teacher_id"] == target
+    assert [r["teacher_id"] for r in diversified[:3]] == [r["teacher_id"] for r in collab_order[:3]]
+    assert sorted(r["teacher_id"] for r in diversified) == sorted(r["teacher_id"] for r in ranked)
+
+
+# Rows are students, columns teachers: stu_me liked t1 and t2; t3 is co-liked with t1 by others only
+LIKES = {
+    "stu_me": ["t1", "t2"],
+    "stu_a": ["t1", "t3"],
+    "stu_b": ["t1", "t3", "t4"],
+    "stu_c": ["t2", "t4"],
+    "stu_d": ["t4"],
+}
+
+
+def _expected_co_like(likes, student_id, candidates):
+    """co_like from the CSR like matrix without the student's row (dense X^T X)."""
+    others = {s: t for s, t in likes.items() if s != student_id}
+    indptr, indices, _, teacher_ids = likes_to_csr(others)
+    x = np.zeros((len(indptr) - 1, len(teacher_ids)))
+    for r in range(len(indptr) - 1):
+        x[r, indices[indptr[r] : indptr[r + 1]]] = 1
+    co = x.T @ x
+    col = {t: j for j, t in enumerate(teacher_ids)}
+    scores = []
+    for c in candidates:
+        total = 0.0
+        for l in likes[student_id]:
+            if c != l and c in col and l in col and co[col[c], col[c]] and co[col[l], col[l]]:
+                total += co[col[c], col[l]] / np.sqrt(co[col[c], col[c]] * co[col[l], col[l]])
+        scores.append(total)
+    scores = np.array(scores)
+    return scores / scores.max()
+
+
+def test_own_likes_do_not_boost_already_liked_teachers():
+    model = CoLikeModel.from_likes(LIKES)
+    ranked = [{"teacher_id": t, "compatibility_score": 100.0 - i} for i, t in enumerate(["t4", "t3", "t2", "t1"])]
+    reranked = model.rerank(ranked, "stu_me", 0.5)
+    co_like = {r["teacher_id"]: r["co_like"] for r in reranked}
+    expected = _expected_co_like(LIKES, "stu_me", ["t4", "t3", "t2", "t1"])
+    assert [co_like[t] for t in ["t4", "t3", "t2", "t1"]] == pytest.approx(expected, abs=1e-3)
+    # t1 and t2 are co-liked only by stu_me: no boost between them
+    assert co_like["t1"] == co_like["t2"] == 0.0
+    # Incremental updates give the same scores as a fresh build
+    model.add_like("stu_e", "t3")
+    model.add_like("stu_e", "t2")
+    likes = dict(LIKES, stu_e=["t3", "t2"])
+    fresh = CoLikeModel.from_likes(likes).rerank(ranked, "stu_me", 0.5)
+    assert model.rerank(ranked, "stu_me", 0.5) == fresh
+    co_like = {r["teacher_id"]: r["co_like"] for r in fresh}
+    assert [co_like[t] for t in ["t4", "t3", "t2", "t1"]] == pytest.approx(_expected_co_like(likes, "stu_me", ["t4", "t3", "t2", "t1"]), abs=1e-3)
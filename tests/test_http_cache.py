@@ -0,0 +1,95 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import http_cache
+
+BIG = {"items": [{"id": i, "text": "x" * 40} for i in range(100)]}
+builds = []
+
+
+def _build(payload):
+    def build():
+        builds.append(1)
+        return payload
+
+    return build
+
+
+app = FastAPI()
+
+
+@app.get("/cached")
+def cached(request: Request, version: int = 1):
+    payload = BIG if version == 1 else dict(BIG, version=version)
+    return http_cache.json_response(request, ("cached", version), _build(payload), cache_control="public, max-age=60")
+
+
+@app.get("/small")
+def small(request: Request):
+    return http_cache.json_response(request, ("small",), _build({"ok": True}), cache_control="no-cache")
+
+
+@app.get("/versioned")
+def versioned(request: Request, version: int = 1):
+    return http_cache.versioned_response(request, ("versioned", version), _build(BIG), cache_control="private, no-cache")
+
+
+@pytest.fixture
+def client():
+    http_cache.clear()
+    builds.clear()
+    return TestClient(app)
+
+
+def test_each_encoding_has_its_own_etag(client):
+    identity = client.get("/cached", headers={"Accept-Encoding": "identity"})
+    gz = client.get("/cached", headers={"Accept-Encoding": "gzip"})
+    assert identity.json() == BIG and gz.json() == BIG
+    assert gz.headers["content-encoding"] == "gzip"
+    assert gz.headers["etag"] == identity.headers["etag"][:-1] + '-gz"'
+    assert gz.headers["vary"] == "Accept-Encoding"
+    assert len(builds) == 1
+
+
+def test_if_none_match_revalidates_any_encoding(client):
+    identity_etag = client.get("/cached", headers={"Accept-Encoding": "identity"}).headers["etag"]
+    gz_etag = client.get("/cached", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    for sent, encoding in [(identity_etag, "gzip"), (gz_etag, "identity"), ("W/" + gz_etag, "gzip"), (f'"other", {gz_etag}', "gzip"), ("*", "gzip")]:
+        response = client.get("/cached", headers={"Accept-Encoding": encoding, "If-None-Match": sent})
+        assert response.status_code == 304 and response.content == b""
+    assert client.get("/cached", headers={"If-None-Match": '"other"'}).status_code == 200
+    # A new version is a new body
+    assert client.get("/cached?version=2", headers={"If-None-Match": identity_etag}).status_code == 200
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert not response.headers["etag"].endswith('-gz"')
+
+
+def test_gzip_body_is_the_identity_body(client):
+    raw = client.get("/cached", headers={"Accept-Encoding": "identity"}).content
+    body = http_cache._get_body(("cached", 1), lambda: BIG)
+    assert gzip.decompress(body.encoded("gzip")) == raw
+
+
+def test_accept_encoding_q_values():
+    assert http_cache._pick_encoding("gzip;q=0, identity") is None
+    assert http_cache._pick_encoding("deflate, gzip;q=0.5") == "gzip"
+    assert http_cache._pick_encoding(None) is None
+
+
+def test_versioned_responses_are_not_cached(client):
+    first = client.get("/versioned")
+    assert first.status_code == 200 and first.json() == BIG
+    assert len(http_cache._cache) == 0
+    # Revalidation is answered from the key alone, without building the body
+    builds.clear()
+    assert client.get("/versioned", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+    assert builds == []
+    assert client.get("/versioned?version=2", headers={"If-None-Match": first.headers["etag"]}).status_code == 200
+    assert builds == [1]
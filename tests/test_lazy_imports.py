@@ -0,0 +1,44 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+import bench_startup
+import main
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PROVIDER_SDKS = ["openai", "elevenlabs", "moviepy"]
+
+
+def _loaded_after(code: str) -> dict[str, bool]:
+    """Which provider SDKs a fresh interpreter has imported after running code."""
+    script = f"import sys\n{code}\nimport json\nprint(json.dumps({{m: m in sys.modules for m in {PROVIDER_SDKS!r}}}))"
+    env = {"UNITINDER_SKIP_DOTENV": "1", "PATH": "/usr/bin:/bin"}
+    out = subprocess.run([sys.executable, "-c", script], cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_importing_the_app_does_not_import_provider_sdks():
+    assert _loaded_after("import main") == {m: False for m in PROVIDER_SDKS}
+    assert _loaded_after("import voice") == {m: False for m in PROVIDER_SDKS}
+
+
+def test_clients_are_created_on_first_use():
+    loaded = _loaded_after("import main\nmain._openai_client('test')")
+    assert loaded["openai"] and not loaded["elevenlabs"]
+    client = main._openai_client("test-key")
+    assert main._openai_client("test-key") is client and client.max_retries == 0
+
+
+def test_lifespan_preloads_the_catalogue():
+    main._invalidate_teachers()
+    assert main._teachers_cache is None
+    with TestClient(main.app):
+        assert main._teachers_cache is not None
+
+
+def test_bench_startup_reports_cumulative_import_times():
+    times = bench_startup.measure("json")
+    assert times["json"] > 0 and "json.decoder" in times
@@ -0,0 +1,120 @@
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+import like_analytics
+from like_analytics import LikeAnalytics, bucket_start
+from matching import DIMENSION_KEYS
+
+# Wednesday 2026-01-07 15:30 UTC
+WEDNESDAY = datetime(2026, 1, 7, 15, 30, tzinfo=timezone.utc).timestamp()
+
+
+def _utc(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return tmp_path / "like_events.ndjson", tmp_path / "like_rollups.json"
+
+
+def _totals(analytics, teacher_id, start, end, granularity="day"):
+    return analytics.timeseries(teacher_id, granularity, start, end)["totals"]
+
+
+def test_buckets_align_to_hours_days_and_monday_weeks():
+    assert _utc(bucket_start(WEDNESDAY, "hour")) == datetime(2026, 1, 7, 15, tzinfo=timezone.utc)
+    assert _utc(bucket_start(WEDNESDAY, "day")) == datetime(2026, 1, 7, tzinfo=timezone.utc)
+    assert _utc(bucket_start(WEDNESDAY, "week")) == datetime(2026, 1, 5, tzinfo=timezone.utc)
+    rng = random.Random(4)
+    for _ in range(200):
+        ts = rng.uniform(0, 2e9)
+        week = bucket_start(ts, "week")
+        assert _utc(week).weekday() == 0 and _utc(week).hour == 0
+        assert week <= ts < week + 7 * like_analytics.DAY
+    # Monday 00:00 starts a new week, Sunday 23:59 still belongs to the previous one
+    monday = datetime(2026, 1, 12, tzinfo=timezone.utc).timestamp()
+    assert bucket_start(monday, "week") == monday and bucket_start(monday - 60, "week") == monday - 7 * like_analytics.DAY
+
+
+def test_weekly_series_sum_daily_buckets(paths):
+    analytics = LikeAnalytics(*paths)
+    monday = datetime(2026, 1, 12, tzinfo=timezone.utc).timestamp()
+    persona = {d: 0.2 for d in DIMENSION_KEYS}
+    analytics.record("like", "stu_a", "tch_1", persona, ts=monday - 3600)
+    analytics.record("like", "stu_b", "tch_1", {d: 0.6 for d in DIMENSION_KEYS}, ts=monday + 3600)
+    analytics.record("unlike", "stu_a", "tch_1", ts=monday + 7200)
+    series = analytics.timeseries("tch_1", "week", monday - 7 * like_analytics.DAY, monday + 7 * like_analytics.DAY)
+    assert [(b["start"], b["likes"], b["unlikes"]) for b in series["buckets"]] == [
+        ("2026-01-05T00:00:00Z", 1, 0),
+        ("2026-01-12T00:00:00Z", 1, 1),
+    ]
+    assert series["totals"]["net"] == 1
+    assert series["totals"]["average_liker_persona"]["pace"] == 0.4
+
+
+def test_checkpoint_replays_events_from_another_writer(paths):
+    first = LikeAnalytics(*paths)
+    for i in range(5):
+        first.record("like", f"stu_{i}", "tch_1", ts=WEDNESDAY + i)
+    first.checkpoint()
+    # Another worker appends to the same log
+    other = LikeAnalytics(*paths)
+    other.load()
+    other.record("like", "stu_9", "tch_1", ts=WEDNESDAY + 10)
+    other.record("unlike", "stu_0", "tch_1", ts=WEDNESDAY + 11)
+    assert _totals(first, "tch_1", WEDNESDAY - 3600, WEDNESDAY + 3600)["likes"] == 6
+    # A write after the other worker's appends catches up in log order
+    first.record("like", "stu_8", "tch_2", ts=WEDNESDAY + 12)
+    assert first._offset == paths[0].stat().st_size
+
+    restored = LikeAnalytics(*paths)
+    restored.load()  # checkpoint (5 events) + replay of the 3 appended after it
+    rebuilt_paths = (paths[0], paths[1].with_name("fresh_rollups.json"))
+    rebuilt = LikeAnalytics(*rebuilt_paths)
+    rebuilt.load()
+    for teacher_id in ("tch_1", "tch_2"):
+        assert _totals(restored, teacher_id, WEDNESDAY - 3600, WEDNESDAY + 3600) == _totals(rebuilt, teacher_id, WEDNESDAY - 3600, WEDNESDAY + 3600)
+    assert _totals(restored, "tch_1", WEDNESDAY - 3600, WEDNESDAY + 3600)["unlikes"] == 1
+
+
+def test_truncated_log_is_rebuilt_from_scratch(paths):
+    events_path, _ = paths
+    analytics = LikeAnalytics(*paths)
+    for i in range(6):
+        analytics.record("like", f"stu_{i}", "tch_1", ts=WEDNESDAY + i)
+    analytics.checkpoint()
+    lines = events_path.read_bytes().splitlines(keepends=True)
+    # Log rotated to its first two events, plus a partially written third line
+    events_path.write_bytes(b"".join(lines[:2]) + lines[2][:10])
+    reloaded = LikeAnalytics(*paths)
+    reloaded.load()
+    assert _totals(reloaded, "tch_1", WEDNESDAY - 3600, WEDNESDAY + 3600)["likes"] == 2
+    assert reloaded._offset == len(b"".join(lines[:2]))
+
+
+def test_backfill_from_likes_json(paths):
+    analytics = LikeAnalytics(*paths)
+    analytics.load({"stu_a": ["tch_1", " tch_2 "], "": ["tch_3"]}, {"stu_a": {d: 1.0 for d in DIMENSION_KEYS}}, likes_mtime=WEDNESDAY)
+    assert _totals(analytics, "tch_2", WEDNESDAY - 3600, WEDNESDAY + 3600)["likes"] == 1
+    assert _totals(analytics, "tch_3", WEDNESDAY - 3600, WEDNESDAY + 3600)["likes"] == 0
+
+
+def test_window_validation(paths):
+    analytics = LikeAnalytics(*paths)
+    with pytest.raises(ValueError, match="granularity"):
+        analytics.timeseries("tch_1", "month")
+    with pytest.raises(ValueError, match="before end"):
+        analytics.timeseries("tch_1", "day", WEDNESDAY, WEDNESDAY - like_analytics.DAY)
+    with pytest.raises(ValueError, match="more than"):
+        analytics.timeseries("tch_1", "hour", WEDNESDAY - (like_analytics.MAX_BUCKETS + 1) * like_analytics.HOUR, WEDNESDAY)
+    # end inside a bucket includes that bucket; default windows use DEFAULT_WINDOW_BUCKETS
+    assert len(analytics.timeseries("tch_1", "day", WEDNESDAY - like_analytics.DAY, WEDNESDAY)["buckets"]) == 2
+    assert len(analytics.timeseries("tch_1", "week")["buckets"]) == like_analytics.DEFAULT_WINDOW_BUCKETS["week"]
+    assert like_analytics.parse_time("2026-01-07T15:30:00Z") == WEDNESDAY
+    assert like_analytics.parse_time("2026-01-07T16:30:00+01:00") == WEDNESDAY
+    assert like_analytics.parse_time(str(WEDNESDAY)) == WEDNESDAY and like_analytics.parse_time(" ") is None
+    with pytest.raises(ValueError):
+        like_analytics.parse_time("last tuesday")
@@ -0,0 +1,89 @@
+import json
+import multiprocessing
+import os
+from pathlib import Path
+
+import preview_audio
+
+TEACHER = {"teacher_id": "tch_1", "name": "Ada", "subject": "Analysis", "persona": {"pace": 0.4}, "voice_id": "v1"}
+
+
+def test_put_get_and_shared_objects(tmp_path):
+    store = preview_audio.PreviewStore(tmp_path)
+    assert store.get("k1") is None
+    path = store.put("k1", b"audio", teacher_id="tch_1")
+    assert store.get("k1") == path and path.read_bytes() == b"audio"
+    assert store.put("k2", b"audio") == path
+    assert len(list((tmp_path / "objects").rglob("*.mp3"))) == 1
+    entries = store.entries()
+    assert entries["k1"]["teacher_id"] == "tch_1" and entries["k1"]["bytes"] == 5
+    path.unlink()
+    assert store.get("k1") is None
+
+
+def test_replay_picks_up_lines_from_other_writers(tmp_path):
+    reader = preview_audio.PreviewStore(tmp_path)
+    writer = preview_audio.PreviewStore(tmp_path)
+    writer.put("k1", b"first")
+    assert reader.keys() == {"k1"}
+    second = writer.put("k1", b"second")
+    writer.put("k2", b"other")
+    assert reader.get("k1") == second and reader.keys() == {"k1", "k2"}
+    assert preview_audio.PreviewStore(tmp_path).entries() == reader.entries()
+
+
+def test_partial_and_garbage_lines(tmp_path):
+    store = preview_audio.PreviewStore(tmp_path)
+    store.put("k1", b"audio")
+    sha256 = store.entries()["k1"]["sha256"]
+    line = json.dumps({"key": "k2", "sha256": sha256})
+    with open(store.manifest_path, "a", encoding="utf-8") as f:
+        f.write("not json\n[1, 2]\n" + line[:10])
+    assert store.keys() == {"k1"}
+    with open(store.manifest_path, "a", encoding="utf-8") as f:
+        f.write(line[10:] + "\n")
+    assert store.keys() == {"k1", "k2"} and store.get("k2") == store.get("k1")
+
+
+def test_truncated_or_replaced_manifest_is_reread(tmp_path):
+    store = preview_audio.PreviewStore(tmp_path)
+    store.put("k1", b"one")
+    store.put("k2", b"two")
+    assert store.keys() == {"k1", "k2"}
+    store.manifest_path.write_text("")
+    assert store.keys() == set()
+    other = tmp_path / "other.ndjson"
+    other.write_text(json.dumps({"key": "k3", "sha256": "00" * 32}) + "\n")
+    os.replace(other, store.manifest_path)
+    assert store.keys() == {"k3"}
+    store.manifest_path.unlink()
+    assert store.keys() == set()
+    store.put("k4", b"four")
+    assert store.keys() == {"k4"}
+
+
+def test_preview_key_follows_what_the_preview_depends_on():
+    key = preview_audio.preview_key(TEACHER, "Limits")
+    assert preview_audio.preview_key(TEACHER, "  limits ") == key
+    assert preview_audio.preview_key(dict(TEACHER, voice_id="v2"), "Limits") != key
+    assert preview_audio.preview_key(dict(TEACHER, persona={"pace": 0.5}), "Limits") != key
+    assert len(preview_audio.plan_jobs([TEACHER, dict(TEACHER, teacher_id="tch_2", voice_id="")])) == 5
+
+
+def _put_previews(root, worker, count):
+    store = preview_audio.PreviewStore(Path(root))
+    for i in range(count):
+        store.put(f"k{worker}_{i}", f"audio {worker} {i}".encode())
+
+
+def test_concurrent_processes_keep_every_entry(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_put_previews, args=(str(tmp_path), w, 100)) for w in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(60)
+    assert all(p.exitcode == 0 for p in processes)
+    store = preview_audio.PreviewStore(tmp_path)
+    assert len(store.keys()) == 400
+    assert all(store.get(key) is not None for key in store.keys())
@@ -0,0 +1,86 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main
+import profiling
+
+TOKEN = "s3cret"
+
+
+def _busy_work(seconds: float) -> int:
+    total, deadline = 0, time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+
+def _app(keep_slowest: int = 0) -> tuple[TestClient, profiling.ProfileStore]:
+    app = FastAPI()
+    app.router.route_class = profiling.ProfiledRoute
+    store = profiling.ProfileStore(keep_slowest=keep_slowest, interval=0.001)
+    app.add_middleware(profiling.ProfilingMiddleware, store=store, token=TOKEN)
+
+    @app.get("/sync")
+    def sync_endpoint(seconds: float = 0.05):
+        return {"n": _busy_work(seconds)}
+
+    @app.get("/async")
+    async def async_endpoint():
+        return {"n": _busy_work(0.05)}
+
+    @app.get("/api/debug/ping")
+    def debug_ping():
+        return {}
+
+    return TestClient(app), store
+
+
+def test_on_demand_profiles_need_the_token():
+    client, store = _app()
+    assert "x-profile-id" not in client.get("/sync").headers
+    assert "x-profile-id" not in client.get("/sync", headers={"X-Profile-Token": "wrong"}).headers
+    assert "x-profile-id" not in client.get("/api/debug/ping", headers={"X-Profile-Token": TOKEN}).headers
+    assert store.summaries() == {"recent": [], "slowest": []}
+
+
+def test_sync_and_async_endpoints_are_sampled():
+    client, store = _app()
+    for path in ("/sync", "/async"):
+        response = client.get(path, headers={"X-Profile-Token": TOKEN})
+        profile = store.get(response.headers["x-profile-id"])
+        assert profile.status_code == 200 and profile.on_demand and profile.duration_ms >= 50
+        stacks = profile.collapsed().splitlines()
+        assert stacks and all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+        assert any("test_profiling:_busy_work" in line for line in stacks)
+    assert [s["path"] for s in store.summaries()["recent"]] == ["/async", "/sync"]
+
+
+def test_always_on_keeps_the_slowest():
+    client, store = _app(keep_slowest=2)
+    for seconds in (0.01, 0.06, 0.02, 0.04):
+        assert "x-profile-id" not in client.get("/sync", params={"seconds": seconds}).headers
+    slowest = store.summaries()["slowest"]
+    assert len(slowest) == 2 and slowest[0]["duration_ms"] >= slowest[1]["duration_ms"] >= 40
+    assert store.summaries()["recent"] == [] and store.get(slowest[0]["id"]) is not None
+
+
+def test_recent_profiles_are_bounded():
+    store = profiling.ProfileStore(recent_max=3)
+    profiles = [profiling.Profile(store.sampler, "GET", f"/p{i}", on_demand=True) for i in range(5)]
+    for p in profiles:
+        store.add(p)
+    assert [s["path"] for s in store.summaries()["recent"]] == ["/p4", "/p3", "/p2"]
+    assert store.get(profiles[0].id) is None
+    assert not profiling.token_matches("x", None) and profiling.token_matches(TOKEN, TOKEN)
+
+
+def test_debug_endpoints_require_the_token(monkeypatch):
+    client = TestClient(main.app)
+    monkeypatch.setattr(main, "PROFILE_TOKEN", None)
+    assert client.get("/api/debug/profiles").status_code == 404
+    monkeypatch.setattr(main, "PROFILE_TOKEN", TOKEN)
+    assert client.get("/api/debug/profiles").status_code == 403
+    assert client.get("/api/debug/profiles", headers={"X-Profile-Token": TOKEN}).status_code == 200
+    assert client.get("/api/debug/profiles/missing", headers={"X-Profile-Token": TOKEN}).status_code == 404
@@ -0,0 +1,106 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import main
+import prompts
+from matching import DIMENSION_KEYS
+
+TEACHER = {"teacher_id": "tch_1", "name": "Ada", "subject": "Analysis", "archetype": "Socratic", "persona": {d: 0.52 for d in DIMENSION_KEYS}}
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    fresh = {}
+    monkeypatch.setattr(prompts, "_stats", fresh)
+    return fresh
+
+
+@pytest.fixture
+def estimated_tokens(monkeypatch):
+    monkeypatch.setattr(prompts, "_encoding", None)
+    monkeypatch.setattr(prompts, "_encoding_checked", True)
+
+
+class FakeCompletions:
+    """chat.completions stand-in: a completion with usage, or a stream whose last chunk carries usage."""
+
+    def __init__(self, text="Plan"):
+        self.text = text
+        self.calls = []
+
+    def create(self, model, messages, stream=False, **kwargs):
+        self.calls.append(messages)
+        usage = SimpleNamespace(prompt_tokens=120, prompt_tokens_details=SimpleNamespace(cached_tokens=96))
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.text))], usage=usage)
+        chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=c))], usage=None) for c in self.text]
+        return iter(chunks + [SimpleNamespace(choices=[], usage=usage)])
+
+
+def test_estimated_token_count(estimated_tokens):
+    assert prompts.count_tokens("") == 0
+    assert prompts.count_tokens("abcd") == 1 and prompts.count_tokens("abcde") == 2
+    assert prompts.prompt_tokens([{"role": "system", "content": "abcd"}, {"role": "user", "content": None}]) == 1
+    assert prompts.metrics()["tokenizer"] == "estimate (4 chars/token)"
+
+
+def test_compact_persona_encodings():
+    persona = {"formality": 0.81, "pace": 0.123, "zz_extra": 0.5}
+    assert prompts.encode_persona(persona) == "pace=0.1\nformality=0.8\nzz_extra=0.5"
+    assert prompts.persona_bands({"pace": 0.9, "formality": 0.5, "humor_receptivity": 0.1}) == "high: pace\nmedium: formality\nlow: humor_receptivity"
+    assert prompts.persona_bands({"pace": 0.35, "formality": 0.65}) == "high: formality\nlow: pace"
+
+
+def test_prompts_are_static_first(estimated_tokens):
+    other = dict(TEACHER, teacher_id="tch_2", name="Grace", persona={d: 0.9 for d in DIMENSION_KEYS})
+    a = prompts.study_plan(TEACHER, {d: 0.2 for d in DIMENSION_KEYS}, "Limits", "")
+    b = prompts.study_plan(TEACHER, {d: 0.8 for d in DIMENSION_KEYS}, "Integrals", "")
+    assert a[0].messages[0] == b[0].messages[0]
+    assert a[0].messages[1]["content"].startswith(prompts.STUDY_PLAN_INSTRUCTIONS)
+    assert b[0].messages[1]["content"].startswith(prompts.STUDY_PLAN_INSTRUCTIONS)
+    assert len(prompts.study_plan(TEACHER, {}, "Limits", "Teach like Ada.")) == 2
+    for prompt in (prompts.modality_prompts(TEACHER), prompts.modality_prompts(other)):
+        assert prompt.messages[0]["content"] == prompts.MODALITY_SYSTEM
+        assert prompt.messages[1]["content"].startswith(prompts.MODALITY_INSTRUCTIONS)
+
+
+def test_saved_tokens_against_indented_json(estimated_tokens):
+    prompt = prompts.modality_prompts(TEACHER)
+    data = prompt.messages[1]["content"].split("INPUT DATA (Teacher Persona):\n", 1)[1]
+    expected = prompts.count_tokens(json.dumps(TEACHER, indent=2)) - prompts.count_tokens(data)
+    assert prompt.saved_tokens == expected > 0
+    persona = {d: 0.2 for d in DIMENSION_KEYS}
+    plan = prompts.study_plan(TEACHER, persona, "Limits", "")[0]
+    assert plan.saved_tokens == prompts.count_tokens(json.dumps(persona, indent=2)) - prompts.count_tokens(prompts.persona_bands(persona))
+
+
+def test_record_and_metrics(stats, estimated_tokens):
+    prompt = prompts.Prompt("demo", [{"role": "user", "content": "x" * 300}], saved_tokens=25)
+    prompts.record(prompt)
+    prompts.record(prompt, SimpleNamespace(prompt_tokens=80, prompt_tokens_details=SimpleNamespace(cached_tokens=20)))
+    prompts.record(prompt, SimpleNamespace(prompt_tokens=None, prompt_tokens_details=None))
+    assert prompts.metrics()["kinds"]["demo"] == {
+        "calls": 3,
+        "prompt_tokens": 225,
+        "saved_tokens": 75,
+        "reported_calls": 2,
+        "reported_prompt_tokens": 80,
+        "reported_cached_tokens": 20,
+        "saved_pct": 25.0,
+        "cached_pct": 25.0,
+    }
+
+
+def test_upstream_calls_are_recorded(monkeypatch, stats, estimated_tokens):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    completions = FakeCompletions()
+    monkeypatch.setattr(main, "_openai_client", lambda api_key: SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    persona = {d: 0.2 for d in DIMENSION_KEYS}
+    assert main._generate_study_plan.__wrapped__(TEACHER, persona, "Record test", "") == "Plan"
+    assert "".join(main._stream_study_plan(TEACHER, persona, "Record test", "")) == "Plan"
+    s = prompts.metrics()["kinds"]["study_plan"]
+    expected = 2 * prompts.prompt_tokens(completions.calls[0])
+    assert (s["calls"], s["prompt_tokens"], s["reported_calls"]) == (2, expected, 2)
+    assert (s["reported_prompt_tokens"], s["reported_cached_tokens"], s["cached_pct"]) == (240, 192, 80.0)
@@ -0,0 +1,61 @@
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import quiz
+from matching import DIMENSION_KEYS
+
+FIXTURES = Path(__file__).parent / "fixtures"
+QUIZ_DIR = Path(quiz.__file__).resolve().parent / "student-quiz"
+# Answer sheets scored by `node student-quiz/run-quiz.js` (answers piped to stdin)
+REFERENCE = json.loads((FIXTURES / "quiz_reference.json").read_text(encoding="utf-8"))["cases"]
+
+
+def test_scores_match_js_reference():
+    scores = quiz.get_quiz().score([case["answers"] for case in REFERENCE])
+    for row, case in zip(scores, REFERENCE):
+        assert quiz.persona_from_row(row) == case["persona"]
+
+
+def test_dict_and_list_sheets_agree():
+    compiled = quiz.get_quiz()
+    answers = REFERENCE[2]["answers"]
+    as_dict = {str(qid): label.lower() for qid, label in zip(compiled.question_ids, answers)}
+    assert np.array_equal(compiled.score([as_dict]), compiled.score([answers]))
+
+
+def test_unanswered_dimensions_are_neutral():
+    compiled = quiz.get_quiz()
+    first = compiled.question_ids[0]
+    persona = quiz.persona_from_row(compiled.score([{first: "A"}])[0])
+    touched = compiled.mask[compiled.option_rows[(first, "A")]]
+    for d, is_touched in zip(DIMENSION_KEYS, touched):
+        if not is_touched:
+            assert persona[d] == 0.5
+
+
+def test_rounds_half_up_like_math_round():
+    compiled = quiz.CompiledQuiz(
+        [{"id": 1, "options": [{"label": "A", "dimensions": {"pace": 0.125}}]}, {"id": 2, "options": [{"label": "A", "dimensions": {"pace": 0.125}}]}]
+    )
+    assert quiz.persona_from_row(compiled.score([["A", "A"]])[0])["pace"] == 0.13
+
+
+@pytest.mark.parametrize("sheet", [{}, {"1": None}, {"1": "Z"}, {"nope": "A"}, "A"])
+def test_rejects_bad_sheets(sheet):
+    with pytest.raises(quiz.AnswerSheetError):
+        quiz.get_quiz().score([sheet])
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_questions_json_matches_questions_js():
+    script = "const {DIMENSION_KEYS, QUESTIONS} = require('./questions.js'); console.log(JSON.stringify({DIMENSION_KEYS, QUESTIONS}))"
+    out = subprocess.run(["node", "-e", script], cwd=QUIZ_DIR, capture_output=True, text=True, check=True).stdout
+    from_js = json.loads(out)
+    from_json = json.loads((QUIZ_DIR / "questions.json").read_text(encoding="utf-8"))
+    assert from_json["DIMENSION_KEYS"] == from_js["DIMENSION_KEYS"]
+    assert from_json["QUESTIONS"] == from_js["QUESTIONS"]
@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+
+import pytest
+
+import main
+from matching import DIMENSION_KEYS, rank_teachers
+
+PERSONA = {d: 0.3 for d in DIMENSION_KEYS}
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    calls = []
+
+    def counting_rank(*args, **kwargs):
+        calls.append(kwargs.get("subject"))
+        return rank_teachers(*args, **kwargs)
+
+    monkeypatch.setattr(main, "rank_teachers", counting_rank)
+    monkeypatch.setattr(main, "SHARDS", None)
+    main._ranked_cache.clear()
+    yield calls
+    main._ranked_cache.clear()
+
+
+def test_repeated_match_is_ranked_once(counted):
+    teachers = main.get_teachers()
+    first = main._cached_rank(teachers, PERSONA, None, "default")
+    # Differences below the key's rounding hit the same entry
+    second = main._cached_rank(teachers, dict(PERSONA, pace=0.3000001), None, "default")
+    assert first == second == rank_teachers(teachers, PERSONA)
+    assert counted == [None]
+
+
+def test_callers_get_copies(counted):
+    teachers = main.get_teachers()
+    main._cached_rank(teachers, PERSONA, None, "default")[0]["summary"] = "personalized"
+    assert main._cached_rank(teachers, PERSONA, None, "default")[0]["summary"] != "personalized"
+
+
+def test_key_separates_subject_profile_and_catalogue_version(counted, monkeypatch):
+    teachers = main.get_teachers()
+    subject = teachers[0]["subject"]
+    main._cached_rank(teachers, PERSONA, None, "default")
+    main._cached_rank(teachers, PERSONA, subject, "default")
+    main._cached_rank(teachers, PERSONA, None, "theory")
+    assert len(counted) == 3
+    monkeypatch.setattr(main, "_teachers_sha256", "0" * 64)
+    main._cached_rank(teachers, PERSONA, None, "default")
+    assert len(counted) == 4
+
+
+def test_cache_is_bounded(counted, monkeypatch):
+    monkeypatch.setattr(main, "RANKED_CACHE_MAX", 3)
+    teachers = main.get_teachers()
+    for i in range(5):
+        main._cached_rank(teachers, dict(PERSONA, pace=i / 10), None, "default")
+    assert len(main._ranked_cache) == 3
+    # The oldest entries were evicted
+    main._cached_rank(teachers, dict(PERSONA, pace=0.0), None, "default")
+    assert len(counted) == 6
+
+
+def test_shard_top_k_serves_shallower_pages(counted, monkeypatch):
+    teachers = main.get_teachers()
+    full = rank_teachers(teachers, PERSONA)
+    asked = []
+
+    def sharded_rank(persona, weight_profile, k):
+        asked.append(k)
+        return [dict(r) for r in full[:k]]
+
+    monkeypatch.setattr(main, "_sharded_rank", sharded_rank)
+    assert main._cached_rank(teachers, PERSONA, None, "default", 5) == full[:5]
+    assert main._cached_rank(teachers, PERSONA, None, "default", 3) == full[:3]
+    assert asked == [5] and counted == []
+    # Deeper than the cached top k: ask the shards again; beyond SHARD_MAX_K or unlimited: rank locally
+    assert main._cached_rank(teachers, PERSONA, None, "default", 8) == full[:8]
+    assert asked == [5, 8]
+    monkeypatch.setattr(main, "SHARD_MAX_K", 8)
+    assert main._cached_rank(teachers, PERSONA, None, "default", 9) == full[:9]
+    assert main._cached_rank(teachers, PERSONA, None, "default") == full
+    assert asked == [5, 8] and counted == [None]
+
+
+def test_rank_depth_covers_the_re_rankers():
+    request = main.MatchRequest(studentPersona=PERSONA, limit=3)
+    assert main._rank_depth(request) == 3
+    assert main._rank_depth(request.model_copy(update={"studentId": "stu_1"})) == main.COLLAB_TOP_K
+    assert main._rank_depth(request.model_copy(update={"diversity": 0.5})) == main.MMR_CANDIDATES
+    assert main._rank_depth(main.MatchRequest(studentPersona=PERSONA)) is None
+
+
+def test_lru_put_survives_concurrent_clears():
+    cache, errors = OrderedDict(), []
+
+    def writer(offset):
+        try:
+            for i in range(20000):
+                main._lru_put(cache, (offset + i) % 50, i, 8)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n * 7,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        cache.clear()
+    for t in threads:
+        t.join()
+    assert errors == [] and len(cache) <= 8 + len(threads)
@@ -0,0 +1,103 @@
+import json
+import random
+import time
+from collections import Counter
+
+import pytest
+
+import archetypes
+import sharding
+from matching import DIMENSION_KEYS, rank_teachers
+
+SUBJECT_SIZES = {"Analysis": 120, "Statistics": 40, "Databases": 25, "Cryptography": 10, "Logic": 3}
+
+
+@pytest.fixture(scope="module")
+def catalogue(tmp_path_factory):
+    rng = random.Random(7)
+    teachers = []
+    for subject, size in SUBJECT_SIZES.items():
+        for i in range(size):
+            # Coarse persona values make many equal scores, so tie order is exercised too
+            persona = {d: rng.choice([0.0, 0.25, 0.5, 0.75, 1.0]) for d in DIMENSION_KEYS}
+            teachers.append({"teacher_id": f"tch_{subject[:3].lower()}_{i:03d}", "name": f"T{i}", "subject": subject, "persona": persona})
+    rng.shuffle(teachers)
+    path = tmp_path_factory.mktemp("shards") / "teachers.json"
+    path.write_text(json.dumps({"teachers": teachers}, indent=2), encoding="utf-8")
+    return path, teachers
+
+
+def _personas(n=5, seed=3):
+    rng = random.Random(seed)
+    return [{d: rng.choice([0.0, 0.5, 1.0, round(rng.random(), 2)]) for d in DIMENSION_KEYS} for _ in range(n)]
+
+
+def _scatter(shards, request):
+    # Through JSON, as over the wire
+    return [json.loads(json.dumps(shard.handle(request))) for shard in shards]
+
+
+@pytest.mark.parametrize("n_shards", [1, 2, 3, 5])
+def test_merge_equals_rank_teachers(catalogue, n_shards):
+    path, teachers = catalogue
+    shards = [sharding.Shard(path, s, n_shards) for s in range(n_shards)]
+    assert sorted(p for shard in shards for p in shard.positions) == list(range(len(teachers)))
+    for persona in _personas():
+        for profile in (None, "theory"):
+            expected = rank_teachers(teachers, persona, weight_profile=profile)
+            request = {"op": "top_k", "persona": persona, "k": None, "weight_profile": profile}
+            assert sharding.merge(_scatter(shards, request)) == expected
+            assert sharding.merge(_scatter(shards, dict(request, k=7)), 7) == expected[:7]
+
+
+def test_merge_with_subject_filter(catalogue):
+    path, teachers = catalogue
+    shards = [sharding.Shard(path, s, 4) for s in range(4)]
+    for subject in ("Analysis", "Logic", "Nope"):
+        for persona in _personas(3, seed=len(subject)):
+            request = {"op": "top_k", "persona": persona, "k": None, "subject": subject}
+            assert sharding.merge(_scatter(shards, request)) == rank_teachers(teachers, persona, subject=subject)
+
+
+def test_plan_splits_only_large_subjects():
+    plan = sharding.plan_shards(SUBJECT_SIZES, 4)
+    assert len(plan["Analysis"]) > 1
+    assert all(len(plan[s]) == 1 for s in ("Databases", "Cryptography", "Logic"))
+    assert plan == sharding.plan_shards(dict(reversed(list(SUBJECT_SIZES.items()))), 4)
+
+
+def test_shards_are_balanced(catalogue):
+    path, teachers = catalogue
+    counts = Counter(t["subject"] for t in teachers)
+    plan = sharding.plan_shards(counts, 4)
+    load = Counter(sharding.shard_of(t, plan, 4) for t in teachers)
+    assert set(load) == {0, 1, 2, 3}
+    assert max(load.values()) <= 2 * len(teachers) / 4
+
+
+def test_unknown_op_and_missing_key(catalogue):
+    path, _ = catalogue
+    with pytest.raises(ValueError):
+        sharding.Shard(path, 0, 1).handle({"op": "exec"})
+    with pytest.raises(RuntimeError):
+        sharding.ShardClient(("127.0.0.1", 9), authkey=None)
+
+
+def test_spawned_shards_match_local_ranking(catalogue):
+    path, teachers = catalogue
+    matcher = sharding.ShardedMatcher.spawn(2, path)
+    try:
+        sha256 = archetypes.file_sha256(path)
+        persona = _personas(1, seed=11)[0]
+        assert matcher.rank(persona, sha256) == rank_teachers(teachers, persona)
+        assert matcher.rank(persona, sha256, k=10) == rank_teachers(teachers, persona)[:10]
+        assert matcher.rank(persona, "other catalogue") is None
+    finally:
+        matcher.close()
+
+
+def test_spawn_fails_fast_when_a_shard_dies(tmp_path):
+    start = time.monotonic()
+    with pytest.raises(RuntimeError, match="exited"):
+        sharding.ShardedMatcher.spawn(2, tmp_path / "missing.json")
+    assert time.monotonic() - start < 60
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import similar_teachers
+from matching import DIMENSION_KEYS, WEIGHT_VECTOR
+
+DIMS = len(DIMENSION_KEYS)
+
+
+def _brute_force(matrix: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    d = similar_teachers.block_distances(matrix, matrix)
+    np.fill_diagonal(d, np.inf)
+    ids = np.broadcast_to(np.arange(len(matrix)), d.shape)
+    order = np.lexsort((ids, d), axis=1)[:, :k]
+    return np.take_along_axis(ids, order, axis=1), np.take_along_axis(d, order, axis=1).astype(np.float16)
+
+
+def test_build_matches_brute_force():
+    matrix = np.random.default_rng(0).random((120, DIMS))
+    graph = similar_teachers.SimilarityGraph.build(matrix, k=8)
+    neighbors, distances = _brute_force(matrix, 8)
+    assert np.array_equal(graph.neighbors, neighbors)
+    assert np.array_equal(graph.distances, distances)
+    assert [i for i, _ in graph.similar(5, 3)] == neighbors[5, :3].tolist()
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_incremental_update_equals_fresh_build(seed):
+    rng = np.random.default_rng(seed)
+    matrix = rng.random((200, DIMS))
+    graph = similar_teachers.SimilarityGraph.build(matrix, k=10)
+    # Edit some teachers (including ones that are many rows' neighbours) and append new ones
+    edited = matrix.copy()
+    changed = [0, 17, int(graph.neighbors[3, 0]), 150]
+    edited[changed] = rng.random((len(changed), DIMS))
+    added = rng.random((15, DIMS))
+    new_matrix = np.vstack([edited, added])
+    all_changed = changed + list(range(200, 215))
+
+    updated = graph.updated(new_matrix, all_changed)
+    fresh = similar_teachers.SimilarityGraph.build(new_matrix, k=10)
+    assert np.array_equal(updated.distances, fresh.distances)
+    assert np.array_equal(updated.neighbors, fresh.neighbors)
+
+
+def test_incremental_update_with_ties():
+    # Coarse values: many equal distances, where only neighbour ids among equals may differ
+    rng = np.random.default_rng(4)
+    matrix = rng.choice([0.0, 0.5, 1.0], size=(80, DIMS))
+    graph = similar_teachers.SimilarityGraph.build(matrix, k=6)
+    new_matrix = matrix.copy()
+    new_matrix[[2, 40]] = rng.choice([0.0, 0.5, 1.0], size=(2, DIMS))
+    updated = graph.updated(new_matrix, [2, 40])
+    fresh = similar_teachers.SimilarityGraph.build(new_matrix, k=6)
+    assert np.array_equal(updated.distances, fresh.distances)
+    exact = similar_teachers.block_distances(new_matrix, new_matrix, WEIGHT_VECTOR)
+    rows = np.arange(len(new_matrix))[:, None]
+    assert np.array_equal(exact[rows, updated.neighbors].astype(np.float16), updated.distances)
+    assert not (updated.neighbors == rows).any()
+
+
+def test_small_catalogue_is_padded_and_grows():
+    matrix = np.random.default_rng(5).random((3, DIMS))
+    graph = similar_teachers.SimilarityGraph.build(matrix, k=4)
+    assert (graph.neighbors[:, 2:] == -1).all() and len(graph.similar(0)) == 2
+    grown = np.vstack([matrix, np.random.default_rng(6).random((4, DIMS))])
+    updated = graph.updated(grown, [3, 4, 5, 6])
+    fresh = similar_teachers.SimilarityGraph.build(grown, k=4)
+    assert np.array_equal(updated.neighbors, fresh.neighbors)
+    assert np.array_equal(updated.distances, fresh.distances)
+
+
+def test_save_and_load(tmp_path):
+    matrix = np.random.default_rng(7).random((30, DIMS))
+    graph = similar_teachers.SimilarityGraph.build(matrix, k=5, teachers_sha256="abc")
+    path = tmp_path / "similar.npz"
+    graph.save(path)
+    loaded = similar_teachers.SimilarityGraph.load(path, teachers_sha256="abc")
+    assert np.array_equal(loaded.neighbors, graph.neighbors) and np.array_equal(loaded.distances, graph.distances)
+    assert similar_teachers.SimilarityGraph.load(path, teachers_sha256="other") is None
+    assert similar_teachers.SimilarityGraph.load(tmp_path / "missing.npz") is None
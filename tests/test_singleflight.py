@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def _concurrently(n, fn):
+    results, errors = [None] * n, [None] * n
+    barrier = threading.Barrier(n)
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return object()
+
+    results, errors = _concurrently(8, lambda: flight.do("key", slow))
+    assert errors == [None] * 8
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert flight.stats == {"calls": 1, "shared": 7}
+
+
+def test_exceptions_are_shared_and_not_remembered():
+    flight = SingleFlight()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        time.sleep(0.2)
+        raise RuntimeError("upstream down")
+
+    _, errors = _concurrently(4, lambda: flight.do("key", failing))
+    assert len(calls) == 1
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    # Nothing is cached once the call finished
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_keys_are_independent_and_namespaced_per_function():
+    flight = SingleFlight()
+
+    @flight.coalesce(lambda x: x)
+    def double(x):
+        return 2 * x
+
+    @flight.coalesce(lambda x: x)
+    def square(x):
+        return x * x
+
+    assert (double(3), square(3)) == (6, 9)
+    assert flight.stats["calls"] == 2
+
+
+def test_sequential_calls_run_again():
+    flight = SingleFlight()
+    counter = iter(range(10))
+    assert flight.do("key", lambda: next(counter)) == 0
+    assert flight.do("key", lambda: next(counter)) == 1
+
+
+@pytest.mark.parametrize("n", [2, 16])
+def test_leader_result_reaches_every_waiter(n):
+    flight = SingleFlight()
+    results, _ = _concurrently(n, lambda: flight.do(("a", 1), lambda: (time.sleep(0.1), "v")[1]))
+    assert results == ["v"] * n
@@ -0,0 +1,122 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from matching import DIMENSION_KEYS
+
+PLAN = "## Outline\n1. Limits\n2. Continuity\n- Practice\n\n## 1. Limits\nA limit is...\n\n## 2. Continuity\nText.\n"
+
+
+def _run(text: str, size: int) -> list[dict]:
+    splitter = main._OutlineSplitter()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(splitter.feed(text[start : start + size]))
+    events.extend(splitter.flush())
+    return events
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, len(PLAN)])
+def test_outline_then_body_for_any_chunking(size):
+    events = _run(PLAN, size)
+    assert events[0] == {"type": "outline", "sections": ["1. Limits", "2. Continuity", "- Practice"]}
+    assert all(e["type"] == "delta" for e in events[1:])
+    assert "".join(e["text"] for e in events[1:]) == PLAN.split("\n\n", 1)[1]
+
+
+@pytest.mark.parametrize("size", [1, 5, 1000])
+def test_plan_without_outline_is_all_body(size):
+    text = "Week 1: limits.\n\nWeek 2: continuity.\n"
+    events = _run(text, size)
+    assert events[0] == {"type": "outline", "sections": []}
+    assert "".join(e["text"] for e in events[1:]) == text
+
+
+def test_outline_only_plan():
+    assert _run("Outline:\nA\nB", 4) == [{"type": "outline", "sections": ["A", "B"]}]
+
+
+def test_unterminated_outline_gives_up():
+    text = "Outline\n" + "x" * (main._OutlineSplitter.MAX_HEAD_CHARS + 10)
+    splitter = main._OutlineSplitter()
+    events = splitter.feed(text)
+    assert events[0] == {"type": "outline", "sections": []}
+    assert events[1]["text"] == text
+
+
+def test_stream_starts_before_upstream_calls_and_skips_prompts_on_a_hit(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    calls = []
+
+    def modality_prompts(teacher):
+        calls.append("prompts")
+        return {"text_prompt": "Explain with examples.", "audio_prompt": "", "video_prompt": ""}
+
+    def stream(teacher, persona, topic, text_prompt):
+        calls.append(text_prompt)
+        yield from (PLAN[i : i + 20] for i in range(0, len(PLAN), 20))
+
+    monkeypatch.setattr(main, "_get_modality_prompts", modality_prompts)
+    monkeypatch.setattr(main, "_stream_study_plan", stream)
+    teacher_id = main.get_teachers()[0]["teacher_id"]
+    body = {"teacherId": teacher_id, "studentPersona": {d: 0.2 for d in DIMENSION_KEYS}, "topic": "Stream test topic"}
+    client = TestClient(main.app)
+    main._study_plan_cache.pop(main._study_plan_key(main.get_teachers()[0], body["studentPersona"], body["topic"]), None)
+
+    events = [json.loads(line) for line in client.post("/api/learn/study-plan/stream", json=body).text.splitlines()]
+    assert events[0] == {"type": "start", "cached": False}
+    assert events[1]["type"] == "outline" and events[-1] == {"type": "done", "text_prompt": "Explain with examples."}
+    assert calls == ["prompts", "Explain with examples."]
+
+    events = [json.loads(line) for line in client.post("/api/learn/study-plan/stream", json=body).text.splitlines()]
+    assert events[0] == {"type": "start", "cached": True} and events[-1]["type"] == "done"
+    assert calls == ["prompts", "Explain with examples."]
+
+
+def test_compare_reports_each_failure_and_keeps_going(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    teachers = main.get_teachers()[:3]
+    ids = [t["teacher_id"] for t in teachers]
+    persona = {d: 0.3 for d in DIMENSION_KEYS}
+    topic = "Compare test topic"
+    for t in teachers:
+        main._study_plan_cache.pop(main._study_plan_key(t, persona, topic), None)
+
+    def generate(teacher, persona, topic, text_prompt):
+        if teacher["teacher_id"] == ids[1]:
+            raise RuntimeError("upstream down")
+        return "" if teacher["teacher_id"] == ids[2] else f"Plan by {teacher['teacher_id']}"
+
+    monkeypatch.setattr(main, "_get_modality_prompts", lambda teacher: {"text_prompt": ""})
+    monkeypatch.setattr(main, "_generate_study_plan", generate)
+    client = TestClient(main.app)
+    body = {"teacherIds": ids, "studentPersona": persona, "topic": topic}
+
+    events = [json.loads(line) for line in client.post("/api/learn/study-plan/compare", json=body).text.splitlines()]
+    assert events[0] == {"type": "start", "teacher_ids": ids}
+    assert events[-1] == {"type": "done", "plans": 1, "errors": 2}
+    by_id = {e["teacher_id"]: e for e in events[1:-1]}
+    assert set(by_id) == set(ids)
+    assert by_id[ids[0]]["type"] == "plan" and not by_id[ids[0]]["cached"]
+    assert by_id[ids[1]]["type"] == "error" and by_id[ids[1]]["detail"] == "Study plan generation failed: upstream down"
+    assert by_id[ids[2]]["type"] == "error" and by_id[ids[2]]["name"] == teachers[2].get("name")
+
+    events = [json.loads(line) for line in client.post("/api/learn/study-plan/compare", json=body).text.splitlines()]
+    by_id = {e["teacher_id"]: e for e in events[1:-1]}
+    assert by_id[ids[0]]["cached"] and by_id[ids[0]]["study_plan"] == f"Plan by {ids[0]}"
+    assert events[-1] == {"type": "done", "plans": 1, "errors": 2}
+
+
+def test_compare_rejects_bad_requests_before_streaming(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    client = TestClient(main.app)
+    base = {"studentPersona": {d: 0.3 for d in DIMENSION_KEYS}, "topic": "x"}
+    assert client.post("/api/learn/study-plan/compare", json=base).status_code == 400
+    assert client.post("/api/learn/study-plan/compare", json=dict(base, teacherIds=["no-such-teacher"])).status_code == 404
+    assert client.post("/api/learn/study-plan/compare", json=dict(base, teacherIds=[])).status_code == 404
+    ids = [t["teacher_id"] for t in main.get_teachers()[: main.COMPARE_MAX_TEACHERS + 1]]
+    assert client.post("/api/learn/study-plan/compare", json=dict(base, teacherIds=ids)).status_code == 400
+    monkeypatch.delenv("OPENAI_API_KEY")
+    assert client.post("/api/learn/study-plan/compare", json=dict(base, teacherIds=ids[:1])).status_code == 503
@@ -0,0 +1,112 @@
+import copy
+import io
+import json
+import random
+
+import numpy as np
+import pytest
+
+import listing
+import main
+import teacher_import
+from matching import DIMENSION_KEYS, persona_matrix, rank_teachers, subject_indices, teacher_matrix, teacher_rows, upsert_catalogue
+
+
+def _teacher(tid: str, subject: str, seed: int) -> dict:
+    rng = random.Random(seed)
+    return {"teacher_id": tid, "name": f"Teacher {tid}", "subject": subject, "persona": {d: round(rng.random(), 2) for d in DIMENSION_KEYS}}
+
+
+def test_validate_teacher():
+    teacher, errors = teacher_import.validate_teacher(dict(_teacher("  t1 ", "Analysis", 1), name=" Ann "))
+    assert errors == [] and teacher["teacher_id"] == "t1" and teacher["name"] == "Ann"
+    bad = _teacher("t2", "Analysis", 2)
+    bad["persona"]["pace"] = 1.5
+    bad["persona"]["extra"] = 0.1
+    del bad["persona"]["structure"]
+    teacher, errors = teacher_import.validate_teacher(bad)
+    assert teacher is None and len(errors) == 3
+    assert teacher_import.validate_teacher([])[0] is None
+    assert teacher_import.validate_teacher(dict(_teacher("t3", "", 3)))[0] is None
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "json", "wrapped"])
+def test_records_stream_in_every_format(fmt):
+    teachers = [_teacher(f"t{i}", "Analysis", i) for i in range(5)]
+    if fmt == "ndjson":
+        text = "\n".join(json.dumps(t) for t in teachers) + "\n\n"
+    elif fmt == "json":
+        text = json.dumps(teachers, indent=2)
+    else:
+        text = json.dumps({"version": 1, "teachers": teachers})
+    f = io.StringIO(text)
+    assert teacher_import.detect_format(f) == ("ndjson" if fmt == "ndjson" else "json")
+    assert [r for _, r in teacher_import.iter_records(f)] == teachers
+
+
+def test_import_reports_and_batches():
+    records = [(i, _teacher(f"t{i}", "Analysis", i)) for i in range(7)]
+    records.insert(3, (99, {"teacher_id": "bad"}))
+    records.append((100, teacher_import.UploadError("invalid JSON: x")))
+    batches = []
+    report = teacher_import.import_records(records, lambda b: batches.append(list(b)) or (len(b), 0), batch_size=3)
+    assert [len(b) for b in batches] == [3, 3, 1]
+    assert (report["received"], report["valid"], report["invalid"], report["inserted"], report["batches"]) == (9, 7, 2, 7, 3)
+    assert [e["position"] for e in report["errors"]] == [99, 100]
+    assert teacher_import.import_records(records, pytest.fail, dry_run=True)["valid"] == 7
+
+
+def test_upsert_equals_a_fresh_catalogue():
+    base = [_teacher(f"t{i}", ["Analysis", "Statistics", "Databases"][i % 3], i) for i in range(30)]
+    teachers = list(base)
+    teacher_matrix(teachers)
+    batches = [
+        [_teacher(f"n{i}", "Logic", 100 + i) for i in range(4)],
+        [_teacher("t4", "Logic", 200), _teacher("t5", "Statistics", 201), _teacher("n9", "Analysis", 202)],
+        [_teacher(f"m{i}", "Analysis", 300 + i) for i in range(40)],
+    ]
+    persona = {d: 0.4 for d in DIMENSION_KEYS}
+    for batch in batches:
+        before = copy.deepcopy(teachers)
+        updated, inserted, replaced = upsert_catalogue(teachers, batch)
+        assert teachers == before  # the old list is untouched
+        fresh = list(updated)  # same records, no carried-over indexes
+        assert np.array_equal(teacher_matrix(updated), persona_matrix([t["persona"] for t in updated]))
+        assert teacher_rows(updated) == {t["teacher_id"]: i for i, t in enumerate(fresh)}
+        for subject in ("Analysis", "Statistics", "Databases", "Logic"):
+            assert subject_indices(updated, subject) == [i for i, t in enumerate(fresh) if t["subject"] == subject]
+        assert rank_teachers(updated, persona) == rank_teachers(fresh, persona)
+        assert inserted + replaced == len(batch)
+        teachers = updated
+    assert len(teachers) == 30 + 4 + 1 + 40
+
+
+def test_write_catalogue_is_json_dump(tmp_path):
+    path = tmp_path / "teachers.json"
+    data = {"version": 2, "meta": {"a": [1, 2]}, "teachers": [_teacher("t1", "Analysis", 1), _teacher("t2", "Ünï", 2)]}
+    teacher_import.write_catalogue(path, {k: v for k, v in data.items() if k != "teachers"}, iter(data["teachers"]))
+    assert path.read_text(encoding="utf-8") == json.dumps(data, indent=2)
+    assert listing.object_fields(path, "teachers") == {"version": 2, "meta": {"a": [1, 2]}}
+    teacher_import.write_catalogue(path, {}, iter([]))
+    assert json.loads(path.read_text(encoding="utf-8")) == {"teachers": []}
+
+
+def test_a_catalogue_rewritten_by_another_worker_is_reloaded(tmp_path, monkeypatch):
+    path = tmp_path / "teachers.json"
+    teachers = [_teacher(f"t{i}", "Analysis", i) for i in range(4)]
+    teacher_import.write_catalogue(path, {}, teachers)
+    monkeypatch.setattr(main, "TEACHERS_PATH", path)
+    main._invalidate_teachers()
+    try:
+        version = main.get_catalogue_version()
+        loaded = main.get_teachers()
+        assert len(loaded) == 4
+        # Same content, new file: the loaded list is kept
+        teacher_import.write_catalogue(path, {}, teachers)
+        assert main.get_teachers() is loaded
+        # Another worker's import replaced teachers.json
+        teacher_import.write_catalogue(path, {}, teachers + [_teacher("t9", "Statistics", 9)])
+        assert main.get_catalogue_version() != version
+        assert [t["teacher_id"] for t in main.get_teachers()][-1] == "t9"
+    finally:
+        main._invalidate_teachers()
@@ -0,0 +1,146 @@
+import email.utils
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+import upstream
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "loadtest"))
+import mock_providers  # noqa: E402
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def _failing(*errors, result="ok"):
+    """fn raising the given errors on successive calls, then returning result."""
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return fn, calls
+
+
+class _RecordingClock:
+    """upstream's time module with sleep() recorded instead of slept (only in upstream)."""
+
+    def __init__(self):
+        self.slept = []
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    clock = _RecordingClock()
+    monkeypatch.setattr(upstream, "time", clock)
+    return clock.slept
+
+
+def test_token_bucket_bursts_then_refills():
+    bucket = upstream.TokenBucket(rate=20.0, capacity=2)
+    assert bucket.acquire(0) and bucket.acquire(0)
+    assert not bucket.acquire(0)
+    start = time.monotonic()
+    assert bucket.acquire(1.0)
+    assert 0.02 < time.monotonic() - start < 0.5
+    assert not upstream.TokenBucket(rate=0.0, capacity=0).acquire(0.01)
+
+
+def test_transient_errors_are_retried_with_jittered_backoff(sleeps):
+    provider = upstream.Upstream("test", max_retries=2, base_delay=0.5, max_delay=8.0)
+    fn, calls = _failing(ProviderError(503), ProviderError(502))
+    assert provider.call(fn) == "ok"
+    assert len(calls) == 3 and len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0
+    delays = {provider._backoff(3, ProviderError(503)) for _ in range(50)}
+    assert len(delays) > 1 and all(0 <= d <= 4.0 for d in delays)
+    assert provider.metrics()["retries"] == 2 and provider.metrics()["circuit"] == "closed"
+
+
+def test_retry_after_is_honoured_and_capped(sleeps):
+    provider = upstream.Upstream("test", max_retries=3, max_delay=8.0)
+    when = email.utils.formatdate(time.time() + 30, usegmt=True)
+    fn, calls = _failing(
+        ProviderError(429, {"retry-after": "1.5"}),
+        ProviderError(429, {"retry-after-ms": "250"}),
+        ProviderError(503, {"retry-after": when}),
+    )
+    assert provider.call(fn) == "ok"
+    assert sleeps[:2] == [1.5, 0.25] and sleeps[2] == 8.0
+    assert provider.metrics()["rate_limited"] == 2
+
+
+def test_client_errors_and_non_idempotent_calls_are_not_retried(sleeps):
+    provider = upstream.Upstream("test", max_retries=2, failure_threshold=1)
+    fn, calls = _failing(ProviderError(400))
+    with pytest.raises(ProviderError):
+        provider.call(fn)
+    assert len(calls) == 1 and provider.breaker.state == "closed"
+    fn, calls = _failing(ProviderError(503))
+    with pytest.raises(ProviderError):
+        provider.call(fn, retries=0)
+    assert len(calls) == 1 and sleeps == []
+
+
+def test_circuit_opens_fails_fast_and_recovers_through_one_trial(sleeps):
+    provider = upstream.Upstream("test", max_retries=0, failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        with pytest.raises(ProviderError):
+            provider.call(_failing(ProviderError(503))[0])
+    assert provider.breaker.state == "open"
+    fn, calls = _failing()
+    with pytest.raises(upstream.UpstreamUnavailable):
+        provider.call(fn)
+    assert calls == [] and provider.metrics()["short_circuited"] == 1
+
+    provider.breaker._opened_at -= 0.05
+    # Half-open: a failed trial reopens the circuit, a successful one closes it
+    with pytest.raises(ProviderError):
+        provider.call(_failing(ProviderError(503))[0])
+    assert provider.breaker.state == "open"
+    provider.breaker._opened_at -= 0.05
+    assert provider.breaker.allow() and not provider.breaker.allow()
+    provider.breaker.release_trial()
+    assert provider.call(fn) == "ok" and provider.breaker.state == "closed"
+    assert provider.metrics()["circuit_opened"] == 2
+
+
+def test_mock_provider_errors_are_retried_then_open_the_circuit(sleeps):
+    config = mock_providers.MockConfig(latency_ms=0, jitter_ms=0, error_rate=1.0, seed=5)
+    server = mock_providers.serve(mock_providers.OpenAIHandler, 0, config)
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    provider = upstream.Upstream("mock", max_retries=2, failure_threshold=1)
+    calls = []
+
+    def complete():
+        calls.append(1)
+        response = httpx.post(url, json={"model": "m", "messages": []}, timeout=5.0)
+        response.raise_for_status()
+        return response.json()
+
+    try:
+        with pytest.raises(httpx.HTTPStatusError) as failure:
+            provider.call(complete)
+    finally:
+        server.shutdown()
+    assert len(calls) == 3 and len(sleeps) == 2
+    # 429s carry Retry-After: 1, 503s get the jittered backoff
+    assert failure.value.response.status_code in (429, 503)
+    assert provider.metrics()["rate_limited"] == sleeps.count(1.0) + (failure.value.response.status_code == 429)
+    assert provider.breaker.state == "open"
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import multiprocessing
+from pathlib import Path
+
+import pytest
+
+import voice_uploads
+
+
+class FakeVoice:
+    """Stand-in for voice.py: records calls, optionally fails the next clone."""
+
+    def __init__(self):
+        self.extracted, self.cloned = [], []
+        self.fail_clone = False
+
+    def extract_audio_from_video(self, video_path, output_path):
+        self.extracted.append(video_path)
+        Path(output_path).write_bytes(b"audio")
+        return output_path
+
+    def clone_teacher_voice(self, audio_path, teacher_name):
+        if self.fail_clone:
+            self.fail_clone = False
+            raise RuntimeError("clone failed")
+        self.cloned.append((audio_path, teacher_name))
+        return f"voice_{len(self.cloned)}"
+
+
+def _upload(registry, content=b"video bytes", suffix=".mp4"):
+    sha256 = hashlib.sha256(content).hexdigest()
+    tmp = registry.incoming_path()
+    tmp.write_bytes(content)
+    return sha256, registry.adopt(tmp, sha256, suffix)
+
+
+def test_same_recording_and_teacher_is_a_hit(tmp_path):
+    registry, voice = voice_uploads.CloneRegistry(tmp_path), FakeVoice()
+    sha256, path = _upload(registry)
+    assert registry.clone(voice, sha256, path, "tch_1", "Ann") == ("voice_1", None)
+    assert registry.clone(voice, sha256, path, "tch_1", "Ann") == ("voice_1", "voice")
+    # A fresh registry (another worker) sees it too
+    assert voice_uploads.CloneRegistry(tmp_path).clone(voice, sha256, path, "tch_1", "Ann") == ("voice_1", "voice")
+    assert len(voice.extracted) == 1 and len(voice.cloned) == 1
+
+
+def test_failed_clone_reuses_the_extracted_audio(tmp_path):
+    registry, voice = voice_uploads.CloneRegistry(tmp_path), FakeVoice()
+    sha256, path = _upload(registry)
+    voice.fail_clone = True
+    with pytest.raises(RuntimeError):
+        registry.clone(voice, sha256, path, "tch_1", "Ann")
+    assert registry.get(sha256)["audio_path"].endswith(".extracted.mp3")
+    assert registry.clone(voice, sha256, path, "tch_1", "Ann") == ("voice_1", "audio")
+    assert len(voice.extracted) == 1
+
+
+def test_clones_are_per_teacher(tmp_path):
+    registry, voice = voice_uploads.CloneRegistry(tmp_path), FakeVoice()
+    sha256, path = _upload(registry)
+    assert registry.clone(voice, sha256, path, "tch_1", "Ann") == ("voice_1", None)
+    assert registry.clone(voice, sha256, path, "tch_2", "Bob") == ("voice_2", "audio")
+    voices = registry.get(sha256)["voices"]
+    assert voices == {"tch_1": {"voice_id": "voice_1", "teacher_name": "Ann"}, "tch_2": {"voice_id": "voice_2", "teacher_name": "Bob"}}
+    # Audio uploads are cloned as they are
+    audio_sha, audio_path = _upload(registry, b"mp3 bytes", ".mp3")
+    assert registry.clone(voice, audio_sha, audio_path, "tch_1", "Ann") == ("voice_3", None)
+    assert voice.cloned[-1][0] == str(audio_path) and len(voice.extracted) == 1
+
+
+def test_legacy_registry_is_the_starting_point(tmp_path):
+    legacy = {"uploads": {"ab" * 32: {"suffix": ".mp3", "voices": {"tch_1": {"voice_id": "old", "teacher_name": "Ann"}}}}}
+    (tmp_path / "registry.json").write_text(json.dumps(legacy), encoding="utf-8")
+    registry = voice_uploads.CloneRegistry(tmp_path)
+    assert registry.get("ab" * 32)["voices"]["tch_1"]["voice_id"] == "old"
+    registry.update("ab" * 32, ("tch_2", {"voice_id": "new", "teacher_name": "Bob"}))
+    assert set(voice_uploads.CloneRegistry(tmp_path).get("ab" * 32)["voices"]) == {"tch_1", "tch_2"}
+
+
+def _write_voices(root, worker, count):
+    registry = voice_uploads.CloneRegistry(Path(root))
+    for i in range(count):
+        registry.update("cd" * 32, (f"tch_{worker}_{i}", {"voice_id": f"v{worker}_{i}", "teacher_name": "T"}), suffix=".mp3")
+
+
+def test_concurrent_processes_keep_every_entry(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_write_voices, args=(str(tmp_path), w, 100)) for w in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(60)
+    assert all(p.exitcode == 0 for p in processes)
+    assert len(voice_uploads.CloneRegistry(tmp_path).get("cd" * 32)["voices"]) == 400
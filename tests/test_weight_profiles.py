@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import matching
+from matching import DIMENSION_KEYS, rank_teachers, resolve_weight_profile
+
+PERSONA = {d: 0.6 for d in DIMENSION_KEYS}
+
+
+@pytest.fixture
+def subject_profiles(monkeypatch):
+    monkeypatch.setattr(matching, "SUBJECT_WEIGHT_PROFILES", {})
+    return matching.SUBJECT_WEIGHT_PROFILES
+
+
+def test_explicit_profile_then_subject_then_default(subject_profiles):
+    subject_profiles["Cryptography"] = "theory"
+    assert resolve_weight_profile("applied", "Cryptography") == "applied"
+    assert resolve_weight_profile(None, " Cryptography ") == "theory"
+    assert resolve_weight_profile(None, "Databases") == "default"
+    assert resolve_weight_profile() == "default"
+    with pytest.raises(KeyError, match="nope"):
+        resolve_weight_profile("nope", "Cryptography")
+
+
+def test_subject_map_from_env(monkeypatch):
+    monkeypatch.setenv("UNITINDER_SUBJECT_WEIGHT_PROFILES", " Cryptography = theory ,, Databases=applied")
+    assert matching._subject_weight_profiles_from_env() == {"Cryptography": "theory", "Databases": "applied"}
+    monkeypatch.setenv("UNITINDER_SUBJECT_WEIGHT_PROFILES", "Cryptography=theroy")
+    with pytest.raises(KeyError, match="theroy"):
+        matching._subject_weight_profiles_from_env()
+
+
+def test_registered_profiles_compile_and_rank(monkeypatch):
+    monkeypatch.setattr(matching, "WEIGHT_PROFILES", dict(matching.WEIGHT_PROFILES))
+    monkeypatch.setattr(matching, "_weight_vectors", dict(matching._weight_vectors))
+    weights = matching.register_weight_profile("pace_only", {d: 0.0 for d in DIMENSION_KEYS if d != "pace"})
+    assert matching.weight_vector("pace_only").tolist() == [weights[d] for d in DIMENSION_KEYS]
+    assert np.count_nonzero(matching.weight_vector("pace_only")) == 1
+    teachers = main.get_teachers()
+    ranked = rank_teachers(teachers, PERSONA, weight_profile="pace_only")
+    gaps = {t["teacher_id"]: round(abs(PERSONA["pace"] - t["persona"].get("pace", 0.5)), 6) for t in teachers}
+    assert [gaps[r["teacher_id"]] for r in ranked] == sorted(gaps.values())
+    with pytest.raises(ValueError):
+        matching.register_weight_profile("bad", {"tempo": 1.0})
+    with pytest.raises(ValueError):
+        matching.register_weight_profile("bad", {"pace": -1.0})
+    assert "bad" not in matching.WEIGHT_PROFILES
+
+
+def test_match_api_rejects_unknown_profiles():
+    client = TestClient(main.app)
+    response = client.post("/api/match", json={"studentPersona": PERSONA, "weightProfile": "nope"})
+    assert response.status_code == 400 and "nope" in response.json()["detail"]
+    profiles = client.get("/api/weight-profiles").json()
+    assert {"default", "theory", "applied"} <= set(profiles["profiles"])
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+import whatif
+from matching import DIMENSION_KEYS, rank_teachers
+from whatif import WhatIfSession
+
+
+def _catalogue(n=300, seed=2):
+    rng = random.Random(seed)
+    subjects = ["Analysis", "Statistics", "Databases"]
+    return [
+        {
+            "teacher_id": f"tch_{i:03d}",
+            "name": f"T{i}",
+            "subject": subjects[i % 3],
+            # Coarse values make equal scores, so tie order is compared too
+            "persona": {d: rng.choice([0.0, 0.25, 0.5, 0.75, 1.0]) for d in DIMENSION_KEYS},
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.mark.parametrize("subject", [None, "Statistics"])
+def test_ranking_equals_rank_teachers_across_resyncs(subject, monkeypatch):
+    monkeypatch.setattr(whatif, "RESYNC_EVERY", 16)
+    teachers = _catalogue()
+    rng = random.Random(9)
+    persona = {d: 0.5 for d in DIMENSION_KEYS}
+    session = WhatIfSession(teachers, persona, subject=subject, top_k=15)
+    for step in range(80):
+        changes = {d: round(rng.random(), 2) for d in rng.sample(DIMENSION_KEYS, rng.randint(1, 3))}
+        persona.update(changes)
+        session.update(changes)
+        if step % 10 == 9 or step in (15, 16, 17):
+            assert session.ranking() == rank_teachers(teachers, persona, subject=subject)[:15]
+    assert session.updates > 4 * whatif.RESYNC_EVERY
+    assert session.persona() == pytest.approx(persona)
+
+
+def test_invalid_changes_leave_the_session_untouched():
+    teachers = _catalogue(50)
+    session = WhatIfSession(teachers, {d: 0.5 for d in DIMENSION_KEYS})
+    before = session.ranking()
+    for changes in ({"pace": 0.9, "structure": "fast"}, {"pace": 0.9, "structure": None}, {"pace": 0.9, "structure": float("nan")}, {"pace": 0.9, "tempo": 1}, ["pace"]):
+        with pytest.raises(ValueError):
+            session.update(changes)
+        assert session.persona() == {d: 0.5 for d in DIMENSION_KEYS}
+        assert session.updates == 0 and session.ranking() == before
+    session.update({"pace": "2", "structure": -1})
+    assert (session.persona()["pace"], session.persona()["structure"]) == (1.0, 0.0)
@@ -0,0 +1,283 @@
+"""
+upstream.py — shared governor for calls to upstream AI providers (OpenAI, ElevenLabs).
+
+Every provider gets:
+  - a token bucket (requests/second with a burst) and a cap on concurrent calls,
+  - retries with jittered exponential backoff that honour Retry-After on 429/5xx/timeouts,
+  - a circuit breaker that fails fast (UpstreamUnavailable) while the provider is unhealthy,
+    so callers drop to their fallbacks immediately instead of waiting on timeouts,
+  - counters exposed by metrics().
+
+Limits come from the environment, e.g. UNITINDER_OPENAI_RPS, UNITINDER_OPENAI_BURST,
+UNITINDER_OPENAI_MAX_CONCURRENCY, UNITINDER_OPENAI_MAX_RETRIES (provider name upper-cased).
+
+  text = upstream.get("openai").call(lambda: client.chat.completions.create(...))
+  voice = upstream.get("elevenlabs").call(lambda: client.voices.ivc.create(...), retries=0)  # not idempotent
+"""
+
+import email.utils
+import os
+import random
+import threading
+import time
+from typing import Any, Callable
+
+
+class UpstreamUnavailable(RuntimeError):
+    """Raised without calling the provider: circuit open, or no rate/concurrency slot in time."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `capacity` banked."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> bool:
+        """Take one token, waiting up to timeout seconds. Returns False if none became available."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else timeout
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Closed → open after `failure_threshold` consecutive failures; open → half-open after
+    `reset_timeout` seconds, letting one trial call through; its outcome closes or reopens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial slot that was granted but never used."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if this opened the circuit."""
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self.state == "half_open" or (self.state == "closed" and self._failures >= self.failure_threshold):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+def _status_code(exc: BaseException) -> int | None:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def _is_transient(exc: BaseException) -> bool:
+    """429, 5xx, timeouts and connection errors are worth retrying; other 4xx are the caller's fault."""
+    code = _status_code(exc)
+    if code is not None:
+        return code == 429 or code >= 500
+    name = type(exc).__name__.lower()
+    return isinstance(exc, (TimeoutError, ConnectionError)) or "timeout" in name or "connection" in name
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    """Seconds to wait from Retry-After / retry-after-ms headers on the provider error, if any."""
+    headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            when = email.utils.parsedate_to_datetime(value)
+            return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class Upstream:
+    """Rate limit + concurrency cap + retries + circuit breaker for one provider."""
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 10.0,
+        burst: float = 20.0,
+        max_concurrency: int = 16,
+        max_retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        acquire_timeout: float = 10.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "rate_limited": 0,  # 429s returned by the provider
+            "throttled": 0,  # no local token/slot within acquire_timeout
+            "short_circuited": 0,
+            "circuit_opened": 0,
+            "latency_ms_total": 0.0,
+            "latency_ms_max": 0.0,
+        }
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[key] += amount
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        hinted = _retry_after(exc)
+        if hinted is not None:
+            return min(hinted, self.max_delay)
+        # Full jitter: uniform in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, fn: Callable[[], Any], retries: int | None = None) -> Any:
+        """
+        Run fn() under this provider's limits. Raises UpstreamUnavailable or fn's last exception.
+        retries overrides max_retries for this call: pass 0 for requests that are not safe to
+        repeat (creating a resource), where a timeout may hide a request the provider accepted.
+        """
+        max_retries = self.max_retries if retries is None else retries
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise UpstreamUnavailable(f"{self.name}: circuit open")
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self._count("throttled")
+            self.breaker.release_trial()
+            raise UpstreamUnavailable(f"{self.name}: too many concurrent calls")
+        try:
+            self._count("calls")
+            for attempt in range(max_retries + 1):
+                if not self.bucket.acquire(self.acquire_timeout):
+                    self._count("throttled")
+                    self.breaker.release_trial()
+                    raise UpstreamUnavailable(f"{self.name}: rate limit")
+                start = time.monotonic()
+                try:
+                    result = fn()
+                except Exception as e:
+                    if _status_code(e) == 429:
+                        self._count("rate_limited")
+                    if not _is_transient(e):
+                        # The provider answered; a bad request says nothing about its health
+                        self._count("failures")
+                        self.breaker.record_success()
+                        raise
+                    if attempt == max_retries or self.breaker.state != "closed":
+                        self._count("failures")
+                        if self.breaker.record_failure():
+                            self._count("circuit_opened")
+                        raise
+                    self._count("retries")
+                    time.sleep(self._backoff(attempt, e))
+                    continue
+                elapsed_ms = (time.monotonic() - start) * 1000.0
+                with self._lock:
+                    self.counters["successes"] += 1
+                    self.counters["latency_ms_total"] += elapsed_ms
+                    self.counters["latency_ms_max"] = max(self.counters["latency_ms_max"], elapsed_ms)
+                self.breaker.record_success()
+                return result
+        finally:
+            self._slots.release()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            out = dict(self.counters)
+        out["latency_ms_avg"] = round(out["latency_ms_total"] / out["successes"], 1) if out["successes"] else 0.0
+        out["latency_ms_total"] = round(out["latency_ms_total"], 1)
+        out["latency_ms_max"] = round(out["latency_ms_max"], 1)
+        out["circuit"] = self.breaker.state
+        return out
+
+
+def _env_float(name: str, key: str, default: float) -> float:
+    try:
+        return float(os.environ.get(f"UNITINDER_{name.upper()}_{key}", default))
+    except ValueError:
+        return default
+
+
+_upstreams: dict[str, Upstream] = {}
+_registry_lock = threading.Lock()
+
+
+def get(name: str) -> Upstream:
+    """The shared governor for a provider ("openai", "elevenlabs"), configured from the environment on first use."""
+    with _registry_lock:
+        if name not in _upstreams:
+            _upstreams[name] = Upstream(
+                name,
+                rate=_env_float(name, "RPS", 10.0),
+                burst=_env_float(name, "BURST", 20.0),
+                max_concurrency=int(_env_float(name, "MAX_CONCURRENCY", 16)),
+                max_retries=int(_env_float(name, "MAX_RETRIES", 2)),
+                failure_threshold=int(_env_float(name, "BREAKER_FAILURES", 5)),
+                reset_timeout=_env_float(name, "BREAKER_RESET_SECONDS", 30.0),
+            )
+        return _upstreams[name]
+
+
+def metrics() -> dict[str, dict]:
+    """Counters and circuit state for every provider used so far."""
+    with _registry_lock:
+        upstreams = list(_upstreams.values())
+    return {u.name: u.metrics() for u in upstreams}
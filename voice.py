@@ -11,27 +11,37 @@ Functions:
   list_cloned_voices()                          → list of voices
 """
 
+import hashlib
 import os
 from pathlib import Path
-from dotenv import load_dotenv
-from elevenlabs import ElevenLabs
+from typing import TYPE_CHECKING
 
-load_dotenv()
+import upstream
+from singleflight import SingleFlight
 
+if TYPE_CHECKING:
+    from elevenlabs import ElevenLabs
+
+# The ElevenLabs SDK is imported on first use (importing it costs more than the rest of the app).
+# .env is loaded by main.py, or below when run directly.
 _client = None
+# Concurrent identical TTS renders (same voice, model and text) share one ElevenLabs call
+_tts_flight = SingleFlight()
 
 BASE_DIR = Path(__file__).resolve().parent
 AUDIO_DIR = BASE_DIR / "audio"
-AUDIO_DIR.mkdir(exist_ok=True)
 
 
-def _get_client() -> ElevenLabs:
+def _get_client() -> "ElevenLabs":
     global _client
     if _client is None:
+        from elevenlabs import ElevenLabs
+
         api_key = os.getenv("ELEVENLABS_API_KEY")
         if not api_key:
             raise RuntimeError("ELEVENLABS_API_KEY not set in .env")
-        _client = ElevenLabs(api_key=api_key)
+        # ELEVENLABS_BASE_URL points the SDK at another host, e.g. the load-test mock (loadtest/mock_providers.py)
+        _client = ElevenLabs(api_key=api_key, base_url=os.getenv("ELEVENLABS_BASE_URL") or None)
     return _client
 
 
@@ -52,6 +62,7 @@ def extract_audio_from_video(video_path: str, output_path: str | None = None) ->
 
     video_path = Path(video_path)
     if output_path is None:
+        AUDIO_DIR.mkdir(exist_ok=True)
         output_path = str(AUDIO_DIR / f"{video_path.stem}_extracted.mp3")
     else:
         Path(output_path).parent.mkdir(parents=True, exist_ok=True)
@@ -83,12 +94,18 @@ def clone_teacher_voice(audio_path: str, teacher_name: str, description: str = "
     client = _get_client()
 
     print(f"  🎙️  Cloning voice for: {teacher_name}")
-    with open(audio_path, "rb") as f:
-        voice = client.voices.ivc.create(
-            name=teacher_name,
-            description=description or f"Cloned voice of {teacher_name} for Unitinder",
-            files=[f],
-        )
+
+    def create():
+        with open(audio_path, "rb") as f:
+            return client.voices.ivc.create(
+                name=teacher_name,
+                description=description or f"Cloned voice of {teacher_name} for Unitinder",
+                files=[f],
+                request_options={"max_retries": 0},
+            )
+
+    # Creating a voice is not idempotent: a retried timeout could clone it twice and use up voice slots
+    voice = upstream.get("elevenlabs").call(create, retries=0)
 
     print(f"  ✅ Voice cloned! voice_id = {voice.voice_id}")
     return voice.voice_id
@@ -96,6 +113,9 @@ def clone_teacher_voice(audio_path: str, teacher_name: str, description: str = "
 
 # ── Step 3: Generate speech ──────────────────────────────────────────
 
+@_tts_flight.coalesce(
+    lambda voice_id, text, model_id="eleven_multilingual_v2": (voice_id, model_id, hashlib.sha256(text.encode("utf-8")).hexdigest())
+)
 def generate_speech(voice_id: str, text: str, model_id: str = "eleven_multilingual_v2") -> bytes:
     """
     Generate speech audio using a cloned voice.
@@ -110,18 +130,17 @@ def generate_speech(voice_id: str, text: str, model_id: str = "eleven_multilingu
     """
     client = _get_client()
 
-    audio_generator = client.text_to_speech.convert(
-        voice_id=voice_id,
-        text=text,
-        model_id=model_id,
-    )
-
-    # The generator yields chunks — collect them all
-    audio_bytes = b""
-    for chunk in audio_generator:
-        audio_bytes += chunk
+    def render() -> bytes:
+        audio_generator = client.text_to_speech.convert(
+            voice_id=voice_id,
+            text=text,
+            model_id=model_id,
+            request_options={"max_retries": 0},  # the governor retries (SDK retries would multiply them)
+        )
+        # The generator yields chunks — collect them all (inside the governed call, so stream errors are retried too)
+        return b"".join(audio_generator)
 
-    return audio_bytes
+    return upstream.get("elevenlabs").call(render)
 
 
 # ── Full pipeline: Video → Voice ID ─────────────────────────────────
@@ -186,6 +205,10 @@ def save_audio(audio_bytes: bytes, output_path: str) -> str:
 if __name__ == "__main__":
     import sys
 
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
     if len(sys.argv) > 1:
         # Test full pipeline: python voice.py path/to/video.mp4 "Teacher Name"
         video = sys.argv[1]
@@ -0,0 +1,193 @@
+"""
+voice_uploads.py — content-hash deduplication of voice clone uploads (/api/voice/clone).
+
+Uploads are hashed (SHA-256) while they are streamed to disk and kept content-addressed:
+
+  objects/ab/abcdef….mp4            the upload as received
+  objects/ab/abcdef….extracted.mp3  audio extracted from a video upload
+
+registry.ndjson records what was derived from each upload, one JSON line per change:
+
+  {"sha256": "abcdef…", "fields": {"suffix": ".mp4", "audio_path": "objects/ab/abcdef….extracted.mp3"}, "at": …}
+  {"sha256": "abcdef…", "fields": {…}, "teacher_id": "tch_cs_001", "voice": {"voice_id": "…", "teacher_name": "…"}, "at": …}
+
+Replaying it gives, per upload hash, the merged fields plus the voices per teacher. Like the
+preview manifest, it is an append-only log written with single O_APPEND writes, so API workers
+in several processes never lose each other's entries; readers parse only the lines added since
+their last read. A registry.json from before the log is read as its starting point.
+
+Re-sending a recording that was already cloned for the same teacher (a re-upload, an admin
+retrying) returns the stored voice_id without extracting or cloning again; the same recording
+uploaded for another teacher reuses the extracted audio but gets its own clone. When only the
+clone step failed, the retry reuses the extracted audio and just clones. Concurrent uploads of
+the same recording for the same teacher share one pipeline run.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from singleflight import SingleFlight
+
+BASE_DIR = Path(__file__).resolve().parent
+UPLOAD_DIR = Path(os.environ["UNITINDER_UPLOAD_DIR"]) if os.environ.get("UNITINDER_UPLOAD_DIR") else BASE_DIR / "audio" / "uploads"
+CHUNK_SIZE = 1024 * 1024
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".webm", ".avi", ".mkv"}
+
+_clone_flight = SingleFlight()
+
+
+class CloneRegistry:
+    """Upload hash → extracted audio and voice_id per teacher, plus the content-addressed files; safe to share between threads and processes."""
+
+    def __init__(self, root: Path = UPLOAD_DIR):
+        self.root = Path(root)
+        self.log_path = self.root / "registry.ndjson"
+        self.legacy_path = self.root / "registry.json"
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Any]] = {}
+        # Bytes of the log already applied, and the file they were read from
+        self._offset = 0
+        self._inode: int | None = None
+
+    def _legacy_entries(self) -> dict[str, dict[str, Any]]:
+        try:
+            with open(self.legacy_path, encoding="utf-8") as f:
+                return json.load(f).get("uploads") or {}
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _refresh(self) -> None:
+        """Apply log lines appended since the last call (by this or another process)."""
+        try:
+            f = open(self.log_path, "rb")
+        except FileNotFoundError:
+            if self._inode is not None or not self._entries:
+                self._entries, self._offset, self._inode = self._legacy_entries(), 0, None
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                self._entries, self._offset, self._inode = self._legacy_entries(), 0, stat.st_ino
+            if stat.st_size == self._offset:
+                return
+            f.seek(self._offset)
+            data = f.read()
+        # A line still being appended is picked up by a later call
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get("sha256"):
+                self._apply(record)
+        self._offset += end
+
+    def _apply(self, record: dict[str, Any]) -> None:
+        entry = self._entries.setdefault(record["sha256"], {"created_at": record.get("at")})
+        entry.update(record.get("fields") or {}, updated_at=record.get("at"))
+        if record.get("teacher_id") and isinstance(record.get("voice"), dict):
+            entry.setdefault("voices", {})[record["teacher_id"]] = record["voice"]
+
+    def object_path(self, sha256: str, suffix: str) -> Path:
+        return self.root / "objects" / sha256[:2] / f"{sha256}{suffix}"
+
+    def incoming_path(self) -> Path:
+        """A fresh temporary path for an upload being received (moved by adopt())."""
+        (self.root / "incoming").mkdir(parents=True, exist_ok=True)
+        return self.root / "incoming" / f"{uuid.uuid4().hex}.part"
+
+    def get(self, sha256: str) -> dict[str, Any] | None:
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(sha256)
+            return dict(entry) if entry is not None else None
+
+    def update(self, sha256: str, voice: tuple[str, dict[str, Any]] | None = None, **fields: Any) -> dict[str, Any]:
+        """
+        Merge fields into the entry for sha256 (and voice, a (teacher_id, {voice_id, …}) pair,
+        into its voices) by appending one line to the log; returns the entry with every change so far.
+        """
+        record: dict[str, Any] = {"sha256": sha256, "fields": fields, "at": time.time()}
+        if voice is not None:
+            record["teacher_id"], record["voice"] = voice
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+            self._refresh()
+            return dict(self._entries[sha256])
+
+    async def receive(self, upload: Any) -> tuple[str, Path]:
+        """Stream an UploadFile to disk while hashing it; returns (sha256, content-addressed path)."""
+        suffix = Path(upload.filename or ".mp3").suffix.lower()
+        tmp = self.incoming_path()
+        digest = hashlib.sha256()
+        try:
+            with open(tmp, "wb") as f:
+                while chunk := await upload.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        sha256 = digest.hexdigest()
+        return sha256, self.adopt(tmp, sha256, suffix)
+
+    def adopt(self, tmp: Path, sha256: str, suffix: str) -> Path:
+        """Move a received upload to its content-addressed path (dropping it if that content is stored already)."""
+        path = self.object_path(sha256, suffix)
+        if path.exists():
+            tmp.unlink(missing_ok=True)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, path)
+        return path
+
+    def _resolve(self, relative: str | None) -> Path | None:
+        if not relative:
+            return None
+        path = self.root / relative
+        return path if path.exists() else None
+
+    def clone(self, voice: Any, sha256: str, upload_path: Path, teacher_id: str, teacher_name: str) -> tuple[str, str | None]:
+        """
+        voice_id of this teacher for the upload with this hash, and what was reused: "voice"
+        (nothing ran), "audio" (extraction skipped, cloned again) or None. voice is the voice.py module.
+        """
+        return _clone_flight.do((sha256, teacher_id), self._clone, voice, sha256, upload_path, teacher_id, teacher_name)
+
+    def _clone(self, voice: Any, sha256: str, upload_path: Path, teacher_id: str, teacher_name: str) -> tuple[str, str | None]:
+        entry = self.get(sha256) or {}
+        cloned = (entry.get("voices") or {}).get(teacher_id) or {}
+        if cloned.get("voice_id"):
+            return cloned["voice_id"], "voice"
+        reused = None
+        if upload_path.suffix.lower() in VIDEO_EXTENSIONS:
+            audio_path = self._resolve(entry.get("audio_path"))
+            if audio_path is None:
+                audio_path = Path(voice.extract_audio_from_video(str(upload_path), str(self.object_path(sha256, ".extracted.mp3"))))
+                # Recorded before cloning, so a failed clone retries without extracting again
+                self.update(sha256, suffix=upload_path.suffix.lower(), audio_path=audio_path.relative_to(self.root).as_posix())
+            else:
+                reused = "audio"
+        else:
+            audio_path = upload_path
+        voice_id = voice.clone_teacher_voice(str(audio_path), teacher_name)
+        self.update(
+            sha256,
+            (teacher_id, {"voice_id": voice_id, "teacher_name": teacher_name}),
+            suffix=upload_path.suffix.lower(),
+            audio_path=audio_path.relative_to(self.root).as_posix(),
+        )
+        return voice_id, reused
@@ -0,0 +1,118 @@
+"""
+whatif.py — incremental re-scoring for interactive persona tuning ("what-if" sliders).
+
+A session caches the (teachers × 24) weighted contribution matrix of one student against the
+catalogue (optionally one subject). Moving one slider changes one column, so
+
+  distances += new_column - old_column        O(N)
+  top-k      = partition(distances, k)        O(N) + O(k log k)
+
+instead of re-running rank_teachers. No LLM calls: entries carry the catalogue summary.
+Distances are re-summed from the contribution matrix every RESYNC_EVERY updates so float
+drift from the running deltas cannot build up.
+"""
+
+import math
+from typing import Any
+
+import numpy as np
+
+from matching import (
+    DIMENSION_KEYS,
+    SCORE_TIE_MARGIN,
+    compatibility_score,
+    contribution_matrix,
+    normalize_scores,
+    persona_vector,
+    ranked_entry,
+    resolve_weight_profile,
+    subject_indices,
+    sum_contributions,
+    teacher_matrix,
+    weight_vector,
+)
+
+DEFAULT_TOP_K = 10
+MAX_TOP_K = 100
+RESYNC_EVERY = 256
+_DIM_INDEX = {d: j for j, d in enumerate(DIMENSION_KEYS)}
+
+
+class WhatIfSession:
+    """One student's live ranking; update() applies slider changes, ranking() returns the top-k."""
+
+    def __init__(
+        self,
+        teachers: list[dict[str, Any]],
+        student_persona: dict[str, float],
+        subject: str | None = None,
+        weight_profile: str | None = None,
+        top_k: int = DEFAULT_TOP_K,
+    ):
+        self.teachers = teachers
+        self.weight_profile = resolve_weight_profile(weight_profile, subject)
+        self.weights = weight_vector(self.weight_profile)
+        self.indices = np.array(
+            subject_indices(teachers, subject) if subject is not None else range(len(teachers)), dtype=np.int64
+        )
+        self.matrix = teacher_matrix(teachers)[self.indices]
+        self.vector = persona_vector(student_persona)
+        self.contributions = contribution_matrix(self.matrix, self.vector, self.weights)
+        self.distances = sum_contributions(self.contributions)
+        self.top_k = max(1, min(top_k, MAX_TOP_K))
+        self.updates = 0
+
+    def update(self, changes: dict[str, float]) -> None:
+        """
+        Set dimensions to new values (clamped to 0–1), one O(N) column delta each. Raises ValueError on
+        unknown dimensions or non-numeric values, before any dimension is changed.
+        """
+        if not isinstance(changes, dict):
+            raise ValueError("changes must be an object of dimension: value")
+        unknown = set(changes) - set(_DIM_INDEX)
+        if unknown:
+            raise ValueError(f"Unknown dimensions: {sorted(unknown)}")
+        values = {}
+        for dim, value in changes.items():
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                number = math.nan
+            if not math.isfinite(number):
+                raise ValueError(f"{dim} must be a number, got {value!r}")
+            values[_DIM_INDEX[dim]] = min(1.0, max(0.0, number))
+        for j, value in values.items():
+            if value == self.vector[j]:
+                continue
+            column = np.abs(value - self.matrix[:, j]) * self.weights[j]
+            self.distances += column - self.contributions[:, j]
+            self.contributions[:, j] = column
+            self.vector[j] = value
+            self.updates += 1
+            if self.updates % RESYNC_EVERY == 0:
+                self.distances = sum_contributions(self.contributions)
+
+    def persona(self) -> dict[str, float]:
+        return {d: float(v) for d, v in zip(DIMENSION_KEYS, self.vector)}
+
+    def ranking(self) -> list[dict[str, Any]]:
+        """
+        Top-k teachers with compatibility_score normalized over the whole candidate set, as in
+        rank_teachers (best = 100, worst = 0), plus the best-3 / worst-2 "why".
+        """
+        n = len(self.distances)
+        if n == 0:
+            return []
+        k = min(self.top_k, n)
+        kth = float(np.partition(self.distances, k - 1)[k - 1])
+        # rank_teachers orders by the rounded score, ties in catalogue order, so every row that can
+        # round to the k-th score is a candidate
+        candidates = np.flatnonzero(100.0 / (1.0 + self.distances) >= compatibility_score(kth) - SCORE_TIE_MARGIN)
+        raw = {int(r): compatibility_score(float(self.distances[r])) for r in candidates}
+        ordered = sorted(raw, key=lambda r: (-raw[r], r))[:k]
+        order = np.argsort(self.contributions[ordered], axis=1, kind="stable")
+
+        results = [ranked_entry(self.teachers[int(self.indices[r])], raw[r], order[row]) for row, r in enumerate(ordered)]
+        # Same score arithmetic as rank_teachers: rounded raw score, then min/max normalization
+        normalize_scores(results, compatibility_score(float(self.distances.max())), compatibility_score(float(self.distances.min())))
+        return results